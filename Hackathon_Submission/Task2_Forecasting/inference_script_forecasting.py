@@ -33,7 +33,7 @@ import json
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -56,6 +56,11 @@ DEFAULT_CONFIG = {
 
 # ---------------------------------------------------------------------------
 # Forecasting Models
+#
+# SimpleMovingAverage, RegressionForecast and HybridForecast are the per-SKU
+# reference implementation (also used by evaluate_accuracy.py). Inference runs
+# RecursiveHybridForecast, which must produce the same forecasts as
+# HybridForecast.predict on the growing history.
 # ---------------------------------------------------------------------------
 
 class SimpleMovingAverage:
@@ -128,6 +133,132 @@ class HybridForecast:
         return float(max(0.0, calibrated))
 
 
+class RecursiveHybridForecast:
+    """
+    HybridForecast applied recursively over a date range, for every SKU at once.
+
+    Rather than filtering and refitting each SKU's history for every target date, the
+    per-SKU state is kept in NumPy arrays (one row per SKU):
+      - OLS co-moments (mean day, mean demand, Cxx, Cxy), updated in O(1) per new point;
+      - the actual history in one padded buffer and the predictions in a preallocated
+        buffer, from which the last `sma_window` values are gathered for the SMA.
+    Each target date is a single vectorized step over all SKUs. Values enter in the order
+    the per-SKU loop used (actual days before the target, then earlier predictions), so
+    forecasts match HybridForecast.predict on the growing history.
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config or DEFAULT_CONFIG
+        self.window = self.config.get('sma_window', 7)
+        weights = self.config.get('hybrid_weights', {'regression': 0.7, 'sma': 0.3})
+        self.w_reg = weights['regression']
+        self.w_sma = weights['sma']
+        self.calibration = self.config.get('calibration_factor', 1.0)
+
+    def forecast(self, demand_df: pd.DataFrame, date_range: pd.DatetimeIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (SKU ids in sorted order, forecasts with one row per SKU and one column per date)."""
+        df = demand_df.sort_values(['id_produit', 'date'], kind='stable')
+        codes, pids = pd.factorize(df['id_produit'], sort=True)
+        pids = np.asarray(pids)
+        n_skus, horizon = len(pids), len(date_range)
+        forecasts = np.zeros((n_skus, horizon))
+        if n_skus == 0 or horizon == 0:
+            return pids, forecasts
+
+        # Days relative to the first target date
+        origin = date_range[0].normalize()
+        targets = (date_range.normalize() - origin).days.to_numpy(dtype=np.int64)
+        days = (df['date'] - origin).dt.days.to_numpy(dtype=np.int64)
+        values = df['quantite_demande'].to_numpy(dtype=np.float64)
+
+        # Padded per-SKU buffers of the actual history (date-sorted)
+        counts = np.bincount(codes, minlength=n_skus)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        positions = np.arange(len(df)) - offsets[codes]
+        length = int(counts.max())
+        actual_days = np.full((n_skus, length), np.iinfo(np.int64).max, dtype=np.int64)
+        actual_values = np.zeros((n_skus, length))
+        actual_days[codes, positions] = days
+        actual_values[codes, positions] = values
+
+        # OLS state over the actual days before the first target (two-pass, centred sums)
+        consumed = (actual_days < targets[0]).sum(axis=1)
+        included = positions < consumed[codes]
+        inc_codes, x, y = codes[included], days[included].astype(np.float64), values[included]
+        n = np.bincount(inc_codes, minlength=n_skus).astype(np.float64)
+        safe_n = np.maximum(n, 1.0)
+        mean_x = np.bincount(inc_codes, weights=x, minlength=n_skus) / safe_n
+        mean_y = np.bincount(inc_codes, weights=y, minlength=n_skus) / safe_n
+        dx, dy = x - mean_x[inc_codes], y - mean_y[inc_codes]
+        c_xx = np.bincount(inc_codes, weights=dx * dx, minlength=n_skus)
+        c_xy = np.bincount(inc_codes, weights=dx * dy, minlength=n_skus)
+        last_x = np.full(n_skus, -np.inf)
+        has_history = consumed > 0
+        last_x[has_history] = actual_days[has_history, consumed[has_history] - 1]
+        state = (n, mean_x, mean_y, c_xx, c_xy, last_x)
+
+        rows = np.arange(n_skus)
+        tail = max(self.window, 2)
+        tail_offsets = np.arange(tail) - tail
+        for step, target in enumerate(targets):
+            # Actual days that fall before this target join the history (history overlapping the range)
+            while True:
+                arriving = rows[(consumed < counts) & (actual_days[rows, np.minimum(consumed, length - 1)] < target)]
+                if len(arriving) == 0:
+                    break
+                self._add_point(state, arriving, actual_days[arriving, consumed[arriving]].astype(np.float64),
+                                actual_values[arriving, consumed[arriving]])
+                consumed[arriving] += 1
+
+            # Last `tail` values of (actual history, predictions so far), in that order
+            seen = consumed + step
+            index = seen[:, None] + tail_offsets
+            from_actual = index < consumed[:, None]
+            recent = np.where(
+                from_actual,
+                actual_values[rows[:, None], np.clip(index, 0, length - 1)],
+                forecasts[rows[:, None], np.clip(index - consumed[:, None], 0, horizon - 1)],
+            )
+            recent[index < 0] = 0.0
+
+            sma_count = np.minimum(seen, self.window)
+            sma = self._tail_mean(recent, sma_count)
+            short_mean = self._tail_mean(recent, np.minimum(seen, 2))
+
+            n, mean_x, mean_y, c_xx, c_xy, last_x = state
+            slope = np.divide(c_xy, c_xx, out=np.zeros(n_skus), where=c_xx > 0)
+            with np.errstate(invalid='ignore'):
+                reg = np.maximum(0.0, mean_y + slope * (last_x + 1 - mean_x))
+            hybrid = np.maximum(0.0, (self.w_reg * reg + self.w_sma * sma) * self.calibration)
+
+            prediction = np.where(seen >= 3, hybrid, np.where(seen > 0, short_mean, 0.0))
+            forecasts[:, step] = prediction
+            # Feed the prediction back for multi-step forecasting
+            self._add_point(state, rows, np.full(n_skus, float(target)), prediction)
+
+        return pids, forecasts
+
+    @staticmethod
+    def _tail_mean(recent: np.ndarray, count: np.ndarray) -> np.ndarray:
+        """Mean of the last `count` values of each row (0 where count is 0)."""
+        width = recent.shape[1]
+        kept = np.where(np.arange(width) >= width - count[:, None], recent, 0.0)
+        return np.divide(kept.sum(axis=1), count, out=np.zeros(len(count)), where=count > 0)
+
+    @staticmethod
+    def _add_point(state, rows: np.ndarray, x: np.ndarray, y: np.ndarray):
+        """Welford update of the OLS co-moments of `rows` with one point each."""
+        n, mean_x, mean_y, c_xx, c_xy, last_x = state
+        n[rows] += 1
+        dx = x - mean_x[rows]
+        dy = y - mean_y[rows]
+        mean_x[rows] += dx / n[rows]
+        mean_y[rows] += dy / n[rows]
+        c_xx[rows] += dx * (x - mean_x[rows])
+        c_xy[rows] += dx * (y - mean_y[rows])
+        last_x[rows] = np.maximum(last_x[rows], x)
+
+
 # ---------------------------------------------------------------------------
 # Data loading / preprocessing
 # ---------------------------------------------------------------------------
@@ -242,54 +373,19 @@ def generate_forecasts(
 
     print(f"\n  Forecast range: {start_date} to {end_date} ({len(date_range)} days)")
 
-    model = HybridForecast(config=model_config)
-
-    grouped = {
-        pid: grp[['date', 'quantite_demande']].copy()
-        for pid, grp in demand_df.groupby('id_produit')
-    }
-
-    print(f"  Processing {len(grouped)} SKUs...")
-
-    predictions: List[dict] = []
-    processed = 0
-
-    for pid, product_hist in grouped.items():
-        hist = product_hist.sort_values('date').copy()
-
-        for target_date in date_range:
-            effective_hist = hist[hist['date'] < target_date.normalize()].copy()
-
-            if effective_hist.empty:
-                forecast_qty = 0.0
-            else:
-                forecast_qty = model.predict(effective_hist)
-
-            predictions.append({
-                '_sort_date': target_date,
-                'Date': target_date.strftime('%d-%m-%Y'),
-                'id produit': str(pid),
-                'quantite demande': int(round(max(0.0, forecast_qty))),
-            })
-
-            # Feed prediction back into history for multi-step forecasting
-            hist = pd.concat([
-                hist,
-                pd.DataFrame({
-                    'date': [target_date.normalize()],
-                    'quantite_demande': [max(0.0, forecast_qty)],
-                }),
-            ], ignore_index=True)
+    print(f"  Processing {demand_df['id_produit'].nunique()} SKUs...")
 
-        processed += 1
-        if processed % 50 == 0:
-            print(f"    Processed {processed}/{len(grouped)} SKUs...")
+    model = RecursiveHybridForecast(config=model_config)
+    pids, forecasts = model.forecast(demand_df, date_range)
 
-    print(f"  Generated {len(predictions)} predictions")
+    # One row per (date, SKU), dates first then SKUs in sorted order
+    pred_df = pd.DataFrame({
+        'Date': np.repeat(np.asarray(date_range.strftime('%d-%m-%Y'), dtype=object), len(pids)),
+        'id produit': np.tile(pids.astype(str).astype(object), len(date_range)),
+        'quantite demande': np.round(forecasts.T.ravel()).astype(np.int64),
+    })
 
-    pred_df = pd.DataFrame(predictions)
-    pred_df = pred_df.sort_values(['_sort_date', 'id produit']).reset_index(drop=True)
-    pred_df = pred_df.drop(columns=['_sort_date'])
+    print(f"  Generated {len(pred_df)} predictions")
 
     return pred_df
 
@@ -11,9 +11,10 @@ from Produit.models import Produit
 from Transaction.models import Transaction
 from Transaction.serializers import TransactionListSerializer
 from warhouse.models import Rack, RackProduct
-from ai_service.core.forecasting_service import ForecastingService
+from ai_service.core.forecasting_service import ForecastingService, REPORT_DIR
 from ai_service.core.picking_service import PickingOptimizationService
 from ai_service.core.storage import StorageOptimizationService
+from ai_service.core.twin_state import DigitalTwinStateStore
 from ai_service.core.product_manager import ProductStorageManager
 from ai_service.engine.base import WarehouseCoordinate, Role
 from ai_service.maps import GroundFloorMap, IntermediateFloorMap, UpperFloorMap
@@ -32,6 +33,10 @@ floor_maps = {
 picking_service = PickingOptimizationService(floor_maps)
 storage_service = StorageOptimizationService(floor_maps, pm)
 
+# Shared twin state: every worker replays the same event log on top of the latest snapshot
+twin_state = DigitalTwinStateStore(os.path.join(REPORT_DIR, "twin_state"))
+twin_state.attach(storage_service)
+
 def get_rack_display(code):
     """Converts 0Q-02-03 into human readable Rack Q, Level 2, Slot 3"""
     if not code or not isinstance(code, str):
@@ -57,18 +62,48 @@ def generate_forecast_all(request):
     """
     Endpoint 1: Generate full replenishment & optimization plan for dashboard.
     Combines forecasting (Demand) and storage optimization (Movement).
+    Forecasts are read from the nightly PrevisionIA materialization; ?recompute=true
+    (or an empty table) computes them live instead, and ?online=true serves them from the
+    incrementally updated online model state (intraday refresh). All three take the first
+    `limit` SKUs by id, so switching paths does not change which SKUs are shown. High-demand SKUs for
+    predictive slotting are taken from the demand ranking (see get_high_demand_skus).
     """
     try:
         limit = int(request.GET.get('limit', 20))
-        # Get raw forecast data from service
-        forecast_results = forecast_service.get_all_forecasts_raw(limit_products=limit)
+        workers = request.GET.get('workers')
+        recompute = request.GET.get('recompute', 'false').lower() in ('1', 'true', 'yes')
+        online = request.GET.get('online', 'false').lower() in ('1', 'true', 'yes')
+
+        if online:
+            forecast_results = forecast_service.get_online_forecasts(limit_products=limit)
+        else:
+            forecast_results = None if recompute else forecast_service.get_materialized_forecasts(limit_products=limit)
+        if forecast_results is None:
+            # Get raw forecast data from service (optionally sharded across processes)
+            forecast_results = forecast_service.get_all_forecasts_raw(
+                limit_products=limit, workers=int(workers) if workers is not None else None
+            )
         
-        # Sync physical state for storage optimization
-        if forecast_service.loader.emplacements is not None:
-            storage_service.sync_physical_state(forecast_service.loader.emplacements)
+        # Pick up twin mutations published by the other workers
+        twin_state.catch_up()
+
+        # Sync physical state for storage optimization:
+        # full snapshot once, then only the emplacements changed since the last watermark
+        if not storage_service.physical_state_loaded:
+            if forecast_service.loader.emplacements is None:
+                forecast_service.loader.load_and_clean_wrapper()
+            if forecast_service.loader.emplacements is not None:
+                storage_service.sync_physical_state(forecast_service.loader.emplacements)
+        else:
+            changes = forecast_service.loader.fetch_emplacement_changes(storage_service.sync_watermark)
+            storage_service.sync_physical_delta(changes)
         
+        # Predictive slotting (Step 8.1): high-demand SKUs come from the incrementally maintained
+        # demand ranking, not from a new forecasting pass
+        storage_service.apply_forecast_data(forecast_service.get_high_demand_skus())
+
         formatted_predictions = []
-        
+
         # 1. Add Space Allocation / Move Actions (PRIORITY)
         # Check for rebalancing suggestions
         relocations = storage_service.check_for_rebalancing(traffic_threshold=5)
@@ -144,7 +179,10 @@ def trigger_preparation_tomorrow(request):
     """
     try:
         limit = int(request.GET.get('limit', 20))
-        order_obj = forecast_service.trigger_daily_preparation(limit_products=limit)
+        workers = request.GET.get('workers')
+        order_obj = forecast_service.trigger_daily_preparation(
+            limit_products=limit, workers=int(workers) if workers is not None else None
+        )
         return JsonResponse({
             'status': 'success',
             'message': 'Preparation order triggered one day in advance.',
@@ -172,8 +210,50 @@ def generate_forecast_sku(request, sku_id):
 def get_explanation(request, sku_id):
     """
     Endpoint 3: Return explanation for supervisor dashboard
+    Served from the decision-trace store written by the forecast runs; ?history=true adds the
+    SKU's earlier traces. Falls back to a live forecast when no run has traced the SKU yet
+    (or with ?recompute=true).
     """
     try:
+        recompute = request.GET.get('recompute', 'false').lower() in ('1', 'true', 'yes')
+        include_history = request.GET.get('history', 'false').lower() in ('1', 'true', 'yes')
+        trace = None if recompute else forecast_service.get_decision_trace(sku_id, include_history=include_history)
+        if trace:
+            response = {
+                'status': 'success',
+                'sku_id': sku_id,
+                'explanation': trace['justification'],
+                'model_logic': {
+                    'ses': trace['ses_pred'],
+                    'regression': trace['reg_pred'],
+                    'yoy_seasonal': trace['yoy_seasonal'],
+                    'trend': trace['trend'],
+                    'volatility': trace['volatility'],
+                    'demand_class': trace['demand_class']
+                },
+                'decision': {
+                    'selected_model': trace['selected_model'],
+                    'candidates': {
+                        'SES': {'forecast': trace['ses_pred'], 'wape': trace['wape_ses']},
+                        'REG': {'forecast': trace['reg_pred'], 'wape': trace['wape_reg']},
+                        'HYBRID': {'forecast': trace['hybrid_pred'], 'wape': trace['wape_hybrid']},
+                    },
+                    'adjustment': dict(trace['adjustment_detail'], combined_factor=trace['adjustment_factor']),
+                    'formula': trace['formula'],
+                    'final_forecast': trace['final_forecast'],
+                    'confidence': trace['confidence'],
+                },
+                'trace': {'run_id': trace['run_id'], 'run_at': trace['run_at'],
+                          'target_date': trace['target_date'], 'source': trace['source']}
+            }
+            if include_history:
+                response['history'] = [
+                    {key: item[key] for key in ('run_id', 'run_at', 'target_date', 'selected_model',
+                                                'final_forecast', 'confidence', 'wape_ses', 'wape_reg', 'wape_hybrid')}
+                    for item in trace['history']
+                ]
+            return JsonResponse(response)
+
         result = forecast_service.get_sku_forecast(sku_id)
         if result:
             return JsonResponse({
@@ -1,9 +1,9 @@
 import logging
 import os
 import json
-import time
 from mistralai import Mistral
 from dotenv import load_dotenv
+from .llm_client import AsyncLLMClient, HTTPTransport, LLMResponseCache, MistralTransport
 
 logger = logging.getLogger("DecisionLayer")
 
@@ -13,16 +13,41 @@ class ForecastDecisionLayer:
     It interprets statistical data to select/adjust the best forecast.
     """
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, transport=None, cache_path=None):
+        """
+        :param transport: Optional LLM transport (e.g. HTTPTransport to a local stub server);
+                          defaults to the Mistral SDK, or MISTRAL_BASE_URL over HTTP when set
+        :param cache_path: JSON-lines file of cached LLM responses (reports/llm_response_cache.jsonl)
+        """
         load_dotenv()
         self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
         self.model = os.getenv("MISTRAL_MODEL", "mistral-tiny")
         self.enable_llm_numeric_forecast = os.getenv("ENABLE_LLM_NUMERIC_FORECAST", "0") == "1"
+        base_url = os.getenv("MISTRAL_BASE_URL")
+        if transport is None and base_url:
+            transport = HTTPTransport(base_url, api_key=self.api_key)
         if self.api_key:
             self.client = Mistral(api_key=self.api_key)
+            if transport is None:
+                transport = MistralTransport(self.client)
         else:
-            logger.warning("No Mistral API key found. Falling back to deterministic simulation.")
             self.client = None
+            if transport is None:
+                logger.warning("No Mistral API key found. Falling back to deterministic simulation.")
+
+        # Rate limits sized for small API tiers (the old client slept 0.5s before every call)
+        if cache_path is None:
+            cache_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "llm_response_cache.jsonl")
+        self.llm_client = None
+        if transport is not None:
+            self.llm_client = AsyncLLMClient(
+                transport,
+                model=self.model,
+                rate_per_second=float(os.getenv("MISTRAL_RATE_PER_SECOND", "2")),
+                max_concurrency=int(os.getenv("MISTRAL_MAX_CONCURRENCY", "4")),
+                max_retries=int(os.getenv("MISTRAL_MAX_RETRIES", "3")),
+                cache=LLMResponseCache(cache_path),
+            )
 
         # Operational thresholds
         self.strong_trend_threshold = 0.1
@@ -130,34 +155,32 @@ class ForecastDecisionLayer:
         """
         Executes a real call to Mistral AI API and validates the output.
         """
-        if (not self.client) or (not self.enable_llm_numeric_forecast):
-            return self.simulate_llm_call(sku_data)
+        return self.call_mistral_api_batch([sku_data])[0]
 
-        # Rate limiting preventer for small API tiers
-        time.sleep(0.5)
+    def call_mistral_api_batch(self, sku_data_list):
+        """
+        Decides a batch of SKUs: prompts are sent concurrently through the rate-limited, cached
+        LLM client; any failed or invalid response falls back to the deterministic simulation.
+        """
+        if (not self.llm_client) or (not self.enable_llm_numeric_forecast):
+            return [self.simulate_llm_call(sku_data) for sku_data in sku_data_list]
 
-        prompt = self.prepare_llm_prompt(sku_data)
-        
-        try:
-            response = self.client.chat.complete(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content
-            raw_json = json.loads(content)
-            
-            # Step 3 — Validate LLM Output
-            validated_output = self.validate_and_sanitize(raw_json, sku_data)
-            return validated_output
+        prompts = [self.prepare_llm_prompt(sku_data) for sku_data in sku_data_list]
+        contents = self.llm_client.complete_many(prompts)
 
-        except Exception as e:
-            logger.error(f"Mistral API Error: {e}")
-            return self.simulate_llm_call(sku_data)
+        results = []
+        for sku_data, content in zip(sku_data_list, contents):
+            if content is None:
+                results.append(self.simulate_llm_call(sku_data))
+                continue
+            try:
+                raw_json = json.loads(content)
+                # Step 3 — Validate LLM Output
+                results.append(self.validate_and_sanitize(raw_json, sku_data))
+            except Exception as e:
+                logger.error(f"Mistral API Error: {e}")
+                results.append(self.simulate_llm_call(sku_data))
+        return results
 
     def validate_and_sanitize(self, raw_json, sku_data):
         """
@@ -0,0 +1,83 @@
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DemandRanking:
+    """
+    Incrementally maintained ranking of per-SKU forecasts, used to pick high-demand SKUs for
+    predictive slotting without recomputing the catalog.
+    - Positive forecasts are kept as a sorted list of (forecast, product id); updating one SKU is a
+      binary search plus one list insert/delete.
+    - `quantile` reads the linear-interpolated quantile (np.quantile's default) straight from the
+      sorted list, and `above_quantile` / `top_k` slice it, so a selection costs O(k).
+    - `source` and `revision` record what the ranking currently reflects (e.g. a materialized date
+      or the online state revision), so callers only feed it the SKUs that changed.
+    """
+
+    def __init__(self):
+        self.values: Dict[int, float] = {}
+        self._sorted: List[Tuple[float, int]] = []
+        self.source: Optional[str] = None
+        self.revision = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def clear(self, source: Optional[str] = None):
+        self.values = {}
+        self._sorted = []
+        self.source = source
+        self.revision = 0
+
+    def replace(self, forecasts: Iterable[Tuple[int, float]], source: Optional[str] = None):
+        """Resets the ranking to `forecasts` with one sort."""
+        self.values = {int(pid): float(value) for pid, value in forecasts}
+        self._sorted = sorted((value, pid) for pid, value in self.values.items() if value > 0)
+        self.source = source
+        self.revision = 0
+
+    def update(self, pid: int, value: float):
+        pid, value = int(pid), float(value)
+        previous = self.values.get(pid)
+        if previous == value:
+            return
+        if previous is not None and previous > 0:
+            del self._sorted[bisect.bisect_left(self._sorted, (previous, pid))]
+        self.values[pid] = value
+        if value > 0:
+            bisect.insort(self._sorted, (value, pid))
+
+    def remove(self, pid: int):
+        previous = self.values.pop(int(pid), None)
+        if previous is not None and previous > 0:
+            del self._sorted[bisect.bisect_left(self._sorted, (previous, int(pid)))]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """`q`-quantile of the positive forecasts (None when there are none)."""
+        n = len(self._sorted)
+        if n == 0:
+            return None
+        position = q * (n - 1)
+        lower = int(math.floor(position))
+        upper = min(lower + 1, n - 1)
+        low, high = self._sorted[lower][0], self._sorted[upper][0]
+        weight = position - lower
+        # Same two-sided interpolation as numpy, so thresholds match np.quantile bit for bit
+        if weight >= 0.5:
+            return high - (high - low) * (1 - weight)
+        return low + (high - low) * weight
+
+    def above_quantile(self, q: float) -> List[int]:
+        """SKUs whose positive forecast is at or above the `q`-quantile, highest first."""
+        threshold = self.quantile(q)
+        if threshold is None:
+            return []
+        start = bisect.bisect_left(self._sorted, (threshold, -math.inf))
+        return [pid for _, pid in reversed(self._sorted[start:])]
+
+    def top_k(self, k: int) -> List[int]:
+        """The `k` SKUs with the largest positive forecasts, highest first."""
+        if k <= 0:
+            return []
+        return [pid for _, pid in reversed(self._sorted[-k:])]
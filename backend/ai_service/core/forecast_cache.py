@@ -0,0 +1,108 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger("ForecastCache")
+
+
+class ForecastResultCache:
+    """
+    In-process cache of per-SKU forecast results keyed by (SKU, target date) and tagged with the
+    data version the result was computed from. A lookup whose version differs from the stored one
+    is a miss, so new demand/transaction rows for a SKU invalidate only that SKU's entries.
+    Concurrent misses on the same key are coalesced (single-flight): one thread computes, the
+    others wait for its result. Entries are evicted least-recently-used beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Hashable, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, str, Hashable], "_Flight"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pid: int, target: str, version: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((int(pid), target))
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end((int(pid), target))
+            return entry[1]
+
+    def get_or_compute(self, pid: int, target: str, version: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the cached result for (pid, target, version) or computes it once for all concurrent callers."""
+        key = (int(pid), target)
+        flight_key = (int(pid), target, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[flight_key] = flight
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+            flight.fail(e)
+            raise
+
+        with self._lock:
+            if result is not None:
+                self._entries[key] = (version, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._inflight.pop(flight_key, None)
+        flight.resolve(result)
+        return result
+
+    def invalidate(self, pid: Optional[int] = None):
+        """Drops every entry of `pid`, or the whole cache when pid is None."""
+        with self._lock:
+            if pid is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == int(pid)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class _Flight:
+    """Result slot shared by the callers waiting on one computation."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def resolve(self, result):
+        self._result = result
+        self._done.set()
+
+    def fail(self, error: BaseException):
+        self._error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
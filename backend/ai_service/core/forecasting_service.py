@@ -1,45 +1,230 @@
 import pandas as pd
 import numpy as np
+import hashlib
+import json
 import logging
+import zlib
 import uuid
 from datetime import datetime, timedelta
 import os
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Tuple
 from sklearn.linear_model import LinearRegression
 from .decision_layer import ForecastDecisionLayer
 from .learning_engine import LearningFeedbackEngine
+from .stock_ledger import StockLedger
+from .input_cache import ColumnarFrameCache
+from .parallel_forecast import ParallelForecastRunner
+from .forecast_cache import ForecastResultCache
+from .backtest import BacktestHarness
+from .log_queue import configure_queued_logging
+from .trace_store import DecisionTraceStore
+from .online_state import OnlineModelState
+from .triage import DemandTriage
+from .demand_ranking import DemandRanking
 
 # Import Django models
+from django.conf import settings
+from django.db.models import Count, Sum
 from django.forms.models import model_to_dict
 from Produit.models import Produit, HistoriqueDemande, DelaisApprovisionnement, PolitiqueReapprovisionnement, cmd_achat_ouvertes_opt
 from Transaction.models import Transaction, LigneTransaction
-from warhouse.models import Stock, Emplacement, Entrepot
+from warhouse.models import Stock, Emplacement, Entrepot, PrevisionIA
 
 # Set up paths for reports
 REPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports")
 os.makedirs(REPORT_DIR, exist_ok=True)
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(REPORT_DIR, "forecasting_service.log")),
-        logging.StreamHandler()
-    ]
+# Set up logging: queued, size-rotated file + console
+configure_queued_logging(
+    os.path.join(REPORT_DIR, "forecasting_service.log"),
+    max_bytes=getattr(settings, 'FORECAST_LOG_MAX_BYTES', 10 * 1024 * 1024),
+    backup_count=getattr(settings, 'FORECAST_LOG_BACKUP_COUNT', 5),
 )
 logger = logging.getLogger("ForecastingService")
+trace_logger = logging.getLogger("ForecastingService.DecisionTrace")
+
+class DemandPartitionIndex:
+    """
+    Per-SKU partition of the demand history, built once per load.
+    Rows are stored contiguously by SKU (date-sorted inside each SKU) in flat NumPy arrays;
+    `offsets[i]:offsets[i + 1]` is the slice of the i-th SKU. Replaces the per-SKU boolean
+    scans of the full history (O(SKUs x rows)) with O(1) slicing.
+    """
+    def __init__(self, history: pd.DataFrame):
+        if history is None or history.empty or 'id_produit' not in history.columns:
+            self.product_ids = np.array([], dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.dates = np.array([], dtype='datetime64[ns]')
+            self.quantities = np.array([], dtype=np.float64)
+            self.positions = {}
+            return
+
+        # factorize keeps first-appearance order, i.e. the order of demand_history['id_produit'].unique()
+        codes, uniques = pd.factorize(history['id_produit'], sort=False)
+        dates = pd.to_datetime(history['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        quantities = pd.to_numeric(history['quantite_demande'], errors='coerce').to_numpy(dtype=np.float64)
+
+        order = np.lexsort((dates, codes))
+        counts = np.bincount(codes, minlength=len(uniques))
+        self.product_ids = np.asarray(uniques)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.dates = dates[order]
+        self.quantities = quantities[order]
+        self.positions = {int(pid): idx for idx, pid in enumerate(self.product_ids)}
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def bounds(self, product_id):
+        idx = self.positions.get(int(product_id))
+        if idx is None:
+            return 0, 0
+        return int(self.offsets[idx]), int(self.offsets[idx + 1])
+
+    def count(self, product_id) -> int:
+        start, end = self.bounds(product_id)
+        return end - start
+
+    def arrays(self, product_id):
+        """(dates, quantities) views for one SKU, sorted by date."""
+        start, end = self.bounds(product_id)
+        return self.dates[start:end], self.quantities[start:end]
+
+    def history(self, product_id) -> pd.DataFrame:
+        """Demand history frame of one SKU with the columns used by the forecasting models."""
+        dates, quantities = self.arrays(product_id)
+        return self.frame(product_id, dates, quantities)
+
+    @staticmethod
+    def frame(product_id, dates, quantities) -> pd.DataFrame:
+        return pd.DataFrame({
+            'id_produit': np.full(len(dates), int(product_id), dtype=np.int64),
+            'date': dates,
+            'quantite_demande': quantities,
+        })
+
+class YoYCalendarIndex:
+    """
+    (SKU, month, day) -> demand calendar for year-over-year lookups, built once per data load.
+    Rows are sorted by (SKU, month, day, year) with a running demand sum, so the demand of the same
+    day/month in the years before a target date is one dict lookup plus a search over a handful of years.
+    """
+    def __init__(self, product_ids, offsets, dates, quantities):
+        self.positions = {int(pid): idx for idx, pid in enumerate(product_ids)}
+        counts = np.diff(np.asarray(offsets, dtype=np.int64))
+        codes = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        stamps = pd.DatetimeIndex(np.asarray(dates, dtype='datetime64[ns]'))
+        valid = ~stamps.isna()
+        codes = codes[valid]
+        stamps = stamps[valid]
+        quantities = np.asarray(quantities, dtype=np.float64)[valid]
+
+        keys = self._key(codes, stamps.month.to_numpy(dtype=np.int64), stamps.day.to_numpy(dtype=np.int64))
+        years = stamps.year.to_numpy(dtype=np.int64)
+        order = np.lexsort((years, keys))
+        keys = keys[order]
+        self.years = years[order]
+        self.cumulative = np.concatenate(([0.0], np.cumsum(quantities[order])))
+
+        unique_keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        self.slots = dict(zip(unique_keys.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    @classmethod
+    def from_partition(cls, demand_index: DemandPartitionIndex) -> 'YoYCalendarIndex':
+        return cls(demand_index.product_ids, demand_index.offsets, demand_index.dates, demand_index.quantities)
+
+    @staticmethod
+    def _key(code, month, day):
+        return code * 10000 + month * 100 + day
+
+    def lookup(self, product_id, target_date=None) -> Dict:
+        """Same result as DeterministicForecastModel.get_yoy_seasonal_demand on the SKU's full history."""
+        if target_date is None:
+            target_date = datetime.now()
+        code = self.positions.get(int(product_id))
+        slot = None if code is None else self.slots.get(self._key(code, target_date.month, target_date.day))
+        if slot is None:
+            return {'yoy_avg': 0.0, 'yoy_count': 0, 'has_pattern': False}
+
+        start, end = slot
+        stop = start + int(np.searchsorted(self.years[start:end], target_date.year, side='left'))
+        yoy_count = stop - start
+        if yoy_count == 0:
+            return {'yoy_avg': 0.0, 'yoy_count': 0, 'has_pattern': False}
+        return {
+            'yoy_avg': float((self.cumulative[stop] - self.cumulative[start]) / yoy_count),
+            'yoy_count': yoy_count,
+            'has_pattern': yoy_count >= 2  # At least 2 years of history
+        }
+
+    def lookup_horizon(self, product_id, start_date, horizon: int) -> List[Dict]:
+        """YoY lookups for each day of a multi-day horizon starting at `start_date`."""
+        return [self.lookup(product_id, start_date + timedelta(days=offset)) for offset in range(max(0, int(horizon)))]
 
 class DataLoader:
-    def __init__(self, data_path=None, is_csv=False):
+    EMPLACEMENT_FIELDS = (
+        'id_emplacement', 'code_emplacement', 'statut', 'actif', 'zone',
+        'id_entrepot_id', 'storage_floor_id', 'picking_floor_id', 'mise_a_jour_le'
+    )
+
+    # ORM FK attnames -> schema expected by forecasting logic (see _normalize_forecasting_columns)
+    FK_RENAMES = {'id_produit_id': 'id_produit', 'id_transaction_id': 'id_transaction'}
+    # Bump when the cleaning logic changes so cached snapshots are invalidated
+    INPUT_CACHE_VERSION = 1
+    CACHED_FRAMES = ('demand_history', 'transaction_lines', 'products', 'transactions', 'stocks', 'emplacements')
+
+    def __init__(self, data_path=None, is_csv=False, refresh_interval_seconds=300, chunk_size=5000,
+                 use_input_cache=True, cache_max_age_hours=24):
+        """
+        :param refresh_interval_seconds: Minimum delay between incremental Supabase refreshes (None disables them)
+        :param chunk_size: Rows per server-side cursor fetch
+        :param use_input_cache: Reload cleaned inputs from the columnar snapshot when it is still valid
+        :param cache_max_age_hours: Supabase snapshots older than this trigger a full reload
+        """
         self.data_path = data_path
         self.is_csv = is_csv
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.chunk_size = chunk_size
+        self.watermarks = {}  # Per-table high-water marks of the Supabase source
+        self._last_refresh = None
         self.demand_history = None
         self.transactions = None
         self.transaction_lines = None
         self.products = None
         self.stocks = None
         self.emplacements = None
+        self._demand_index = None
+        self._indexed_history = None
+        self._yoy_index = None
+        self._frames_cleaned = False
+        self._cached_stock = None
+        self.data_generation = 0  # Bumped on every full (re)load
+        self.sku_versions = {}  # id_produit -> bumped when incremental refreshes bring rows for that SKU
+        self.input_cache = ColumnarFrameCache(os.path.join(REPORT_DIR, "input_cache")) if use_input_cache else None
+        self.cache_max_age_hours = cache_max_age_hours
+        self._input_fingerprint = None
+        self.stock_ledger = StockLedger(os.path.join(REPORT_DIR, "stock_ledger.json"))
+
+    @property
+    def demand_index(self) -> DemandPartitionIndex:
+        """Per-SKU partition of demand_history, rebuilt only when the frame is replaced."""
+        if self._demand_index is None or self._indexed_history is not self.demand_history:
+            self._demand_index = DemandPartitionIndex(self.demand_history)
+            self._indexed_history = self.demand_history
+            self._yoy_index = None
+        return self._demand_index
+
+    @property
+    def yoy_index(self) -> YoYCalendarIndex:
+        """Year-over-year calendar of demand_history, rebuilt together with demand_index."""
+        demand_index = self.demand_index
+        if self._yoy_index is None:
+            self._yoy_index = YoYCalendarIndex.from_partition(demand_index)
+        return self._yoy_index
+
+    def get_product_history(self, product_id) -> pd.DataFrame:
+        return self.demand_index.history(product_id)
 
     def load_and_clean(self):
         if (
@@ -49,8 +234,16 @@ class DataLoader:
             and self.transactions is not None
             and not self.demand_history.empty
         ):
+            self.refresh()
             return
-            
+
+        self._frames_cleaned = False
+        # A full (re)load invalidates every per-SKU version
+        self.data_generation += 1
+        self.sku_versions = {}
+        if self._load_from_input_cache():
+            return
+
         if self.data_path is None:
             logger.info("No data path provided. Loading from Supabase (Django Models)...")
             self._load_from_django()
@@ -125,47 +318,41 @@ class DataLoader:
         if self.transaction_lines is not None and not self.transaction_lines.empty and 'id_transaction' in self.transaction_lines.columns:
             self.transaction_lines['id_transaction'] = self.transaction_lines['id_transaction'].astype(str).str.strip()
 
+    def _fetch_frame(self, queryset) -> pd.DataFrame:
+        """Streams a .values() queryset through a server-side cursor into a DataFrame."""
+        return pd.DataFrame.from_records(list(queryset.iterator(chunk_size=self.chunk_size)))
+
     def _load_from_django(self):
         """Fetches data directly from Supabase via Django ORM."""
         try:
             # 1. Products
             prods = Produit.objects.all().values()
-            self.products = pd.DataFrame(list(prods))
+            self.products = self._fetch_frame(prods)
             
             # 2. Demand History
             history = HistoriqueDemande.objects.all().values()
-            self.demand_history = pd.DataFrame(list(history))
+            self.demand_history = self._fetch_frame(history)
             
             # 3. Transactions & Lines - Now safe to use .values() with db_column fix
             transactions = Transaction.objects.all().values(
                 'id_transaction', 'type_transaction', 'reference_transaction', 
                 'cree_le', 'statut', 'notes'
             )
-            self.transactions = pd.DataFrame(list(transactions))
+            self.transactions = self._fetch_frame(transactions)
             
             lines = LigneTransaction.objects.all().values()
-            self.transaction_lines = pd.DataFrame(list(lines))
+            self.transaction_lines = self._fetch_frame(lines)
             
             # 4. Stocks (Initial Quantities)
             stocks = Stock.objects.all().values()
-            self.stocks = pd.DataFrame(list(stocks))
+            self.stocks = self._fetch_frame(stocks)
             
             # 5. Emplacements (Occupancy State)
             # REQ: Join with main storage units for real-time digital twin visualization
-            emplacements = Emplacement.objects.all().values(
-                'id_emplacement', 'code_emplacement', 'statut', 'actif', 'zone', 
-                'id_entrepot_id', 'storage_floor_id', 'picking_floor_id'
-            )
-            # Create a lookup for products in emplacements
-            stock_lookup = {s['id_emplacement_id']: s['id_produit_id'] for s in self.stocks.to_dict('records') if s.get('quantite', 0) > 0}
-            
-            empls_list = list(emplacements)
-            for e in empls_list:
-                e['id_produit_id'] = stock_lookup.get(e['id_emplacement'])
-                if e['id_produit_id']:
-                    e['statut'] = 'OCCUPIED'
-            
-            self.emplacements = pd.DataFrame(empls_list)
+            emplacements = Emplacement.objects.all().values(*self.EMPLACEMENT_FIELDS)
+            self.emplacements = self._merge_stock_into_emplacements(list(emplacements), self.stocks.to_dict('records'))
+
+            self._reset_watermarks()
             
             logger.info(f"Successfully fetched {len(self.products)} products and {len(self.demand_history)} history points from Supabase.")
         except Exception as e:
@@ -178,21 +365,263 @@ class DataLoader:
             self.stocks = pd.DataFrame()
             self.emplacements = pd.DataFrame()
 
+    @staticmethod
+    def _column_max(df, column):
+        if df is None or df.empty or column not in df.columns:
+            return None
+        value = df[column].max()
+        return None if pd.isna(value) else value
+
+    def _reset_watermarks(self):
+        """High-water marks taken from freshly loaded (raw) frames."""
+        self.watermarks = {
+            'products_count': 0 if self.products is None else len(self.products),
+            'demand_history_id': self._column_max(self.demand_history, 'id'),
+            'transactions_cree_le': self._column_max(self.transactions, 'cree_le'),
+            'stocks_mise_a_jour_le': self._column_max(self.stocks, 'mise_a_jour_le'),
+            'emplacements_mise_a_jour_le': self._column_max(self.emplacements, 'mise_a_jour_le'),
+        }
+        self._last_refresh = datetime.now()
+
+    def refresh(self, force=False) -> bool:
+        """
+        Incremental refresh of the Supabase source: only rows past the per-table high-water marks are
+        fetched (server-side cursors) and merged into the in-memory frames.
+        - HistoriqueDemande: new rows by primary key, aggregated into the cleaned daily history.
+        - Transaction / LigneTransaction: transactions created at or after the last cree_le, with their lines.
+        - Stock / Emplacement: rows whose mise_a_jour_le moved forward, upserted by primary key.
+        - Produit (no timestamp): reloaded when the row count changes.
+        Deleted rows are only picked up by a full reload. Returns True when a refresh ran.
+        """
+        if self.data_path is not None or not self.watermarks:
+            return False
+        if not force:
+            if self.refresh_interval_seconds is None:
+                return False
+            if self._last_refresh is not None and (datetime.now() - self._last_refresh).total_seconds() < self.refresh_interval_seconds:
+                return False
+
+        marks = self.watermarks
+        try:
+            if Produit.objects.count() != marks.get('products_count'):
+                products = self._fetch_frame(Produit.objects.all().values())
+                products.columns = [str(col).strip() for col in products.columns]
+                self.products = self._clean_df(products) if self._frames_cleaned else products
+                marks['products_count'] = len(products)
+
+            history_qs = HistoriqueDemande.objects.all()
+            if marks.get('demand_history_id') is not None:
+                history_qs = history_qs.filter(id__gt=marks['demand_history_id'])
+            new_history = self._fetch_frame(history_qs.order_by('id').values())
+            if not new_history.empty:
+                marks['demand_history_id'] = self._column_max(new_history, 'id')
+                new_history = self._prepare_new_rows(new_history)
+                self._bump_sku_versions(new_history)
+                if self._frames_cleaned:
+                    merged = pd.concat([self.demand_history, self._clean_demand_history(new_history)], ignore_index=True)
+                    merged = merged.groupby(['id_produit', 'date'], as_index=False)['quantite_demande'].sum()
+                    self.demand_history = merged.sort_values(['id_produit', 'date'])
+                else:
+                    self.demand_history = pd.concat([self.demand_history, new_history], ignore_index=True)
+
+            transaction_qs = Transaction.objects.all()
+            line_qs = LigneTransaction.objects.all()
+            if marks.get('transactions_cree_le') is not None:
+                # >= keeps same-timestamp rows committed after the last refresh; rows already loaded are dropped below
+                transaction_qs = transaction_qs.filter(cree_le__gte=marks['transactions_cree_le'])
+                line_qs = line_qs.filter(id_transaction__cree_le__gte=marks['transactions_cree_le'])
+            new_transactions = self._fetch_frame(transaction_qs.values(
+                'id_transaction', 'type_transaction', 'reference_transaction', 'cree_le', 'statut', 'notes'
+            ))
+            new_transactions = self._drop_loaded_transactions(new_transactions)
+            if not new_transactions.empty:
+                marks['transactions_cree_le'] = self._column_max(new_transactions, 'cree_le')
+                new_transactions = self._prepare_new_rows(new_transactions)
+                new_lines = self._prepare_new_rows(self._fetch_frame(line_qs.values()))
+                new_lines = new_lines[new_lines['id_transaction'].astype(str).isin(
+                    new_transactions['id_transaction'].astype(str))] if not new_lines.empty else new_lines
+                self._bump_sku_versions(new_lines)
+                if self._frames_cleaned:  # Frames already went through load_and_clean_wrapper
+                    new_transactions = self._clean_df(new_transactions, 'cree_le')
+                self.transactions = self._upsert(self.transactions, new_transactions, ['id_transaction'])
+                line_keys = ['id'] if 'id' in new_lines.columns else ['id_transaction', 'no_ligne']
+                self.transaction_lines = self._upsert(self.transaction_lines, new_lines, line_keys)
+
+            stock_qs = Stock.objects.all()
+            if marks.get('stocks_mise_a_jour_le') is not None:
+                stock_qs = stock_qs.filter(mise_a_jour_le__gt=marks['stocks_mise_a_jour_le'])
+            new_stocks = self._fetch_frame(stock_qs.values())
+            if not new_stocks.empty:
+                marks['stocks_mise_a_jour_le'] = self._column_max(new_stocks, 'mise_a_jour_le')
+                self._bump_sku_versions(new_stocks)
+                if self.stocks is not None and 'id_produit' in self.stocks.columns:
+                    new_stocks = new_stocks.rename(columns={'id_produit_id': 'id_produit'})
+                self.stocks = self._upsert(self.stocks, new_stocks, ['id_stock'])
+
+            changed_emplacements = self.fetch_emplacement_changes(marks.get('emplacements_mise_a_jour_le'))
+            if not changed_emplacements.empty:
+                latest = self._column_max(changed_emplacements, 'mise_a_jour_le')
+                if latest is not None:
+                    marks['emplacements_mise_a_jour_le'] = latest
+                self.emplacements = self._upsert(self.emplacements, changed_emplacements, ['id_emplacement'])
+
+            self._normalize_id_types()
+            self._last_refresh = datetime.now()
+            logger.info(f"Incremental refresh: +{len(new_history)} history rows, +{len(new_transactions)} transactions, "
+                        f"{len(new_stocks)} stock and {len(changed_emplacements)} emplacement updates.")
+            return True
+        except Exception as e:
+            logger.error(f"Error refreshing data from Supabase: {e}")
+            return False
+
+    def _drop_loaded_transactions(self, new_transactions: pd.DataFrame) -> pd.DataFrame:
+        """Drops the rows re-fetched at the watermark timestamp (already merged by an earlier refresh)."""
+        if new_transactions.empty or self.transactions is None or 'id_transaction' not in self.transactions.columns:
+            return new_transactions
+        loaded = self.transactions['id_transaction'].astype(str)
+        return new_transactions[~new_transactions['id_transaction'].astype(str).isin(loaded)]
+
+    def _bump_sku_versions(self, rows: pd.DataFrame):
+        column = 'id_produit' if 'id_produit' in rows.columns else 'id_produit_id'
+        if rows.empty or column not in rows.columns:
+            return
+        for pid in pd.to_numeric(rows[column], errors='coerce').dropna().unique():
+            self.sku_versions[int(pid)] = self.sku_versions.get(int(pid), 0) + 1
+
+    def data_version(self, product_id):
+        """Version of the inputs of one SKU: changes on full reloads and when new rows for it are merged."""
+        return self.data_generation, self.sku_versions.get(int(product_id), 0)
+
+    def _prepare_new_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return df
+        df.columns = [str(col).strip() for col in df.columns]
+        df = df.rename(columns={k: v for k, v in self.FK_RENAMES.items() if v not in df.columns})
+        if 'id_produit' in df.columns:
+            numeric_ids = pd.to_numeric(df['id_produit'], errors='coerce')
+            df = df.loc[numeric_ids.notna()].copy()
+            df['id_produit'] = numeric_ids.loc[numeric_ids.notna()].astype(int)
+        return df
+
+    @staticmethod
+    def _upsert(frame, new_rows, keys):
+        """Appends new_rows to frame, replacing rows that share the same key."""
+        if frame is None or frame.empty:
+            return new_rows.reset_index(drop=True)
+        if any(key not in frame.columns or key not in new_rows.columns for key in keys):
+            return pd.concat([frame, new_rows], ignore_index=True)
+        merged = pd.concat([frame, new_rows], ignore_index=True)
+        return merged.drop_duplicates(subset=keys, keep='last').reset_index(drop=True)
+
+    def _merge_stock_into_emplacements(self, empls_list, stock_records):
+        """Marks emplacements holding stock as OCCUPIED and stamps them with the latest Emplacement/Stock update."""
+        # Create a lookup for products in emplacements
+        stock_lookup = {s['id_emplacement_id']: s['id_produit_id'] for s in stock_records if s.get('quantite', 0) > 0}
+        stock_updates = {}
+        for s in stock_records:
+            ts = s.get('mise_a_jour_le')
+            key = s.get('id_emplacement_id')
+            if ts is not None and (key not in stock_updates or ts > stock_updates[key]):
+                stock_updates[key] = ts
+
+        for e in empls_list:
+            e['id_produit_id'] = stock_lookup.get(e['id_emplacement'])
+            if e['id_produit_id']:
+                e['statut'] = 'OCCUPIED'
+            stock_ts = stock_updates.get(e['id_emplacement'])
+            if stock_ts is not None and (e.get('mise_a_jour_le') is None or stock_ts > e['mise_a_jour_le']):
+                e['mise_a_jour_le'] = stock_ts
+
+        return pd.DataFrame(empls_list)
+
+    def fetch_emplacement_changes(self, since=None):
+        """
+        Delta feed for the digital twin: emplacements whose row or stock changed after `since`.
+        File-based sources are static snapshots, so they never produce changes.
+        """
+        if self.data_path is not None:
+            return pd.DataFrame()
+        try:
+            emplacement_qs = Emplacement.objects.all()
+            stock_qs = Stock.objects.all()
+            if since is not None:
+                changed_ids = set(emplacement_qs.filter(mise_a_jour_le__gt=since).values_list('id_emplacement', flat=True))
+                changed_ids.update(stock_qs.filter(mise_a_jour_le__gt=since).values_list('id_emplacement_id', flat=True))
+                if not changed_ids:
+                    return pd.DataFrame()
+                emplacement_qs = emplacement_qs.filter(id_emplacement__in=changed_ids)
+                stock_qs = stock_qs.filter(id_emplacement_id__in=changed_ids)
+
+            empls_list = list(emplacement_qs.values(*self.EMPLACEMENT_FIELDS))
+            stock_records = list(stock_qs.values('id_emplacement_id', 'id_produit_id', 'quantite', 'mise_a_jour_le'))
+            return self._merge_stock_into_emplacements(empls_list, stock_records)
+        except Exception as e:
+            logger.error(f"Error fetching emplacement changes from Supabase: {e}")
+            return pd.DataFrame()
+
+    def _compute_input_fingerprint(self):
+        """
+        Files: path, sizes and mtimes. Supabase: database identity only; staleness is handled by
+        the snapshot age and the incremental refresh from the stored watermarks.
+        """
+        if self.data_path is not None:
+            source = self._source_signature()
+        else:
+            db = settings.DATABASES.get('default', {})
+            source = f"supabase|{db.get('HOST', '')}|{db.get('PORT', '')}|{db.get('NAME', '')}"
+        return hashlib.sha1(f"v{self.INPUT_CACHE_VERSION}|{source}".encode("utf-8")).hexdigest()
+
+    def _load_from_input_cache(self) -> bool:
+        if self.input_cache is None:
+            return False
+        self._input_fingerprint = self._compute_input_fingerprint()
+        cached = self.input_cache.load(self._input_fingerprint)
+        if cached is None:
+            return False
+        frames, meta = cached
+
+        if self.data_path is None:
+            created_at = pd.Timestamp(meta.get('created_at')) if meta.get('created_at') else None
+            if created_at is None or (pd.Timestamp.now() - created_at).total_seconds() > self.cache_max_age_hours * 3600:
+                return False
+
+        for name in self.CACHED_FRAMES:
+            setattr(self, name, frames.get(name))
+        self._frames_cleaned = True
+        logger.info(f"Loaded cleaned inputs from columnar cache ({len(self.demand_history)} history rows).")
+
+        if self.data_path is None:
+            self.watermarks = {
+                key: (pd.Timestamp(value) if key.endswith('_le') and value is not None else value)
+                for key, value in meta.get('watermarks', {}).items()
+            }
+            self.refresh(force=True)
+        return True
+
+    def _save_input_cache(self):
+        if self.input_cache is None or self._input_fingerprint is None:
+            return
+        if self.demand_history is None or self.demand_history.empty:
+            return  # Never cache a failed or empty load
+        meta = {'created_at': datetime.now().isoformat()}
+        if self.data_path is None:
+            meta['watermarks'] = {
+                key: (value.isoformat() if hasattr(value, 'isoformat') else value)
+                for key, value in self.watermarks.items()
+            }
+        self.input_cache.save(self._input_fingerprint, {name: getattr(self, name) for name in self.CACHED_FRAMES}, meta)
+
     def load_and_clean_wrapper(self):
         """Main entry point for loading and cleaning."""
         self.load_and_clean()
+        if self._frames_cleaned:
+            return
         self._normalize_forecasting_columns()
         
         # Clean Demand History
         if self.demand_history is not None and not self.demand_history.empty:
             if 'date' in self.demand_history.columns and 'quantite_demande' in self.demand_history.columns and 'id_produit' in self.demand_history.columns:
-                self.demand_history['date'] = pd.to_datetime(self.demand_history['date'], errors='coerce')
-                self.demand_history['quantite_demande'] = pd.to_numeric(self.demand_history['quantite_demande'], errors='coerce')
-                self.demand_history = self.demand_history.dropna(subset=['date', 'id_produit', 'quantite_demande'])
-                self.demand_history = self.demand_history[self.demand_history['quantite_demande'] >= 0]
-                self.demand_history['date'] = self.demand_history['date'].dt.normalize()
-                self.demand_history = self.demand_history.groupby(['id_produit', 'date'], as_index=False)['quantite_demande'].sum()
-                self.demand_history = self.demand_history.sort_values(['id_produit', 'date'])
+                self.demand_history = self._clean_demand_history(self.demand_history)
 
         # Clean Products
         if self.products is not None and not self.products.empty:
@@ -203,9 +632,23 @@ class DataLoader:
             self.transactions = self._clean_df(self.transactions, 'cree_le')
         if self.transaction_lines is not None and not self.transaction_lines.empty:
             self.transaction_lines = self._clean_df(self.transaction_lines)
-            
+
+        self._frames_cleaned = True
+        self._save_input_cache()
         logger.info("Data workflow complete.")
 
+    @staticmethod
+    def _clean_demand_history(history):
+        """Typed, non-negative demand aggregated per (id_produit, day)."""
+        history = history.copy()
+        history['date'] = pd.to_datetime(history['date'], errors='coerce')
+        history['quantite_demande'] = pd.to_numeric(history['quantite_demande'], errors='coerce')
+        history = history.dropna(subset=['date', 'id_produit', 'quantite_demande'])
+        history = history[history['quantite_demande'] >= 0]
+        history['date'] = history['date'].dt.normalize()
+        history = history.groupby(['id_produit', 'date'], as_index=False)['quantite_demande'].sum()
+        return history.sort_values(['id_produit', 'date'])
+
     def _clean_df(self, df, date_col=None):
         # Remove template/dummy rows (commonly 'texte' or 'O')
         if not df.empty and len(df.columns) > 0:
@@ -225,14 +668,28 @@ class DataLoader:
         
         return df.drop_duplicates()
 
+    def _source_signature(self) -> str:
+        """Identifies the data source; file sources include their modification times."""
+        if self.data_path is None:
+            return "supabase"
+        paths = [self.data_path]
+        if os.path.isdir(self.data_path):
+            paths = [os.path.join(self.data_path, name) for name in sorted(os.listdir(self.data_path))]
+        signature = [self.data_path]
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+            except OSError:
+                continue
+        return "|".join(signature)
+
     def get_current_stock(self):
         """
         Step 1 — Compute Current Stock from transactions.
         Stock per SKU = Receipts - Transfers - Picking - Deliveries
+        Balances come from the persisted StockLedger, so only movements newer than its watermark are applied.
         """
-        if hasattr(self, '_cached_stock') and self._cached_stock is not None:
-            return self._cached_stock
-
         logger.info("Computing current stock levels from transaction history.")
         
         # Check if we have data to work with
@@ -246,77 +703,23 @@ class DataLoader:
             self._cached_stock = {}
             return self._cached_stock
         
-        movements = pd.merge(self.transaction_lines, self.transactions, on='id_transaction', how='inner')
-        
-        if movements.empty:
-            logger.warning("No movements found after merging transactions and lines.")
-            self._cached_stock = {}
-            return self._cached_stock
-        
-        # Chronological Integrity Fix: Ensure movements are sorted by date
-        date_col = 'cree_le' if 'cree_le' in movements.columns else None
-        if not date_col:
-            for col in movements.columns:
-                if 'date' in col.lower() or 'cree' in col.lower():
-                    date_col = col
-                    break
-        
-        if date_col:
-            movements[date_col] = pd.to_datetime(movements[date_col], errors='coerce')
-            movements = movements.sort_values(date_col).dropna(subset=[date_col])
-        
-        movements['qty_numeric'] = pd.to_numeric(movements['quantite'], errors='coerce').fillna(0)
-        movements['type_transaction'] = movements['type_transaction'].astype(str).str.strip().fillna('UNKNOWN')
-        
-        # Defined multipliers for chronological flow
-        multipliers = {
-            'RECEIPT': 1, 
-            'DELIVERY': -1, 
-            'PICKING': -1, 
-            'ISSUE': -1, 
-            'TRANSFER': -1, 
-            'ADJUSTMENT': 1
-        }
-        
-        movements['net_change'] = (movements['qty_numeric'] * 
-                                  movements['type_transaction'].str.upper().map(multipliers).fillna(0))
-        
         # 🟢 Requirement FIX: Initialize stock from the Stock snapshot if available
-        sku_stock = {}
+        initial_stock = {}
         if self.stocks is not None and not self.stocks.empty:
             if 'id_produit_id' in self.stocks.columns:
                 self.stocks = self.stocks.rename(columns={'id_produit_id': 'id_produit'})
             
             if 'id_produit' in self.stocks.columns and 'quantite' in self.stocks.columns:
                 # Group by product and sum up initial stocks across all locations
-                initial_stocks = self.stocks.groupby('id_produit')['quantite'].sum().to_dict()
-                for pid, qty in initial_stocks.items():
+                for pid, qty in self.stocks.groupby('id_produit')['quantite'].sum().items():
                     try:
-                        sku_stock[int(pid)] = float(qty)
+                        initial_stock[int(pid)] = float(qty)
                     except ValueError:
                         continue
-                logger.info(f"Initialized stock for {len(sku_stock)} SKUs from physical inventory snapshot.")
 
-        violations = 0
-        
-        for _, row in movements.iterrows():
-            pid = row['id_produit']
-            change = float(row['net_change'])
-            
-            if pid not in sku_stock:
-                sku_stock[pid] = 0.0
-            
-            if sku_stock[pid] + change < 0:
-                violations += 1
-                # Chronological Integrity: Reject/Clip negative stock but track it
-                sku_stock[pid] = 0.0
-            else:
-                sku_stock[pid] += change
-        
-        if violations > 0:
-            logger.warning(f"Chronological Violation: {violations} operations attempted to reduce stock below zero.")
-            
-        self._cached_stock = sku_stock
+        self._cached_stock = self.stock_ledger.update(
+            self.transactions, self.transaction_lines, initial_stock, source=self._source_signature()
+        )
         
         logger.info(f"Calculated stock for {len(self._cached_stock)} SKUs with chronological validation.")
         return self._cached_stock
@@ -332,23 +735,29 @@ class BaselineModel:
 
 class RegressionModel:
     """2️⃣ Linear Regression Forecast: Fit line on past demand and extract trend/prediction."""
+    MIN_POINTS = 3
+
     def __init__(self):
         from sklearn.linear_model import LinearRegression
         self.model = LinearRegression()
 
+    @staticmethod
+    def _insufficient_history():
+        return {
+            'prediction': 0,
+            'slope': 0,
+            'trend': 'stable',
+            'std_dev': 0,
+            'volatility': 'stable',
+            'safety_stock': 0,
+            'trend_strength': 0,
+            'trend_significant': False
+        }
+
     def analyze(self, history, product_id):
         product_history = history[history['id_produit'] == product_id].copy()
-        if len(product_history) < 3:
-            return {
-                'prediction': 0,
-                'slope': 0,
-                'trend': 'stable',
-                'std_dev': 0,
-                'volatility': 'stable',
-                'safety_stock': 0,
-                'trend_strength': 0,
-                'trend_significant': False
-            }
+        if len(product_history) < self.MIN_POINTS:
+            return self._insufficient_history()
             
         # Convert dates to numeric (days since first date)
         first_date = product_history['date'].min()
@@ -361,6 +770,8 @@ class RegressionModel:
         slope = self.model.coef_[0]
         next_day_num = (product_history['date'].max() - first_date).days + 1
         prediction = max(0, self.model.predict([[next_day_num]])[0])
+        residuals = y - self.model.predict(X)
+        residual_std = float(np.sqrt(np.sum(residuals ** 2) / max(len(y) - 2, 1)))
         
         # 3️⃣ Compute Volatility (Standard Deviation)
         std_dev = float(product_history['quantite_demande'].std()) if len(product_history) > 1 else 0.0
@@ -398,9 +809,124 @@ class RegressionModel:
             'safety_stock': float(safety_stock),
             'trend_strength': float(trend_strength),
             'trend_significant': bool(trend_significant),
-            'r2_score': float(r2_score)
+            'r2_score': float(r2_score),
+            'intercept': float(self.model.intercept_),
+            'residual_std': residual_std
+        }
+
+    def analyze_batch(self, history) -> Dict[int, Dict]:
+        """`analyze` for every SKU of a multi-SKU history frame: {id_produit: result}."""
+        codes, uniques = pd.factorize(history['id_produit'], sort=False)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=len(uniques))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        dates = pd.to_datetime(history['date']).to_numpy(dtype='datetime64[ns]')[order]
+        quantities = history['quantite_demande'].to_numpy(dtype=np.float64)[order]
+        return self.analyze_segments(uniques, offsets, dates, quantities)
+
+    def analyze_segments(self, product_ids, offsets, dates, quantities) -> Dict[int, Dict]:
+        """
+        Batched least squares over segmented arrays: SKU i owns rows offsets[i]:offsets[i + 1].
+        Slope, intercept, R² and residual std of every SKU come from per-segment centered sums
+        (np.add.reduceat), giving the same results as one LinearRegression fit per SKU.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        counts = np.diff(offsets)
+        results = {int(pid): self._insufficient_history() for pid, n in zip(product_ids, counts) if n < self.MIN_POINTS}
+
+        valid = counts >= self.MIN_POINTS
+        if not valid.any():
+            return results
+        row_mask = np.repeat(valid, counts)
+        pids = [int(pid) for pid, ok in zip(product_ids, valid) if ok]
+        n_rows = counts[valid]
+        starts = np.concatenate(([0], np.cumsum(n_rows)[:-1]))
+        segment = np.repeat(np.arange(len(n_rows)), n_rows)
+        dates = np.asarray(dates, dtype='datetime64[ns]')[row_mask]
+        y = np.asarray(quantities, dtype=np.float64)[row_mask]
+
+        # Days since the first date of each SKU
+        first_date = np.minimum.reduceat(dates, starts)
+        x = ((dates - first_date[segment]) // np.timedelta64(1, 'D')).astype(np.float64)
+
+        n = n_rows.astype(np.float64)
+        mean_x = np.add.reduceat(x, starts) / n
+        mean_y = np.add.reduceat(y, starts) / n
+        dx = x - mean_x[segment]
+        dy = y - mean_y[segment]
+        s_xx = np.add.reduceat(dx * dx, starts)
+        s_xy = np.add.reduceat(dx * dy, starts)
+        s_yy = np.add.reduceat(dy * dy, starts)
+
+        slope = np.divide(s_xy, s_xx, out=np.zeros_like(s_xy), where=s_xx > 0)
+        intercept = mean_y - slope * mean_x
+        residuals = y - (intercept[segment] + slope[segment] * x)
+        sse = np.add.reduceat(residuals * residuals, starts)
+        # sklearn's r2 convention for constant targets: 1 when perfectly fitted, else 0
+        r2 = np.where(s_yy > 0, 1.0 - sse / np.where(s_yy > 0, s_yy, 1.0), np.where(sse == 0, 1.0, 0.0))
+        residual_std = np.sqrt(sse / np.maximum(n - 2, 1))
+
+        next_day_num = np.maximum.reduceat(x, starts) + 1
+        prediction = np.maximum(0.0, intercept + slope * next_day_num)
+
+        # 3️⃣ Volatility (sample standard deviation) and 4️⃣ Safety Stock (95% Service Level)
+        std_dev = np.sqrt(s_yy / np.maximum(n - 1, 1))
+        safety_stock = 1.65 * std_dev
+
+        trend_strength = np.abs(slope) / np.maximum(mean_y, 1.0)
+        trend_significant = (trend_strength >= 0.001) & (r2 >= 0.05) & (n_rows >= 7)
+
+        for i, pid in enumerate(pids):
+            results[pid] = self._result(prediction[i], slope[i], std_dev[i], safety_stock[i], trend_strength[i],
+                                        trend_significant[i], r2[i], intercept[i], residual_std[i])
+        return results
+
+    @staticmethod
+    def _result(prediction, slope, std_dev, safety_stock, trend_strength, trend_significant, r2, intercept, residual_std) -> Dict:
+        if trend_significant and slope > 0:
+            trend = "increasing"
+        elif trend_significant and slope < 0:
+            trend = "decreasing"
+        else:
+            trend = "stable"
+        return {
+            'prediction': float(prediction),
+            'slope': float(slope),
+            'trend': trend,
+            'std_dev': float(std_dev),
+            'volatility': "stable" if std_dev < 10 else "high fluctuation",
+            'safety_stock': float(safety_stock),
+            'trend_strength': float(trend_strength),
+            'trend_significant': bool(trend_significant),
+            'r2_score': float(r2),
+            'intercept': float(intercept),
+            'residual_std': float(residual_std)
         }
 
+    def from_moments(self, n: int, mean_x: float, mean_y: float, s_xx: float, s_xy: float, s_yy: float,
+                     last_x: float) -> Dict:
+        """
+        `analyze` from running sufficient statistics (count, means and centered co-moments of
+        days since the first date and demand), e.g. the online state of a SKU.
+        `last_x` is the day number of the latest observation.
+        """
+        if n < self.MIN_POINTS:
+            return self._insufficient_history()
+        slope = s_xy / s_xx if s_xx > 0 else 0.0
+        intercept = mean_y - slope * mean_x
+        sse = max(0.0, s_yy - slope * s_xy)
+        if s_yy > 0:
+            r2 = 1.0 - sse / s_yy
+        else:
+            r2 = 1.0 if sse == 0 else 0.0
+        std_dev = float(np.sqrt(max(s_yy, 0.0) / max(n - 1, 1)))
+        trend_strength = abs(slope) / max(mean_y, 1.0)
+        trend_significant = (trend_strength >= 0.001) and (r2 >= 0.05) and (n >= 7)
+        return self._result(
+            max(0.0, intercept + slope * (last_x + 1)), slope, std_dev, 1.65 * std_dev, trend_strength,
+            trend_significant, r2, intercept, float(np.sqrt(sse / max(n - 2, 1)))
+        )
+
 class DeterministicForecastModel:
     """
     Inventory-oriented deterministic forecaster using:
@@ -441,9 +967,11 @@ class DeterministicForecastModel:
     def classify_demand(self, series):
         if len(series) == 0:
             return 'slow_mover'
-        mean_demand = float(series.mean())
-        zero_ratio = float((series == 0).mean())
-        cv = float(series.std() / max(mean_demand, 1.0))
+        return self.classify_stats(float(series.mean()), float((series == 0).mean()), float(series.std()))
+
+    def classify_stats(self, mean_demand, zero_ratio, std_dev):
+        """classify_demand from the mean, share of zero days and standard deviation of a series."""
+        cv = float(std_dev / max(mean_demand, 1.0))
 
         if zero_ratio >= 0.5 or mean_demand < 3:
             return 'slow_mover'
@@ -469,6 +997,9 @@ class DeterministicForecastModel:
 
     def compute_safety_stock(self, series, demand_class):
         std_dev = float(series.std()) if len(series) > 1 else 0.0
+        return self.safety_stock_from_std(std_dev, demand_class)
+
+    def safety_stock_from_std(self, std_dev, demand_class):
         if np.isnan(std_dev):
             std_dev = 0.0
         if demand_class == 'volatile_fast':
@@ -498,11 +1029,15 @@ class DeterministicForecastModel:
         total = volume_score + stability_score + bonus
         return int(min(100, max(10, total)))
 
-    def get_yoy_seasonal_demand(self, history, product_id, target_date=None):
+    def get_yoy_seasonal_demand(self, history, product_id, target_date=None, calendar_index=None):
         """
         Year-over-Year Seasonality: Check demand from the same day/month in previous years.
         This captures annual patterns (holidays, seasonal effects, etc.)
+        With `calendar_index` (a YoYCalendarIndex covering this SKU's history) the lookup is O(1).
         """
+        if calendar_index is not None:
+            return calendar_index.lookup(product_id, target_date)
+
         product_history = history[history['id_produit'] == product_id].copy()
         if product_history.empty:
             return {'yoy_avg': 0.0, 'yoy_count': 0, 'has_pattern': False}
@@ -541,8 +1076,15 @@ class DeterministicForecastModel:
         
         return {'yoy_avg': 0.0, 'yoy_count': 0, 'has_pattern': False}
 
-    def predict(self, history, product_id, regression_model, target_date=None, learning_engine=None):
-        prepared = self._prepare_series(history, product_id)
+    def predict(self, history, product_id, regression_model, target_date=None, learning_engine=None,
+                prepared=None, reg_results=None, calendar_index=None):
+        """
+        :param prepared: Optional output of _prepare_series for this SKU (computed when omitted)
+        :param reg_results: Optional regression of `prepared`, e.g. from RegressionModel.analyze_segments
+        :param calendar_index: Optional YoYCalendarIndex covering this SKU's history
+        """
+        if prepared is None:
+            prepared = self._prepare_series(history, product_id)
         if prepared is None or prepared.empty or prepared['quantite_demande'].sum() == 0:
             return {
                 'forecast': 1.0 if not prepared.empty else 0.0, # Baseline 1 for active but zero-demand SKUs
@@ -564,7 +1106,8 @@ class DeterministicForecastModel:
         alpha = self.default_alpha_fast if demand_class != 'slow_mover' else self.default_alpha_slow
         ses = self.simple_exponential_smoothing(series, alpha=alpha)
 
-        reg_results = regression_model.analyze(prepared, product_id)
+        if reg_results is None:
+            reg_results = regression_model.analyze(prepared, product_id)
         reg_pred = float(reg_results.get('prediction', 0.0))
         trend = reg_results.get('trend', 'stable')
         trend_strength = float(reg_results.get('trend_strength', 0.0))
@@ -572,7 +1115,7 @@ class DeterministicForecastModel:
         volatility = reg_results.get('volatility', 'stable')
 
         # Year-over-Year Seasonality Check
-        yoy_data = self.get_yoy_seasonal_demand(history, product_id, target_date)
+        yoy_data = self.get_yoy_seasonal_demand(history, product_id, target_date, calendar_index=calendar_index)
         yoy_seasonal = yoy_data['yoy_avg']
         has_seasonal_pattern = yoy_data['has_pattern']
 
@@ -711,16 +1254,51 @@ class PreparationOrderService:
         return order_obj
 
 class ForecastingService:
-    def __init__(self, data_path=None, is_csv=False):
+    def __init__(self, data_path=None, is_csv=False, workers=None, trace_sample_rate=None):
+        """
+        :param workers: Processes used by catalog-level forecasts (1 = sequential, 0 = all cores).
+                        Defaults to settings.FORECAST_WORKERS.
+        :param trace_sample_rate: Share of SKUs (0-1) whose decision trace is logged.
+                        Defaults to settings.DECISION_TRACE_SAMPLE_RATE.
+        """
         self.loader = DataLoader(data_path, is_csv=is_csv)
+        if workers is None:
+            workers = getattr(settings, 'FORECAST_WORKERS', 1)
+        self.parallel = ParallelForecastRunner(workers=workers)
+        if trace_sample_rate is None:
+            trace_sample_rate = getattr(settings, 'DECISION_TRACE_SAMPLE_RATE', 1.0)
+        self.trace_sample_rate = float(trace_sample_rate)
+        self.forecast_cache = ForecastResultCache()
+        self.trace_store = DecisionTraceStore(os.path.join(REPORT_DIR, "decision_traces"))
         self.baseline = BaselineModel()
         self.regression = RegressionModel()
         self.learning_engine = LearningFeedbackEngine(
             storage_path=os.path.join(REPORT_DIR, "model_learning.json")
         )
         self.deterministic = DeterministicForecastModel()
+        self.triage = DemandTriage(
+            self.deterministic,
+            storage_path=os.path.join(REPORT_DIR, "triage_state.json"),
+            enabled=getattr(settings, 'FORECAST_TRIAGE', True),
+            revalidate_days=getattr(settings, 'FORECAST_TRIAGE_REVALIDATE_DAYS', 7),
+        )
         self.decision_layer = ForecastDecisionLayer()
         self.order_service = PreparationOrderService()
+        self._online_state = None
+        self.demand_ranking = DemandRanking()
+        self._ranking_refreshed_at = None
+        self._materialized_signature = None
+
+    @property
+    def online_state(self) -> OnlineModelState:
+        """Persisted per-SKU online model state, loaded on first use (workers never touch it)."""
+        if self._online_state is None:
+            self._online_state = OnlineModelState(
+                os.path.join(REPORT_DIR, "online_model_state.json"),
+                alpha_fast=self.deterministic.default_alpha_fast,
+                alpha_slow=self.deterministic.default_alpha_slow,
+            )
+        return self._online_state
 
     def _compute_model_validation_wape(self, history: pd.DataFrame, pid: int, horizon_points: int = 14) -> Dict[str, float]:
         """
@@ -753,34 +1331,46 @@ class ForecastingService:
             }
 
         start_idx = max(7, len(local) - max(5, int(horizon_points)))
-        indices = list(range(start_idx, len(local)))
-
-        ses_errors = []
-        reg_errors = []
-        ses_abs_sum = 0.0
-        reg_abs_sum = 0.0
-        actual_sum = 0.0
-
-        for idx in indices:
-            train = local.iloc[:idx].copy()
-            actual = float(local.iloc[idx]['quantite_demande'])
-            if train.empty:
-                continue
-
-            ses_pred = float(self.deterministic.simple_exponential_smoothing(
-                train['quantite_demande'].astype(float),
-                alpha=self.deterministic.default_alpha_fast
-            ))
-            reg_pred = float(self.regression.analyze(train, pid).get('prediction', ses_pred))
-
-            ses_error = ses_pred - actual
-            reg_error = reg_pred - actual
-
-            ses_errors.append(ses_error)
-            reg_errors.append(reg_error)
-            ses_abs_sum += abs(ses_error)
-            reg_abs_sum += abs(reg_error)
-            actual_sum += abs(actual)
+        indices = np.arange(start_idx, len(local))
+
+        # One-pass rolling backtest: step idx trains on rows [0, idx) and predicts row idx.
+        values = local['quantite_demande'].astype(float).to_numpy()
+        days = (local['date'] - local['date'].iloc[0]).dt.days.to_numpy(dtype=float)
+
+        # SES level after each prefix (same recurrence as simple_exponential_smoothing)
+        alpha = self.deterministic.default_alpha_fast
+        levels = np.empty(len(values))
+        level = float(values[0])
+        levels[0] = level
+        for k in range(1, len(values)):
+            level = alpha * float(values[k]) + (1 - alpha) * level
+            levels[k] = level
+        ses_preds = np.maximum(0.0, levels[indices - 1])
+
+        # OLS on (days, demand) from prefix sufficient statistics (Σx, Σy, Σxy, Σx²),
+        # equivalent to RegressionModel.analyze refitted on each training prefix
+        sum_x = np.cumsum(days)[indices - 1]
+        sum_y = np.cumsum(values)[indices - 1]
+        sum_xy = np.cumsum(days * values)[indices - 1]
+        sum_xx = np.cumsum(days * days)[indices - 1]
+        n = indices.astype(float)
+        mean_x = sum_x / n
+        mean_y = sum_y / n
+        s_xx = sum_xx - n * mean_x * mean_x
+        s_xy = sum_xy - n * mean_x * mean_y
+        slopes = np.divide(s_xy, s_xx, out=np.zeros_like(s_xy), where=s_xx > 1e-12)
+        intercepts = mean_y - slopes * mean_x
+        reg_preds = np.maximum(0.0, intercepts + slopes * (days[indices - 1] + 1.0))
+
+        actuals = values[indices]
+        return self._validation_from_errors(ses_preds - actuals, reg_preds - actuals, actuals)
+
+    @staticmethod
+    def _validation_from_errors(ses_errors: np.ndarray, reg_errors: np.ndarray, actuals: np.ndarray) -> Dict[str, float]:
+        """WAPEs, inverse-WAPE hybrid weights and error variances of one-step SES/REG backtest errors."""
+        ses_abs_sum = float(np.abs(ses_errors).sum())
+        reg_abs_sum = float(np.abs(reg_errors).sum())
+        actual_sum = float(np.abs(actuals).sum())
 
         if actual_sum <= 0:
             wape_ses = 100.0
@@ -794,11 +1384,8 @@ class ForecastingService:
         hybrid_weight_ses = float(inv_ses / (inv_ses + inv_reg))
         hybrid_weight_reg = float(inv_reg / (inv_ses + inv_reg))
 
-        hybrid_errors = [
-            (hybrid_weight_ses * se) + (hybrid_weight_reg * re)
-            for se, re in zip(ses_errors, reg_errors)
-        ]
-        hybrid_abs_sum = float(sum(abs(e) for e in hybrid_errors))
+        hybrid_errors = (hybrid_weight_ses * ses_errors) + (hybrid_weight_reg * reg_errors)
+        hybrid_abs_sum = float(np.abs(hybrid_errors).sum())
         wape_hybrid = (hybrid_abs_sum / actual_sum) * 100.0 if actual_sum > 0 else 100.0
 
         return {
@@ -807,9 +1394,9 @@ class ForecastingService:
             'wape_hybrid': float(round(wape_hybrid, 4)),
             'hybrid_weight_ses': float(hybrid_weight_ses),
             'hybrid_weight_reg': float(hybrid_weight_reg),
-            'error_var_ses': float(np.var(ses_errors)) if ses_errors else 0.0,
-            'error_var_reg': float(np.var(reg_errors)) if reg_errors else 0.0,
-            'error_var_hybrid': float(np.var(hybrid_errors)) if hybrid_errors else 0.0,
+            'error_var_ses': float(np.var(ses_errors)) if len(ses_errors) else 0.0,
+            'error_var_reg': float(np.var(reg_errors)) if len(reg_errors) else 0.0,
+            'error_var_hybrid': float(np.var(hybrid_errors)) if len(hybrid_errors) else 0.0,
         }
 
     def _compute_dynamic_confidence(
@@ -825,8 +1412,14 @@ class ForecastingService:
         - model agreement (SES vs REG distance)
         - historical error variance
         """
-        mean_demand = float(max(series.mean(), 1.0))
         std_demand = float(series.std()) if len(series) > 1 else 0.0
+        return self._confidence_from_stats(float(series.mean()), std_demand, ses_pred, reg_pred, selected_error_var)
+
+    @staticmethod
+    def _confidence_from_stats(mean: float, std_demand: float, ses_pred: float, reg_pred: float,
+                               selected_error_var: float) -> int:
+        """_compute_dynamic_confidence from the mean and standard deviation of the series."""
+        mean_demand = float(max(mean, 1.0))
         cv = std_demand / mean_demand
 
         model_gap_ratio = abs(float(ses_pred) - float(reg_pred)) / mean_demand
@@ -844,66 +1437,174 @@ class ForecastingService:
 
         return int(round(max(0.0, min(100.0, score))))
 
-    def _select_and_compute_forecast(self, pid: int, history: pd.DataFrame, target_date=None) -> Dict:
+    @staticmethod
+    def _empty_decision() -> Dict:
+        return {
+            'selected_model': 'SMA',
+            'ses_pred': 0.0,
+            'reg_pred': 0.0,
+            'base_prediction': 0.0,
+            'hybrid_pred': 0.0,
+            'wape_ses': 100.0,
+            'wape_reg': 100.0,
+            'wape_hybrid': 100.0,
+            'adjustment_factor': 1.0,
+            'adjustment_detail': {'trend_multiplier': 1.0, 'bias_correction': 1.0, 'safety_factor': 1.0},
+            'raw_forecast': 0.0,
+            'final_forecast': 0.0,
+            'confidence': 0,
+            'justification': 'No history available. Conservative zero forecast.',
+            'formula': '0.00 × 1.00 = 0.00',
+        }
+
+    @staticmethod
+    def _zero_demand_decision() -> Dict:
+        return {
+            'selected_model': 'SMA',
+            'ses_pred': 0.0,
+            'reg_pred': 0.0,
+            'base_prediction': 1.0,
+            'hybrid_pred': 0.0,
+            'wape_ses': 100.0,
+            'wape_reg': 100.0,
+            'wape_hybrid': 100.0,
+            'adjustment_factor': 1.0,
+            'adjustment_detail': {'trend_multiplier': 1.0, 'bias_correction': 1.0, 'safety_factor': 1.0},
+            'raw_forecast': 1.0,
+            'final_forecast': 1.0,
+            'confidence': 5,
+            'justification': 'Sparse/zero demand history. Minimal non-negative baseline used.',
+            'formula': '1.00 × 1.00 = 1.00',
+        }
+
+    def _select_and_compute_forecast(self, pid: int, history: pd.DataFrame, target_date=None,
+                                     prepared=None, reg_results=None, profile=None, route=None,
+                                     calendar_index=None) -> Dict:
         """
         Internal deterministic decision engine:
+        - Triages the SKU (see DemandTriage): intermittent slow movers get a Croston/SBA rate,
+          recently validated slow movers reuse their stored validation
         - Selects winner by lowest SKU-level validation WAPE (SES/REG/HYBRID)
         - Applies transparent adjustment factor to base prediction
         - Enforces guardrails and returns explainable trace
+        `history` is this SKU's date-sorted history. `prepared` / `reg_results` / `profile` / `route`
+        may be supplied by batched callers (see _compute_shard); `calendar_index` serves the YoY
+        component recorded in the trace.
         """
-        prepared = self.deterministic._prepare_series(history, pid)
+        decision = self._route_and_compute_forecast(pid, history, prepared, reg_results, profile, route)
+        yoy_data = self.deterministic.get_yoy_seasonal_demand(history, pid, target_date, calendar_index=calendar_index)
+        decision['yoy_seasonal'] = float(yoy_data['yoy_avg'])
+        return decision
+
+    def _route_and_compute_forecast(self, pid: int, history: pd.DataFrame, prepared, reg_results,
+                                    profile, route) -> Dict:
+        """Triage routing and model selection of _select_and_compute_forecast."""
+        if profile is None:
+            profile = self.triage.profile(history['date'].to_numpy(dtype='datetime64[ns]'),
+                                          history['quantite_demande'].to_numpy(dtype=np.float64))
+        if route is None:
+            route = self.triage.route(pid, profile)
+        if route == DemandTriage.INTERMITTENT:
+            return self._intermittent_decision(int(pid), history, reg_results)
+
+        if prepared is None:
+            prepared = self.deterministic._prepare_series(history, pid)
         if prepared is None or prepared.empty:
-            return {
-                'selected_model': 'SMA',
-                'ses_pred': 0.0,
-                'reg_pred': 0.0,
-                'base_prediction': 0.0,
-                'wape_ses': 100.0,
-                'wape_reg': 100.0,
-                'wape_hybrid': 100.0,
-                'adjustment_factor': 1.0,
-                'adjustment_detail': {'trend_multiplier': 1.0, 'bias_correction': 1.0, 'safety_factor': 1.0},
-                'raw_forecast': 0.0,
-                'final_forecast': 0.0,
-                'confidence': 0,
-                'justification': 'No history available. Conservative zero forecast.',
-                'formula': '0.00 × 1.00 = 0.00',
-            }
+            return self._empty_decision()
 
         series = prepared['quantite_demande'].astype(float)
         if series.sum() <= 0:
-            return {
-                'selected_model': 'SMA',
-                'ses_pred': 0.0,
-                'reg_pred': 0.0,
-                'base_prediction': 1.0,
-                'wape_ses': 100.0,
-                'wape_reg': 100.0,
-                'wape_hybrid': 100.0,
-                'adjustment_factor': 1.0,
-                'adjustment_detail': {'trend_multiplier': 1.0, 'bias_correction': 1.0, 'safety_factor': 1.0},
-                'raw_forecast': 1.0,
-                'final_forecast': 1.0,
-                'confidence': 5,
-                'justification': 'Sparse/zero demand history. Minimal non-negative baseline used.',
-                'formula': '1.00 × 1.00 = 1.00',
-            }
+            return self._zero_demand_decision()
 
         demand_class = self.deterministic.classify_demand(series)
         alpha = self.deterministic.default_alpha_fast if demand_class != 'slow_mover' else self.deterministic.default_alpha_slow
         ses_pred = float(self.deterministic.simple_exponential_smoothing(series, alpha=alpha))
-        reg_results = self.regression.analyze(prepared, pid)
-        reg_pred = float(reg_results.get('prediction', ses_pred))
+        if reg_results is None:
+            reg_results = self.regression.analyze(prepared, pid)
 
-        validation = self._compute_model_validation_wape(prepared, int(pid))
+        validation = self.triage.cached_validation(pid) if route == DemandTriage.CACHED else None
+        if validation is None:
+            validation = self._compute_model_validation_wape(prepared, int(pid))
+        std_dev = float(series.std()) if len(series) > 1 else 0.0
+        decision = self._finalize_decision(
+            int(pid), demand_class, ses_pred, reg_results, validation,
+            mean=float(series.mean()), std_dev=std_dev,
+            hist_max=float(series.max()) if len(series) > 0 else 0.0, n_points=len(series),
+        )
+        decision['triage'] = route
+        if route == DemandTriage.FULL and self.triage.enabled and profile['demand_class'] == 'slow_mover':
+            # Picked up by _absorb_triage (also when computed in a worker process)
+            decision['_triage_entry'] = self.triage.entry(profile, validation)
+        return decision
+
+    def _intermittent_decision(self, pid: int, history: pd.DataFrame, reg_results=None) -> Dict:
+        """Croston/SBA decision of an intermittent slow mover, on the raw history (no preparation, no backtest)."""
+        dates = history['date'].to_numpy(dtype='datetime64[ns]')
+        values = history['quantite_demande'].to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            return self._empty_decision()
+        if values.sum() <= 0:
+            return self._zero_demand_decision()
+
+        sba = self.triage.sba(dates, values)
+        ses_pred = float(self.deterministic.simple_exponential_smoothing(
+            pd.Series(values), alpha=self.deterministic.default_alpha_slow))
+        if reg_results is None:
+            reg_results = self.regression.analyze(history, pid)
+        # WAPEs of the last full validation when there is one, neutral defaults otherwise
+        validation = self.triage.cached_validation(pid) or self._compute_model_validation_wape(None, pid)
+        recent = values[-14:]
+        decision = self._finalize_decision(
+            pid, 'slow_mover', ses_pred, reg_results, validation,
+            mean=float(values.mean()), std_dev=float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            hist_max=float(values.max()), n_points=len(values),
+            override={
+                'selected_model': 'SBA',
+                'base_prediction': float(sba['rate']),
+                'error_var': float(np.mean((recent - sba['rate']) ** 2)),
+                'blend_formula': f"SBA({1 - self.triage.sba_alpha / 2:.2f}×{sba['size']:.2f}/{sba['interval']:.2f}d)",
+            },
+        )
+        decision['triage'] = DemandTriage.INTERMITTENT
+        return decision
+
+    def _absorb_triage(self, results: Sequence[Tuple[int, Dict]]):
+        """Stores the validations of freshly validated slow movers carried by decisions."""
+        changed = False
+        for pid, decision in results:
+            entry = decision.pop('_triage_entry', None) if isinstance(decision, dict) else None
+            if entry is not None:
+                self.triage.remember(pid, entry)
+                changed = True
+        if changed:
+            self.triage.save()
+
+    def _finalize_decision(self, pid: int, demand_class: str, ses_pred: float, reg_results: Dict, validation: Dict,
+                           mean: float, std_dev: float, hist_max: float, n_points: int,
+                           override: Optional[Dict] = None) -> Dict:
+        """
+        Model selection, adjustment factors, guardrails and explanation of a decision, from the
+        summary statistics of the prepared series (mean, sample std, max, length).
+        Shared by the batch engine and the online per-SKU state (see OnlineModelState).
+        `override` imposes the model instead of the WAPE selection:
+        {'selected_model', 'base_prediction', 'error_var', 'blend_formula'}.
+        """
+        reg_pred = float(reg_results.get('prediction', ses_pred))
         wape_map = {
             'SMA': validation['wape_ses'],
             'REG': validation['wape_reg'],
             'HYBRID': validation['wape_hybrid'],
         }
-        selected_model = min(wape_map, key=wape_map.get)
-
-        if selected_model == 'SMA':
+        selected_model = override['selected_model'] if override else min(wape_map, key=wape_map.get)
+        ws = validation['hybrid_weight_ses']
+        wr = validation['hybrid_weight_reg']
+        hybrid_pred = (ws * ses_pred) + (wr * reg_pred)
+
+        if override:
+            base_prediction = override['base_prediction']
+            selected_error_var = override['error_var']
+            blend_formula = override['blend_formula']
+        elif selected_model == 'SMA':
             base_prediction = ses_pred
             selected_error_var = validation['error_var_ses']
             blend_formula = None
@@ -912,43 +1613,34 @@ class ForecastingService:
             selected_error_var = validation['error_var_reg']
             blend_formula = None
         else:
-            ws = validation['hybrid_weight_ses']
-            wr = validation['hybrid_weight_reg']
-            base_prediction = (ws * ses_pred) + (wr * reg_pred)
+            base_prediction = hybrid_pred
             selected_error_var = validation['error_var_hybrid']
             blend_formula = f"({ws:.3f}×SES + {wr:.3f}×REG)"
 
         trend_multiplier = 1.0
         trend_significant = bool(reg_results.get('trend_significant', False))
         slope = float(reg_results.get('slope', 0.0))
-        mean_demand = float(max(series.mean(), 1.0))
+        mean_demand = float(max(mean, 1.0))
         if trend_significant:
             trend_ratio = slope / mean_demand
             trend_multiplier = float(np.clip(1.0 + trend_ratio, 0.90, 1.15))
 
         bias_correction = float(np.clip(self.learning_engine.get_calibration_factor(pid), 0.85, 1.15))
 
-        std_dev = float(series.std()) if len(series) > 1 else 0.0
         cv = std_dev / mean_demand
         safety_factor = float(np.clip(1.0 + (0.06 * min(cv, 1.0)), 1.0, 1.06))
 
         adjustment_factor = float(trend_multiplier * bias_correction * safety_factor)
         raw_forecast = float(base_prediction * adjustment_factor)
 
-        hist_max = float(series.max()) if len(series) > 0 else 0.0
-        sparse_multiplier = 1.15 if len(series) < 14 else 1.25
+        sparse_multiplier = 1.15 if n_points < 14 else 1.25
         cap_value = max(1.0, hist_max * sparse_multiplier)
 
         guardrailed = max(0.0, raw_forecast)
         guardrailed = min(guardrailed, cap_value)
 
-        confidence = self._compute_dynamic_confidence(
-            series=series,
-            ses_pred=ses_pred,
-            reg_pred=reg_pred,
-            selected_error_var=selected_error_var,
-        )
-        if len(series) < 14:
+        confidence = self._confidence_from_stats(mean, std_dev, ses_pred, reg_pred, selected_error_var)
+        if n_points < 14:
             confidence = max(0, min(confidence, 55))
 
         # Build a human-readable explanation
@@ -960,12 +1652,14 @@ class ForecastingService:
             explanation += "The AI detected a clear trend and prioritized growth/decline in the forecast. "
         elif selected_model == 'SMA':
             explanation += "The AI found demand to be mostly stable and focused on recent moving averages. "
+        elif selected_model == 'SBA':
+            explanation += "The AI detected intermittent demand and forecast its average daily rate (order size over days between orders). "
         else:
             explanation += "The AI used a hybrid approach to balance historical stability with recent shifts. "
         
         explanation += f"Includes a safety stock buffer to handle {vol_desc} volatility."
 
-        if selected_model == 'HYBRID':
+        if blend_formula:
             formula = (
                 f"{blend_formula} = {base_prediction:.2f}; "
                 f"Final = {base_prediction:.2f} × {adjustment_factor:.4f} = {raw_forecast:.2f}; "
@@ -984,6 +1678,7 @@ class ForecastingService:
             'ses_pred': float(ses_pred),
             'reg_pred': float(reg_pred),
             'base_prediction': float(base_prediction),
+            'hybrid_pred': float(hybrid_pred),
             'wape_ses': float(validation['wape_ses']),
             'wape_reg': float(validation['wape_reg']),
             'wape_hybrid': float(validation['wape_hybrid']),
@@ -1002,28 +1697,112 @@ class ForecastingService:
             'volatility': str(reg_results.get('volatility', 'stable')),
             'demand_class': demand_class,
             'trend_strength': float(reg_results.get('trend_strength', 0.0)),
-            'safety_stock': float(self.deterministic.compute_safety_stock(series, demand_class)),
+            'safety_stock': float(self.deterministic.safety_stock_from_std(std_dev, demand_class)),
         }
 
-    def _log_decision_trace(self, pid: int, decision: Dict):
-        logger.info(f"Product {pid}")
-        logger.info(f"SES Forecast: {decision['ses_pred']:.2f}")
-        logger.info(f"REG Forecast: {decision['reg_pred']:.2f}")
-        logger.info(f"Validation WAPE (SES): {decision['wape_ses']:.2f}%")
-        logger.info(f"Validation WAPE (REG): {decision['wape_reg']:.2f}%")
-        logger.info(f"Validation WAPE (HYBRID): {decision['wape_hybrid']:.2f}%")
-        logger.info(f"Selected Model: {decision['selected_model']}")
-        logger.info(
-            "Adjustment Applied: "
-            f"trend_multiplier={decision['adjustment_detail']['trend_multiplier']:.4f}, "
-            f"bias_correction={decision['adjustment_detail']['bias_correction']:.4f}, "
-            f"safety_factor={decision['adjustment_detail']['safety_factor']:.4f}, "
-            f"combined_factor={decision['adjustment_factor']:.4f}"
+    def _forecast_skus(self, task: str, product_ids: Sequence, min_points: int = 2,
+                       target_date=None, workers: Optional[int] = None) -> List[Tuple[int, Dict]]:
+        """
+        Runs `task` ('decision' = _select_and_compute_forecast, 'deterministic' = deterministic.predict)
+        for every SKU with at least `min_points` demand rows. Returns [(pid, result)] in catalog order,
+        sharded across processes when the parallel runner deems it worthwhile.
+        """
+        demand_index = self.loader.demand_index
+        eligible = [pid for pid in product_ids if demand_index.count(pid) >= min_points]
+
+        if self.parallel.effective_workers(len(eligible), workers) > 1:
+            results = self.parallel.run(
+                task, demand_index, eligible, self.learning_engine.learning_data,
+                target_date=target_date, workers=workers, triage_entries=self.triage.entries
+            )
+        else:
+            results = self._compute_shard(task, [(pid, demand_index.history(pid)) for pid in eligible],
+                                          target_date=target_date, calendar_index=self.loader.yoy_index)
+        results = [(pid, result) for pid, (_, result) in zip(eligible, results)]
+        self._absorb_triage(results)
+        return results
+
+    def _compute_shard(self, task: str, items: Sequence[Tuple[int, pd.DataFrame]], target_date=None,
+                       calendar_index=None) -> List[Tuple[int, Dict]]:
+        """
+        Forecasts a batch of (pid, history) pairs. Series are prepared per SKU, then every SKU's
+        regression is fitted in one batched least-squares pass instead of one sklearn fit each.
+        `calendar_index` must cover the full histories of `items` (built from them when omitted).
+        """
+        profiles = routes = [None] * len(items)
+        if task == 'decision':
+            profiles = [self.triage.profile(history['date'].to_numpy(dtype='datetime64[ns]'),
+                                            history['quantite_demande'].to_numpy(dtype=np.float64))
+                        for _, history in items]
+            routes = [self.triage.route(pid, profile) for (pid, _), profile in zip(items, profiles)]
+        # Intermittent SKUs skip the preparation: their regression runs on the raw history
+        prepared_frames = [history if route == DemandTriage.INTERMITTENT else self.deterministic._prepare_series(history, pid)
+                           for (pid, history), route in zip(items, routes)]
+        lengths = [len(frame) for frame in prepared_frames]
+        offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        dates = [frame['date'].to_numpy(dtype='datetime64[ns]') for frame in prepared_frames]
+        quantities = [frame['quantite_demande'].to_numpy(dtype=np.float64) for frame in prepared_frames]
+        regressions = self.regression.analyze_segments(
+            [pid for pid, _ in items],
+            offsets,
+            np.concatenate(dates) if dates else np.array([], dtype='datetime64[ns]'),
+            np.concatenate(quantities) if quantities else np.array([], dtype=np.float64),
         )
-        logger.info(f"Final Forecast Formula: {decision['formula']}")
-        logger.info(f"Final Forecast: {decision['final_forecast']:.2f}")
-        logger.info(f"Confidence Score: {decision['confidence']}%")
-        logger.info(f"Justification: {decision['justification']}")
+        if calendar_index is None:
+            calendar_index = YoYCalendarIndex(
+                [pid for pid, _ in items],
+                np.concatenate(([0], np.cumsum([len(history) for _, history in items], dtype=np.int64))),
+                np.concatenate([history['date'].to_numpy(dtype='datetime64[ns]') for _, history in items]),
+                np.concatenate([history['quantite_demande'].to_numpy(dtype=np.float64) for _, history in items]),
+            )
+
+        results = []
+        for (pid, history), prepared, profile, route in zip(items, prepared_frames, profiles, routes):
+            reg_results = regressions.get(int(pid))
+            if task == 'decision':
+                result = self._select_and_compute_forecast(int(pid), history, target_date=target_date,
+                                                           prepared=prepared, reg_results=reg_results,
+                                                           profile=profile, route=route,
+                                                           calendar_index=calendar_index)
+            else:
+                result = self.deterministic.predict(history, pid, self.regression, target_date=target_date,
+                                                    learning_engine=self.learning_engine,
+                                                    prepared=prepared, reg_results=reg_results,
+                                                    calendar_index=calendar_index)
+            results.append((pid, result))
+        return results
+
+    def _trace_sampled(self, pid: int) -> bool:
+        """Deterministic per-SKU sampling: a sampled SKU is traced on every run."""
+        if self.trace_sample_rate >= 1.0:
+            return True
+        if self.trace_sample_rate <= 0.0:
+            return False
+        return zlib.crc32(str(int(pid)).encode()) % 10000 < self.trace_sample_rate * 10000
+
+    def _log_decision_trace(self, pid: int, decision: Dict):
+        """One structured (JSON) record per SKU on the 'ForecastingService.DecisionTrace' logger."""
+        if not self._trace_sampled(pid) or not trace_logger.isEnabledFor(logging.INFO):
+            return
+        detail = decision['adjustment_detail']
+        record = {
+            'product_id': int(pid),
+            'ses_forecast': round(float(decision['ses_pred']), 2),
+            'reg_forecast': round(float(decision['reg_pred']), 2),
+            'wape_ses': round(float(decision['wape_ses']), 2),
+            'wape_reg': round(float(decision['wape_reg']), 2),
+            'wape_hybrid': round(float(decision['wape_hybrid']), 2),
+            'selected_model': decision['selected_model'],
+            'trend_multiplier': round(float(detail['trend_multiplier']), 4),
+            'bias_correction': round(float(detail['bias_correction']), 4),
+            'safety_factor': round(float(detail['safety_factor']), 4),
+            'combined_factor': round(float(decision['adjustment_factor']), 4),
+            'formula': decision['formula'],
+            'final_forecast': round(float(decision['final_forecast']), 2),
+            'confidence': decision['confidence'],
+            'justification': decision['justification'],
+        }
+        trace_logger.info(json.dumps(record, ensure_ascii=False, default=str))
 
     def evaluate_models(self, limit_products=50, test_days=1):
         """
@@ -1031,15 +1810,16 @@ class ForecastingService:
         Reports MAE, RMSE, WAP, and Bias for SMA, REG, and HYBRID.
         """
         self.loader.load_and_clean_wrapper()
-        all_products = self.loader.demand_history['id_produit'].unique()
+        demand_index = self.loader.demand_index
+        # Previous-year rows of a test date always lie in its training slice, so the full calendar is leakage-free
+        yoy_index = self.loader.yoy_index
         rolling_rows = []
+        hybrid_inputs = []  # Decided in one concurrent, rate-limited LLM batch after the loop
 
         logger.info("--- MODEL EVALUATION PHASE (rolling backtest, leakage-safe) ---")
 
-        for pid in all_products[:limit_products]:
-            history = self.loader.demand_history[
-                self.loader.demand_history['id_produit'] == pid
-            ].sort_values('date').reset_index(drop=True)
+        for pid in demand_index.product_ids[:limit_products]:
+            history = demand_index.history(pid)
 
             # Need enough points for robust split + rolling windows
             if len(history) < 35:
@@ -1065,7 +1845,8 @@ class ForecastingService:
                 reg_results = self.regression.analyze(train_data, pid)
                 reg_pred = float(reg_results.get('prediction', 0.0)) * horizon
 
-                deterministic = self.deterministic.predict(train_data, pid, self.regression, target_date=test_date, learning_engine=self.learning_engine)
+                deterministic = self.deterministic.predict(train_data, pid, self.regression, target_date=test_date,
+                                                           learning_engine=self.learning_engine, calendar_index=yoy_index)
                 hybrid_input = {
                     'id': pid,
                     'sma': deterministic['ses'],
@@ -1082,17 +1863,21 @@ class ForecastingService:
                         'regression': deterministic['regression']
                     }
                 }
-                hybrid_out = self.decision_layer.call_mistral_api(hybrid_input)
-                hybrid_pred = float(hybrid_out.get('final_forecast', deterministic['forecast'])) * horizon
+                hybrid_inputs.append(hybrid_input)
 
                 rolling_rows.append({
                     'sku_id': pid,
                     'actual': actual_value,
                     'sma': max(0.0, sma_pred),
                     'reg': max(0.0, reg_pred),
-                    'hybrid': max(0.0, hybrid_pred)
+                    'hybrid': 0.0
                 })
 
+        hybrid_outputs = self.decision_layer.call_mistral_api_batch(hybrid_inputs)
+        for row, hybrid_input, hybrid_out in zip(rolling_rows, hybrid_inputs, hybrid_outputs):
+            hybrid_pred = float(hybrid_out.get('final_forecast', hybrid_input['deterministic_base'])) * horizon
+            row['hybrid'] = max(0.0, hybrid_pred)
+
         if not rolling_rows:
             logger.warning("No products reached evaluation criteria.")
             return None
@@ -1157,25 +1942,49 @@ class ForecastingService:
 
         return eval_df
 
-    def get_sku_forecast(self, pid):
+    def backtest(self, horizons=(1,), n_origins=10, limit_products=None, workers=None):
+        """
+        Catalog-wide rolling-origin backtest of SMA/SES/REG/HYBRID (see BacktestHarness).
+        Writes WAPE/bias per horizon and model to backtest_results.csv and BACKTEST_REPORT.md.
+        """
+        harness = BacktestHarness(self, horizons=horizons, n_origins=n_origins)
+        rows = harness.run(limit_products=limit_products, workers=workers)
+        if rows.empty:
+            logger.warning("No products reached backtest criteria.")
+            return None
+        return harness.write_report(rows, REPORT_DIR)
+
+    def get_sku_forecast(self, pid, target_date=None):
         """
         Calculates forecast for a specific SKU.
+        Results are cached per (SKU, target date) and only recomputed when the SKU's data version
+        (new demand, transaction or stock rows) or its calibration factor changes.
         """
         self.loader.load_and_clean_wrapper()
+        pid = int(pid)
+        target = (target_date or datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        version = (*self.loader.data_version(pid), round(float(self.learning_engine.get_calibration_factor(pid)), 6))
+        return self.forecast_cache.get_or_compute(
+            pid, target, version, lambda: self._compute_sku_forecast(pid, target_date=target_date)
+        )
+
+    def _compute_sku_forecast(self, pid, target_date=None):
         current_stock = self.loader.get_current_stock()
         
-        history = self.loader.demand_history[self.loader.demand_history['id_produit'] == int(pid)]
+        history = self.loader.get_product_history(int(pid))
         if len(history) < 2:
             return None
         
-        decision = self._select_and_compute_forecast(int(pid), history, target_date=None)
+        decision = self._select_and_compute_forecast(int(pid), history, target_date=target_date,
+                                                     calendar_index=self.loader.yoy_index)
+        self._absorb_triage([(int(pid), decision)])
         self._log_decision_trace(int(pid), decision)
         
         result = {
             'pid': int(pid),
             'ses': float(decision['ses_pred']),
             'regression': float(decision['reg_pred']),
-            'yoy_seasonal': 0.0,
+            'yoy_seasonal': float(decision.get('yoy_seasonal', 0.0)),
             'yoy_pattern_detected': False,
             'safety_stock': float(decision.get('safety_stock', 0)),
             'trend': str(decision.get('trend', 'unknown')),
@@ -1188,7 +1997,7 @@ class ForecastingService:
         }
         return result
 
-    def trigger_daily_preparation(self, target_date=None, limit_products=20):
+    def trigger_daily_preparation(self, target_date=None, limit_products=20, workers=None):
         """
         REQ 8.1: Trigger preparation one day in advance.
         Analyzes historical stock and delivery data to predict required quantities.
@@ -1200,14 +2009,12 @@ class ForecastingService:
         
         self.loader.load_and_clean_wrapper()
         current_stock = self.loader.get_current_stock()
-        all_products = self.loader.demand_history['id_produit'].unique()
+        demand_index = self.loader.demand_index
         
         forecast_metadata = {}
-        for pid in all_products[:limit_products]:
-            history = self.loader.demand_history[self.loader.demand_history['id_produit'] == pid]
-            if len(history) < 2: continue
-            
-            decision = self._select_and_compute_forecast(int(pid), history, target_date=target_date)
+        decisions = self._forecast_skus('decision', demand_index.product_ids[:limit_products], target_date=target_date, workers=workers)
+        self.trace_store.append(decisions, target_date=target_date, source='daily_preparation')
+        for pid, decision in decisions:
             self._log_decision_trace(int(pid), decision)
             
             forecast_metadata[pid] = {
@@ -1232,22 +2039,157 @@ class ForecastingService:
             'source': 'AI_FORECASTING_SERVICE'
         }
 
-    def get_all_forecasts_raw(self, limit_products=20):
+    def get_all_forecasts_raw(self, limit_products=20, workers=None):
         """Returns raw forecast data without order logic, used for UI display."""
         self.loader.load_and_clean_wrapper()
         
         if self.loader.demand_history is None or self.loader.demand_history.empty:
             return {}
             
-        all_products = self.loader.demand_history['id_produit'].unique()
+        demand_index = self.loader.demand_index
         forecast_metadata = {}
 
-        for pid in all_products[:limit_products]:
-            history = self.loader.demand_history[self.loader.demand_history['id_produit'] == pid]
-            if len(history) < 2: continue
-            
-            decision = self._select_and_compute_forecast(int(pid), history, target_date=None)
-            
+        for pid, decision in self._forecast_skus('decision', demand_index.product_ids[:limit_products], workers=workers):
+            forecast_metadata[int(pid)] = {
+                'forecast': float(decision['final_forecast']),
+                'confidence': int(decision.get('confidence', 0)),
+                'reasoning': decision.get('justification', '')
+            }
+        return forecast_metadata
+
+    def materialize_forecasts(self, target_date=None, limit_products=None, workers=None, batch_size=1000) -> int:
+        """
+        Nightly batch: forecasts the catalog and bulk-writes one PrevisionIA row per SKU for
+        `target_date` (tomorrow by default), with confidence and decision trace.
+        Row ids are deterministic (PRV-<date>-<sku>), so re-running a date overwrites it.
+        Returns the number of rows written.
+        """
+        if target_date is None:
+            target_date = datetime.now() + timedelta(days=1)
+        self.loader.load_and_clean_wrapper()
+        demand_index = self.loader.demand_index
+        product_ids = demand_index.product_ids if limit_products is None else demand_index.product_ids[:limit_products]
+
+        rows = []
+        decisions = self._forecast_skus('decision', product_ids, target_date=target_date, workers=workers)
+        self.trace_store.append(decisions, target_date=target_date, source='materialize')
+        for pid, decision in decisions:
+            trace = {key: value for key, value in decision.items() if key != 'justification'}
+            rows.append(PrevisionIA(
+                id_prevision=f"PRV-{target_date.strftime('%Y%m%d')}-{int(pid)}",
+                id_produit_id=int(pid),
+                date_prevision=target_date.date(),
+                quantite_prevue=round(float(decision['final_forecast']), 2),
+                confiance_score=float(decision.get('confidence', 0)) / 100.0,
+                modele_selectionne=str(decision.get('selected_model', '')),
+                justification=str(decision.get('justification', '')),
+                trace_decision=trace,
+            ))
+
+        PrevisionIA.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['id_prevision'],
+            update_fields=['quantite_prevue', 'confiance_score', 'modele_selectionne', 'justification', 'trace_decision'],
+        )
+        logger.info(f"Materialized {len(rows)} forecasts for {target_date.strftime('%Y-%m-%d')}.")
+        return len(rows)
+
+    def get_materialized_forecasts(self, limit_products=20, target_date=None):
+        """
+        Read-through of the PrevisionIA table in the get_all_forecasts_raw format.
+        Uses the latest materialized date from today onwards unless `target_date` is given.
+        Returns None when nothing is materialized, so callers can fall back to a live computation.
+        `limit_products` keeps the first SKUs by id, the same set get_all_forecasts_raw computes
+        (demand_history is sorted by id_produit).
+        """
+        queryset = PrevisionIA.objects.all()
+        if target_date is None:
+            target_date = (
+                queryset.filter(date_prevision__gte=datetime.now().date())
+                .order_by('-date_prevision')
+                .values_list('date_prevision', flat=True)
+                .first()
+            )
+            if target_date is None:
+                return None
+        elif isinstance(target_date, datetime):
+            target_date = target_date.date()
+
+        rows = (
+            queryset.filter(date_prevision=target_date)
+            .order_by('id_produit')
+            .values_list('id_produit', 'quantite_prevue', 'confiance_score', 'justification')
+        )
+        if limit_products is not None:
+            rows = rows[:limit_products]
+
+        forecast_metadata = {}
+        for pid, quantity, confidence, justification in rows:
+            forecast_metadata[int(pid)] = {
+                'forecast': float(quantity),
+                'confidence': int(round(confidence * 100)),
+                'reasoning': justification or ''
+            }
+        return forecast_metadata or None
+
+    def sync_online_state(self, rebuild=False) -> Dict[str, int]:
+        """
+        Brings the online model state up to date with the (incrementally refreshed) demand history
+        and persists it (only when a SKU changed). Only SKUs with new demand do any work; `rebuild`
+        replays every history.
+        """
+        self.loader.load_and_clean_wrapper()
+        if rebuild:
+            self.online_state.source = None
+        counts = self.online_state.sync(self.loader.demand_index, source=self.loader._compute_input_fingerprint())
+        if counts['updated'] + counts['rebuilt'] > 0:
+            self.online_state.save()
+        logger.info(f"Online state synced: {counts['updated']} updated, {counts['rebuilt']} rebuilt, "
+                    f"{counts['unchanged']} unchanged SKUs.")
+        return counts
+
+    def _decide_from_state(self, pid: int, sku_state) -> Dict:
+        """_select_and_compute_forecast from the online state of a SKU, without touching its history."""
+        if sku_state is None or sku_state.n == 0:
+            return self._empty_decision()
+        stats = sku_state.summary()
+        if stats['sum'] <= 0:
+            return self._zero_demand_decision()
+
+        demand_class = self.deterministic.classify_stats(stats['mean'], stats['zero_ratio'], stats['std'])
+        level = sku_state.level_fast if demand_class != 'slow_mover' else sku_state.level_slow
+        ses_pred = max(0.0, float(level))
+        reg_results = self.regression.from_moments(sku_state.n, sku_state.mean_x, sku_state.mean_y,
+                                                   sku_state.c_xx, sku_state.c_xy, sku_state.c_yy, sku_state.last_x)
+        if sku_state.n < 12:
+            validation = self._compute_model_validation_wape(None, int(pid))  # Too short: neutral defaults
+        else:
+            validation = self._validation_from_errors(stats['ses_errors'], stats['reg_errors'], stats['actuals'])
+        return self._finalize_decision(
+            int(pid), demand_class, ses_pred, reg_results, validation,
+            mean=stats['mean'], std_dev=stats['std'] if sku_state.n > 1 else 0.0,
+            hist_max=stats['max'], n_points=sku_state.n,
+        )
+
+    def get_online_forecasts(self, limit_products=20, sync=True):
+        """
+        get_all_forecasts_raw served from the online model state: after an incremental sync, each
+        SKU's forecast is computed from its running statistics in O(1) instead of its full history.
+        Suited to intraday refreshes; clipping uses rolling quartiles, so values can differ
+        slightly from the batch engine (see OnlineSKUState).
+        """
+        if sync:
+            self.sync_online_state()
+        else:
+            self.loader.load_and_clean_wrapper()
+        demand_index = self.loader.demand_index
+        forecast_metadata = {}
+        for pid in demand_index.product_ids[:limit_products]:
+            if demand_index.count(pid) < 2:
+                continue
+            decision = self._decide_from_state(int(pid), self.online_state.state(pid))
             forecast_metadata[int(pid)] = {
                 'forecast': float(decision['final_forecast']),
                 'confidence': int(decision.get('confidence', 0)),
@@ -1255,7 +2197,20 @@ class ForecastingService:
             }
         return forecast_metadata
 
-    def run(self, limit_products=10):
+    def get_decision_trace(self, pid, include_history=False):
+        """
+        Latest stored decision trace of a SKU for a target date from today onwards (see
+        DecisionTraceStore), plus every earlier trace when `include_history` is set.
+        Returns None when no forecast run has traced this SKU yet.
+        """
+        latest = self.trace_store.latest(int(pid), min_target_date=datetime.now())
+        if latest is None:
+            return None
+        if include_history:
+            latest['history'] = self.trace_store.history(int(pid))
+        return latest
+
+    def run(self, limit_products=10, workers=None):
         self.loader.load_and_clean_wrapper()
         current_stock = self.loader.get_current_stock()
         
@@ -1270,18 +2225,16 @@ class ForecastingService:
                 'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
         
-        all_products = self.loader.demand_history['id_produit'].unique()
+        demand_index = self.loader.demand_index
         
         evaluation_results = []
         forecast_metadata = {}
 
-        logger.info(f"Analyzing {min(len(all_products), limit_products)} products with Statistical & Decision Engine...")
+        logger.info(f"Analyzing {min(len(demand_index), limit_products)} products with Statistical & Decision Engine...")
         
-        for pid in all_products[:limit_products]:
-            history = self.loader.demand_history[self.loader.demand_history['id_produit'] == pid]
-            if len(history) < 2: continue
-            
-            decision = self._select_and_compute_forecast(int(pid), history, target_date=None)
+        decisions = self._forecast_skus('decision', demand_index.product_ids[:limit_products], workers=workers)
+        self.trace_store.append(decisions, target_date=datetime.now() + timedelta(days=1), source='run')
+        for pid, decision in decisions:
             self._log_decision_trace(int(pid), decision)
             
             # Format combined results for Order Service
@@ -1305,35 +2258,89 @@ class ForecastingService:
             'source': 'AI_FORECASTING_SERVICE'
         }
 
-    def get_high_demand_skus(self, threshold_quantile=0.85):
+    def get_high_demand_skus(self, threshold_quantile=0.85, workers=None, top_k=None, recompute=False):
         """
-        Returns a list of SKUs that are predicted to have high demand tomorrow.
-        Uses the deterministic forecast engine.
+        Returns a list of SKUs that are predicted to have high demand tomorrow (highest first):
+        those at or above `threshold_quantile` of the positive forecasts, or the `top_k` largest.
+        Selection runs on the demand ranking, fed from tomorrow's materialized PrevisionIA
+        forecasts when the database is the source, otherwise from the online model state (only
+        SKUs whose state changed since the previous call are re-decided).
+        The ranking is refreshed at most once per loader.refresh_interval_seconds; run the
+        refresh_online_state command to build the online state ahead of the first request.
+        `recompute` runs the deterministic engine over the whole catalog instead.
         """
+        if recompute:
+            self._rank_deterministic(workers=workers)
+        elif self._ranking_due():
+            if not self._rank_materialized():
+                self._rank_online()
+            self._ranking_refreshed_at = datetime.now()
+
+        if top_k is not None:
+            return self.demand_ranking.top_k(int(top_k))
+        return self.demand_ranking.above_quantile(threshold_quantile)
+
+    def _ranking_due(self) -> bool:
+        interval = self.loader.refresh_interval_seconds
+        if self._ranking_refreshed_at is None or interval is None or self.demand_ranking.source == 'deterministic':
+            return True
+        return (datetime.now() - self._ranking_refreshed_at).total_seconds() >= interval
+
+    def _rank_deterministic(self, workers=None):
+        """Full pass: deterministic.predict for every SKU with at least 3 days of history."""
         self.loader.load_and_clean()
-        all_products = self.loader.demand_history['id_produit'].unique()
-        predictions = {}
+        target_date = datetime.now() + timedelta(days=1)
+        predictions = [
+            (pid, deterministic['forecast'])
+            for pid, deterministic in self._forecast_skus('deterministic', self.loader.demand_index.product_ids,
+                                                          min_points=3, target_date=target_date, workers=workers)
+        ]
+        self.demand_ranking.replace(predictions, source='deterministic')
 
-        for pid in all_products:
-            history = self.loader.demand_history[self.loader.demand_history['id_produit'] == pid]
-            if len(history) < 3:
+    def _rank_materialized(self) -> bool:
+        """
+        Ranks tomorrow's PrevisionIA rows; False when none are available. The rows are only
+        reloaded when their count or total changed since they were last ranked.
+        """
+        if self.loader.data_path is not None:
+            return False  # File sources are never materialized
+        target_date = (datetime.now() + timedelta(days=1)).date()
+        source = f"materialized:{target_date.isoformat()}"
+        queryset = PrevisionIA.objects.filter(date_prevision=target_date)
+        try:
+            summary = queryset.aggregate(rows=Count('id_prevision'), total=Sum('quantite_prevue'))
+            if not summary['rows']:
+                return False
+            signature = (summary['rows'], summary['total'])
+            if self.demand_ranking.source == source and self._materialized_signature == signature:
+                return True
+            rows = list(queryset.values_list('id_produit', 'quantite_prevue'))
+        except Exception as e:
+            logger.warning(f"Materialized forecasts unavailable for ranking: {e}")
+            return False
+        self.demand_ranking.replace(rows, source=source)
+        self._materialized_signature = signature
+        return True
+
+    def _rank_online(self):
+        """Brings the ranking in line with the online model state, re-deciding changed SKUs only."""
+        self.sync_online_state()
+        online_state = self.online_state
+        ranking = self.demand_ranking
+        source = f"online:{online_state.source}"
+        if ranking.source != source:
+            ranking.clear(source=source)
+
+        for pid in online_state.changed_since(ranking.revision):
+            sku_state = online_state.state(pid)
+            if sku_state.n < 3:
+                ranking.update(pid, 0.0)
                 continue
-            
-            # Use deterministic predict
-            target_date = datetime.now() + timedelta(days=1)
-            deterministic = self.deterministic.predict(history, pid, self.regression, target_date=target_date, learning_engine=self.learning_engine)
-            predictions[pid] = deterministic['forecast']
-
-        if not predictions:
-            return []
-
-        # Find top N%
-        pred_values = [v for v in predictions.values() if v > 0]
-        if not pred_values: return []
-        
-        thresh = np.quantile(pred_values, threshold_quantile)
-        high_demand_skus = [pid for pid, val in predictions.items() if val >= thresh and val > 0]
-        return high_demand_skus
+            ranking.update(pid, self._decide_from_state(pid, sku_state)['final_forecast'])
+        if len(ranking) > len(online_state.entries):
+            for pid in [pid for pid in ranking.values if pid not in online_state.entries]:
+                ranking.remove(pid)
+        ranking.revision = online_state.revision
 
 def main():
     # Adjusted path for reorganized structure
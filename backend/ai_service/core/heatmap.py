@@ -0,0 +1,132 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class TrafficHeatmap:
+    """
+    STEP 8: Time-windowed traffic heatmap with bounded memory.
+    Each floor keeps a ring buffer of hourly buckets (window_hours x width x height), so memory
+    per cell is constant and old picks fall out of the window. Scoring reads an exponentially
+    decayed dense grid (half-life in hours) that is cached per hour and patched on new events.
+    Persistence goes through the owning service's digital twin snapshot (export_state /
+    restore_state, see DigitalTwinStateStore), which every worker and command shares.
+    """
+
+    def __init__(self, floor_shapes: Dict[int, Tuple[int, int]], window_hours: int = 168,
+                 half_life_hours: float = 24.0):
+        """
+        :param floor_shapes: {floor_idx: (width, height)}
+        :param window_hours: Number of hourly buckets kept per floor (default one week)
+        :param half_life_hours: Age at which a pick counts half in the decayed grid
+        """
+        self.window_hours = int(window_hours)
+        self.half_life_hours = float(half_life_hours)
+        self.counts: Dict[int, np.ndarray] = {}
+        self.bucket_hours: Dict[int, np.ndarray] = {}
+        for floor_idx, (width, height) in floor_shapes.items():
+            self.counts[floor_idx] = np.zeros((self.window_hours, width, height), dtype=np.float32)
+            self.bucket_hours[floor_idx] = np.full(self.window_hours, -1, dtype=np.int64)
+
+        self._decayed: Dict[int, Tuple[int, np.ndarray]] = {}  # floor -> (hour computed for, grid)
+
+    @staticmethod
+    def _to_hour(ts=None) -> int:
+        if ts is None:
+            ts = time.time()
+        elif isinstance(ts, datetime):
+            ts = ts.timestamp()
+        return int(float(ts) // 3600)
+
+    def _decay_factors(self, now_hour: int, hours: np.ndarray) -> np.ndarray:
+        age = now_hour - hours
+        valid = (hours >= 0) & (age >= 0) & (age < self.window_hours)
+        return np.where(valid, np.power(0.5, np.clip(age, 0, None) / self.half_life_hours), 0.0).astype(np.float32)
+
+    def record(self, floor_idx: int, x: int, y: int, weight: float = 1.0, ts=None):
+        """Adds a pick event to the hourly bucket of `ts` (now by default)."""
+        if floor_idx not in self.counts:
+            return
+        counts = self.counts[floor_idx]
+        if not (0 <= x < counts.shape[1] and 0 <= y < counts.shape[2]):
+            return
+
+        hour = self._to_hour(ts)
+        slot = hour % self.window_hours
+        hours = self.bucket_hours[floor_idx]
+        if hours[slot] != hour:
+            if hours[slot] > hour:
+                return  # Older than the window already held in this bucket
+            counts[slot] = 0.0
+            hours[slot] = hour
+        counts[slot, x, y] += weight
+
+        cached = self._decayed.get(floor_idx)
+        if cached is not None:
+            now_hour = cached[0]
+            age = now_hour - hour
+            if 0 <= age < self.window_hours:
+                cached[1][x, y] += weight * (0.5 ** (age / self.half_life_hours))
+
+    def dense_grid(self, floor_idx: int, now=None) -> np.ndarray:
+        """Decayed traffic grid (width x height) for vectorized scoring. Treat as read-only."""
+        if floor_idx not in self.counts:
+            return np.zeros((0, 0), dtype=np.float32)
+        now_hour = self._to_hour(now)
+        cached = self._decayed.get(floor_idx)
+        if cached is None or cached[0] != now_hour:
+            factors = self._decay_factors(now_hour, self.bucket_hours[floor_idx])
+            grid = np.tensordot(factors, self.counts[floor_idx], axes=1).astype(np.float32)
+            cached = (now_hour, grid)
+            if now is None:
+                self._decayed[floor_idx] = cached
+        return cached[1]
+
+    def value(self, floor_idx: int, x: int, y: int) -> float:
+        grid = self.dense_grid(floor_idx)
+        if not (0 <= x < grid.shape[0] and 0 <= y < grid.shape[1]):
+            return 0.0
+        return float(grid[x, y])
+
+    def window_counts(self, floor_idx: int, start=None, end=None) -> np.ndarray:
+        """Raw (undecayed) pick counts per cell for buckets whose hour falls in [start, end]."""
+        if floor_idx not in self.counts:
+            return np.zeros((0, 0), dtype=np.float32)
+        end_hour = self._to_hour(end)
+        start_hour = self._to_hour(start) if start is not None else end_hour - self.window_hours + 1
+        hours = self.bucket_hours[floor_idx]
+        mask = (hours >= 0) & (hours >= start_hour) & (hours <= end_hour)
+        return self.counts[floor_idx][mask].sum(axis=0)
+
+    def hotspots(self, threshold: float) -> List[Tuple[int, Tuple[int, int], float]]:
+        """Cells whose decayed traffic reaches `threshold`: [(floor_idx, (x, y), traffic)]."""
+        results = []
+        for floor_idx in self.counts:
+            grid = self.dense_grid(floor_idx)
+            for x, y in np.argwhere(grid >= threshold):
+                results.append((floor_idx, (int(x), int(y)), float(grid[x, y])))
+        return results
+
+    def as_dict(self) -> Dict[int, Dict[Tuple[int, int], float]]:
+        """Sparse {floor: {(x, y): decayed traffic}} view of the non-zero cells."""
+        view = {}
+        for floor_idx in self.counts:
+            grid = self.dense_grid(floor_idx)
+            view[floor_idx] = {(int(x), int(y)): float(grid[x, y]) for x, y in np.argwhere(grid > 0)}
+        return view
+
+    def export_state(self) -> Dict:
+        return {
+            "counts": {floor_idx: counts.copy() for floor_idx, counts in self.counts.items()},
+            "bucket_hours": {floor_idx: hours.copy() for floor_idx, hours in self.bucket_hours.items()},
+        }
+
+    def restore_state(self, state: Dict):
+        for floor_idx in self.counts:
+            counts = state["counts"].get(floor_idx)
+            if counts is not None and counts.shape == self.counts[floor_idx].shape:
+                self.counts[floor_idx] = counts.astype(np.float32)
+                self.bucket_hours[floor_idx] = state["bucket_hours"][floor_idx].astype(np.int64)
+        self._decayed.clear()
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("InputCache")
+
+
+class ColumnarFrameCache:
+    """
+    On-disk columnar snapshot of the cleaned forecasting inputs.
+    Layout: <cache_dir>/<fingerprint>/meta.json + one .npy file per column, so a valid snapshot
+    is reopened with memory mapping instead of re-reading and re-cleaning CSV/Excel/ORM data.
+    Only the latest fingerprint is kept; any change of the source produces a new fingerprint.
+    """
+
+    META_FILE = "meta.json"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _snapshot_dir(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, fingerprint)
+
+    # ------------------------------------------------------------------
+    # Column encoding
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _encode_column(series: pd.Series) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """Returns ({suffix: array}, column spec) for a Series."""
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            values = series.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+            return {"": values}, {"kind": "datetime", "tz": str(series.dt.tz)}
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return {"": series.to_numpy()}, {"kind": "datetime", "tz": None}
+        if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            return {"": series.to_numpy()}, {"kind": "plain"}
+
+        inferred = pd.api.types.infer_dtype(series, skipna=True)
+        nulls = series.isna().to_numpy()
+        if inferred in ("integer", "floating", "decimal", "mixed-integer-float"):
+            # ORM DecimalField values come back as Decimal objects
+            return {"": pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)}, {"kind": "plain"}
+        if inferred == "boolean":
+            values = np.where(nulls, -1, series.fillna(False).astype(bool).astype(np.int8)).astype(np.int8)
+            return {"": values}, {"kind": "nullable_bool"}
+        if inferred in ("datetime", "datetime64", "date"):
+            parsed = pd.to_datetime(series, errors="coerce", utc=True)
+            values = parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+            return {"": values}, {"kind": "datetime", "tz": "UTC" if inferred != "date" else None}
+        strings = series.where(~nulls, "").astype(str).to_numpy(dtype=str)
+        return {"": strings, ".nulls": nulls}, {"kind": "string", "dtype": str(series.dtype)}
+
+    @staticmethod
+    def _decode_column(arrays: Dict[str, np.ndarray], spec: Dict):
+        values = arrays[""]
+        kind = spec["kind"]
+        if kind == "datetime":
+            column = pd.DatetimeIndex(np.asarray(values))
+            return column.tz_localize("UTC").tz_convert(spec["tz"]) if spec.get("tz") else column
+        if kind == "nullable_bool":
+            column = values.astype(object)
+            column[values == -1] = None
+            column[values == 0] = False
+            column[values == 1] = True
+            return column
+        if kind == "string":
+            column = values.astype(object)
+            column[arrays[".nulls"]] = None
+            if spec.get("dtype", "object") != "object":
+                return pd.array(column, dtype=spec["dtype"])
+            return column
+        return values
+
+    # ------------------------------------------------------------------
+    # Snapshot IO
+    # ------------------------------------------------------------------
+    def save(self, fingerprint: str, frames: Dict[str, Optional[pd.DataFrame]], meta: Optional[Dict] = None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(tmp_dir)
+            layout = {}
+            for name, df in frames.items():
+                if df is None:
+                    layout[name] = None
+                    continue
+                columns = []
+                for idx, col in enumerate(df.columns):
+                    arrays, spec = self._encode_column(df[col])
+                    for suffix, array in arrays.items():
+                        np.save(os.path.join(tmp_dir, f"{name}.{idx}{suffix}.npy"), array, allow_pickle=False)
+                    columns.append(dict(spec, name=str(col)))
+                layout[name] = {"columns": columns, "rows": len(df)}
+
+            with open(os.path.join(tmp_dir, self.META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "frames": layout, "meta": meta or {}}, f, default=str)
+
+            target = self._snapshot_dir(fingerprint)
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            os.replace(tmp_dir, target)
+        except Exception as e:
+            logger.error(f"Error writing input cache: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        # Keep only the latest snapshot
+        for entry in os.listdir(self.cache_dir):
+            if entry != fingerprint:
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+        logger.info(f"Cached cleaned inputs under {fingerprint[:12]}.")
+
+    def load(self, fingerprint: str) -> Optional[Tuple[Dict[str, Optional[pd.DataFrame]], Dict]]:
+        """Returns (frames, meta) when a snapshot exists for `fingerprint`, else None."""
+        snapshot_dir = self._snapshot_dir(fingerprint)
+        meta_path = os.path.join(snapshot_dir, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("fingerprint") != fingerprint:
+                return None
+
+            frames = {}
+            for name, layout in stored["frames"].items():
+                if layout is None:
+                    frames[name] = None
+                    continue
+                data = {}
+                for idx, spec in enumerate(layout["columns"]):
+                    arrays = {"": np.load(os.path.join(snapshot_dir, f"{name}.{idx}.npy"), mmap_mode="r")}
+                    if spec["kind"] == "string":
+                        arrays[".nulls"] = np.load(os.path.join(snapshot_dir, f"{name}.{idx}.nulls.npy"), mmap_mode="r")
+                    data[spec["name"]] = self._decode_column(arrays, spec)
+                frames[name] = pd.DataFrame(data, columns=[spec["name"] for spec in layout["columns"]])
+            return frames, stored.get("meta", {})
+        except Exception as e:
+            logger.error(f"Error reading input cache: {e}")
+            return None
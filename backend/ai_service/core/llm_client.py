@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger("LLMClient")
+
+
+class LLMTransportError(Exception):
+    """Raised by transports; `retryable` marks rate limits, server errors and network failures."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = True):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class MistralTransport:
+    """Chat completions through the official SDK (async endpoint)."""
+
+    def __init__(self, client, temperature: float = 0.1):
+        self.client = client
+        self.temperature = temperature
+
+    async def complete(self, prompt: str, model: str) -> str:
+        try:
+            response = await self.client.chat.complete_async(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                temperature=self.temperature,
+            )
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            raise LLMTransportError(str(e), status=status, retryable=status is None or status == 429 or status >= 500)
+        return response.choices[0].message.content
+
+
+class HTTPTransport:
+    """
+    Chat completions over plain HTTP (OpenAI/Mistral-compatible `/v1/chat/completions`).
+    Point `base_url` at a local stub server to exercise the client without the real API.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 30.0, temperature: float = 0.1):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.temperature = temperature
+
+    async def complete(self, prompt: str, model: str) -> str:
+        import httpx
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"},
+            "temperature": self.temperature,
+        }
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout) as http:
+                response = await http.post(f"{self.base_url}/v1/chat/completions", json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            raise LLMTransportError(str(e), retryable=True)
+        if response.status_code != 200:
+            status = response.status_code
+            raise LLMTransportError(f"HTTP {status}: {response.text[:200]}", status=status,
+                                    retryable=status == 429 or status >= 500)
+        return response.json()["choices"][0]["message"]["content"]
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second on average, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+class LLMResponseCache:
+    """Persistent prompt-hash -> response cache, stored as an append-only JSON-lines file."""
+
+    def __init__(self, storage_path: Optional[str] = None):
+        self.storage_path = storage_path
+        self.entries: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load_data()
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _load_data(self):
+        if not self.storage_path or not os.path.exists(self.storage_path):
+            return
+        try:
+            with open(self.storage_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # Interrupted write
+                    record = json.loads(line)
+                    self.entries[record["key"]] = record["response"]
+        except Exception as e:
+            logger.error(f"Error loading LLM response cache: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self.entries[key] = response
+            if not self.storage_path:
+                return
+            try:
+                with open(self.storage_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "response": response}) + "\n")
+            except Exception as e:
+                logger.error(f"Error saving LLM response cache: {e}")
+
+
+class AsyncLLMClient:
+    """
+    Batched LLM completions: every prompt of a batch is issued concurrently (at most
+    `max_concurrency` in flight) behind a token-bucket rate limiter, retried with exponential
+    backoff plus jitter on retryable errors, and cached by prompt hash so reruns cost nothing.
+    """
+
+    def __init__(self, transport, model: str, rate_per_second: float = 2.0, burst: Optional[float] = None,
+                 max_concurrency: int = 4, max_retries: int = 3, backoff_seconds: float = 0.5,
+                 cache: Optional[LLMResponseCache] = None):
+        self.transport = transport
+        self.model = model
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_seconds = backoff_seconds
+        self.cache = cache if cache is not None else LLMResponseCache()
+
+    async def _complete_one(self, prompt: str, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> Optional[str]:
+        key = self.cache.key(self.model, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                try:
+                    content = await self.transport.complete(prompt, self.model)
+                    self.cache.put(key, content)
+                    return content
+                except LLMTransportError as e:
+                    if not e.retryable or attempt == self.max_retries:
+                        logger.error(f"LLM request failed after {attempt + 1} attempt(s): {e}")
+                        return None
+                    delay = self.backoff_seconds * (2 ** attempt)
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+        return None
+
+    async def complete_many_async(self, prompts: Sequence[str]) -> List[Optional[str]]:
+        bucket = TokenBucket(self.rate_per_second, self.burst)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return list(await asyncio.gather(*(self._complete_one(prompt, bucket, semaphore) for prompt in prompts)))
+
+    def complete_many(self, prompts: Sequence[str]) -> List[Optional[str]]:
+        """Synchronous entry point; returns one response (or None on failure) per prompt, in order."""
+        if not prompts:
+            return []
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.complete_many_async(prompts))
+        # Called from inside an event loop (e.g. an async view): run the batch on a helper thread
+        result: List[Optional[str]] = []
+        worker = threading.Thread(target=lambda: result.extend(asyncio.run(self.complete_many_async(prompts))))
+        worker.start()
+        worker.join()
+        return result
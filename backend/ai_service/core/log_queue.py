@@ -0,0 +1,104 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Listener of this process, plus the multiprocessing queue that pool workers log into
+_state = {'queue': None, 'listener': None, 'pid': None, 'level': logging.INFO, 'worker_queue': None,
+          'rotation_lock': None}
+
+
+def configure_queued_logging(log_path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                             level: int = logging.INFO) -> Optional[QueueListener]:
+    """
+    Root logging without blocking the caller on I/O: records go through a QueueHandler and a
+    background QueueListener writes them to a size-rotated file and to the console.
+    Only one process rotates the file (see _file_handler), so several web workers can share it.
+    Like logging.basicConfig, does nothing when the root logger already has handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = _file_handler(log_path, max_bytes, backup_count)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    _state['queue'] = log_queue
+    _state['level'] = level
+    _start_listener(file_handler, stream_handler)
+    return _state['listener']
+
+
+def _file_handler(log_path: str, max_bytes: int, backup_count: int) -> logging.Handler:
+    """
+    The first process to take the exclusive lock on `<log_path>.lock` (held for its lifetime) owns
+    rotation and gets the RotatingFileHandler; the others append through a WatchedFileHandler,
+    which reopens the file once the owner has renamed it. Without fcntl every process rotates.
+    """
+    if fcntl is not None:
+        lock_file = open(f"{log_path}.lock", "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return WatchedFileHandler(log_path, encoding='utf-8')
+        _state['rotation_lock'] = lock_file
+    return RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+
+def _start_listener(*handlers):
+    listener = QueueListener(_state['queue'], *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    _state['listener'] = listener
+    _state['pid'] = os.getpid()
+
+
+def worker_log_queue():
+    """
+    Queue for the records of pool worker processes (pass it to configure_worker_logging through
+    the pool initializer). A second listener of this process drains it into the same file and
+    console handlers, so only this process ever writes or rotates the log file.
+    Returns None when queued logging is not configured in this process.
+    """
+    listener = _state['listener']
+    if listener is None or _state['pid'] != os.getpid():
+        return None
+    if _state['worker_queue'] is None:
+        worker_queue = multiprocessing.Queue()
+        worker_listener = QueueListener(worker_queue, *listener.handlers, respect_handler_level=True)
+        worker_listener.start()
+        atexit.register(worker_listener.stop)
+        _state['worker_queue'] = worker_queue
+    return _state['worker_queue']
+
+
+def configure_worker_logging(worker_queue, level: Optional[int] = None):
+    """
+    Pool worker side: replaces the inherited root handlers with a QueueHandler on the parent's
+    worker queue. Does nothing without a queue (the parent did not configure queued logging).
+    """
+    if worker_queue is None:
+        return
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(worker_queue))
+    root.setLevel(level if level is not None else _state['level'])
+    _state.update(queue=None, listener=None, pid=os.getpid(), worker_queue=None)
@@ -0,0 +1,301 @@
+import bisect
+import json
+import logging
+import math
+import os
+import tempfile
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("OnlineModelState")
+
+
+class OnlineSKUState:
+    """
+    Running model state of one SKU, updated in O(1) per day of demand (O(window) for the
+    bounded quantile window). Mirrors DeterministicForecastModel._prepare_series and the
+    validation backtest of ForecastingService, with these online counterparts:
+    - IQR clipping uses the quartiles of the last `window` raw days instead of the whole history;
+      a day is clipped once, when it arrives.
+    - Zero-day smoothing uses the running mean / zero share of the clipped days seen so far.
+    - SES levels (fast and slow alpha) are carried forward; the regression on days since the
+      first date comes from Welford co-moments (mean_x, mean_y, C_xx, C_xy, C_yy).
+    - One-step SES/REG errors are scored before each day is absorbed and kept for the last
+      `error_window` days (rolling WAPEs and error variances).
+    """
+
+    FIELDS = (
+        'origin', 'last_x', 'n', 'mean_x', 'mean_y', 'c_xx', 'c_xy', 'c_yy', 'zeros', 'max_y',
+        'clipped_sum', 'clipped_zeros', 'level_fast', 'level_slow',
+    )
+
+    def __init__(self, alpha_fast: float = 0.40, alpha_slow: float = 0.25, window: int = 180, error_window: int = 14):
+        self.alpha_fast = alpha_fast
+        self.alpha_slow = alpha_slow
+        self.window = window
+        self.error_window = error_window
+        self.origin = None  # Day number (days since epoch) of the first observation
+        self.last_x = 0.0
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.c_xx = self.c_xy = self.c_yy = 0.0
+        self.zeros = 0
+        self.max_y = 0.0
+        self.clipped_sum = 0.0
+        self.clipped_zeros = 0
+        self.level_fast = self.level_slow = 0.0
+        self.raw_window: deque = deque()
+        self.sorted_window: List[float] = []
+        self.recent_clipped: deque = deque(maxlen=2)
+        self.errors: deque = deque(maxlen=error_window)  # (ses_error, reg_error, actual)
+
+    def clone(self) -> 'OnlineSKUState':
+        other = OnlineSKUState(self.alpha_fast, self.alpha_slow, self.window, self.error_window)
+        for field in self.FIELDS:
+            setattr(other, field, getattr(self, field))
+        other.raw_window = deque(self.raw_window)
+        other.sorted_window = list(self.sorted_window)
+        other.recent_clipped = deque(self.recent_clipped, maxlen=2)
+        other.errors = deque(self.errors, maxlen=self.error_window)
+        return other
+
+    @staticmethod
+    def _quantile(sorted_values: List[float], q: float) -> float:
+        """Linear interpolation, like pandas Series.quantile."""
+        position = q * (len(sorted_values) - 1)
+        low = int(math.floor(position))
+        high = min(low + 1, len(sorted_values) - 1)
+        return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+    def regression_line(self):
+        """(slope, intercept) of the OLS fit on the days absorbed so far."""
+        slope = self.c_xy / self.c_xx if self.c_xx > 1e-12 else 0.0
+        return slope, self.mean_y - slope * self.mean_x
+
+    def add_day(self, day: int, quantity: float):
+        """Absorbs one day of demand (days must arrive in increasing order)."""
+        quantity = float(quantity)
+        if self.origin is None:
+            self.origin = int(day)
+        x = float(int(day) - self.origin)
+
+        # Rolling IQR clipping of the new day
+        self.raw_window.append(quantity)
+        bisect.insort(self.sorted_window, quantity)
+        if len(self.raw_window) > self.window:
+            expired = self.raw_window.popleft()
+            del self.sorted_window[bisect.bisect_left(self.sorted_window, expired)]
+        q1 = self._quantile(self.sorted_window, 0.25)
+        q3 = self._quantile(self.sorted_window, 0.75)
+        iqr = q3 - q1
+        lower = max(0.0, q1 - 1.5 * iqr)
+        upper = q3 + 1.5 * iqr if iqr > 0 else max(q3, 0.0)
+        clipped = min(max(quantity, lower), upper)
+
+        # Zero-demand smoothing for fast movers only
+        self.clipped_sum += clipped
+        self.clipped_zeros += int(clipped == 0)
+        count = self.n + 1
+        value = clipped
+        if clipped == 0 and self.clipped_sum / count >= 5 and self.clipped_zeros / count < 0.4:
+            value = (sum(self.recent_clipped) + clipped) / (len(self.recent_clipped) + 1) * 0.35
+        self.recent_clipped.append(clipped)
+
+        # One-step-ahead errors of the models trained on the previous days
+        if self.n >= 7:
+            slope, intercept = self.regression_line()
+            ses_pred = max(0.0, self.level_fast)
+            reg_pred = max(0.0, intercept + slope * (self.last_x + 1.0))
+            self.errors.append((ses_pred - value, reg_pred - value, value))
+
+        # Welford co-moments of (x, value)
+        self.n = count
+        dx = x - self.mean_x
+        self.mean_x += dx / count
+        dy = value - self.mean_y
+        self.mean_y += dy / count
+        self.c_xx += dx * (x - self.mean_x)
+        self.c_xy += dx * (value - self.mean_y)
+        self.c_yy += dy * (value - self.mean_y)
+
+        if count == 1:
+            self.level_fast = self.level_slow = value
+        else:
+            self.level_fast = self.alpha_fast * value + (1 - self.alpha_fast) * self.level_fast
+            self.level_slow = self.alpha_slow * value + (1 - self.alpha_slow) * self.level_slow
+        self.zeros += int(value == 0)
+        self.max_y = value if count == 1 else max(self.max_y, value)
+        self.last_x = x
+
+    def summary(self) -> Dict:
+        """Statistics of the prepared series as used by ForecastingService._finalize_decision."""
+        errors = np.array(self.errors, dtype=np.float64).reshape(-1, 3)
+        return {
+            'n': self.n,
+            'mean': self.mean_y,
+            'sum': self.mean_y * self.n,
+            'std': math.sqrt(max(self.c_yy, 0.0) / (self.n - 1)) if self.n > 1 else float('nan'),
+            'zero_ratio': self.zeros / self.n if self.n else 0.0,
+            'max': self.max_y,
+            'ses_errors': errors[:, 0],
+            'reg_errors': errors[:, 1],
+            'actuals': errors[:, 2],
+        }
+
+    def to_dict(self) -> Dict:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['raw_window'] = list(self.raw_window)
+        data['recent_clipped'] = list(self.recent_clipped)
+        data['errors'] = [list(error) for error in self.errors]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict, **params) -> 'OnlineSKUState':
+        state = cls(**params)
+        for field in cls.FIELDS:
+            setattr(state, field, data[field])
+        state.raw_window = deque(data['raw_window'])
+        state.sorted_window = sorted(state.raw_window)
+        state.recent_clipped = deque(data['recent_clipped'], maxlen=2)
+        state.errors = deque((tuple(error) for error in data['errors']), maxlen=state.error_window)
+        return state
+
+
+class OnlineModelState:
+    """
+    Persisted online model state of every SKU (JSON, like model_learning.json).
+    The most recent day of a SKU stays "open": intraday refreshes add to its total, so the state
+    keeps `committed` (every earlier day) and recomputes `current` = committed + open day with a
+    single add_day. When a later day arrives the open day is committed, still in O(1).
+    `sync` brings the state in line with the demand partition index: SKUs whose row count and
+    last day are unchanged cost O(1); new days are appended; anything else (back-dated rows,
+    a different data source) rebuilds that SKU from its history.
+    Every change stamps the SKU with an increasing `revision`, so consumers of the state can
+    pick up the SKUs that changed since they last looked (changed_since).
+    """
+
+    def __init__(self, storage_path: Optional[str] = None, window: int = 180, error_window: int = 14,
+                 alpha_fast: float = 0.40, alpha_slow: float = 0.25):
+        self.storage_path = storage_path
+        self.params = {'alpha_fast': alpha_fast, 'alpha_slow': alpha_slow, 'window': window, 'error_window': error_window}
+        self.source = None
+        self.revision = 0
+        self.entries: Dict[int, Dict] = {}  # pid -> {'committed', 'current', 'open_day', 'open_qty', 'rows', 'revision'}
+        self._load_data()
+
+    def _load_data(self):
+        if not self.storage_path or not os.path.exists(self.storage_path):
+            return
+        try:
+            with open(self.storage_path, 'r') as f:
+                data = json.load(f)
+            if data.get('params') != self.params:
+                return  # Different model settings: rebuild on the next sync
+            self.source = data.get('source')
+            for pid, entry in data.get('skus', {}).items():
+                committed = OnlineSKUState.from_dict(entry['committed'], **self.params)
+                self._set_entry(int(pid), committed, entry['open_day'], entry['open_qty'], entry['rows'])
+        except Exception as e:
+            logger.error(f"Error loading online model state: {e}")
+            self.entries = {}
+
+    def save(self):
+        if not self.storage_path:
+            return
+        try:
+            # Unique temp file per writer, then an atomic rename: concurrent workers never share it
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.storage_path) or '.',
+                                            prefix=f".{os.path.basename(self.storage_path)}.", suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'source': self.source,
+                    'params': self.params,
+                    'skus': {
+                        str(pid): {
+                            'committed': entry['committed'].to_dict(),
+                            'open_day': entry['open_day'],
+                            'open_qty': entry['open_qty'],
+                            'rows': entry['rows'],
+                        }
+                        for pid, entry in self.entries.items()
+                    },
+                }, f)
+            os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            logger.error(f"Error saving online model state: {e}")
+
+    def _set_entry(self, pid: int, committed: OnlineSKUState, open_day: int, open_qty: float, rows: int):
+        current = committed.clone()
+        current.add_day(open_day, open_qty)
+        self.revision += 1
+        self.entries[pid] = {'committed': committed, 'current': current, 'open_day': int(open_day),
+                             'open_qty': float(open_qty), 'rows': int(rows), 'revision': self.revision}
+
+    def update(self, pid: int, day: int, quantity: float):
+        """Adds demand for `day`: O(1) for the open day or a later one."""
+        pid, day = int(pid), int(day)
+        entry = self.entries.get(pid)
+        if entry is None:
+            self._set_entry(pid, OnlineSKUState(**self.params), day, quantity, 1)
+        elif day == entry['open_day']:
+            self._set_entry(pid, entry['committed'], day, entry['open_qty'] + float(quantity), entry['rows'])
+        elif day > entry['open_day']:
+            self._set_entry(pid, entry['current'], day, quantity, entry['rows'] + 1)
+        else:
+            raise ValueError(f"Day {day} precedes the open day of SKU {pid}; rebuild its state instead.")
+
+    def rebuild(self, pid: int, days: np.ndarray, quantities: np.ndarray):
+        """Replays a SKU's full (date-sorted, one row per day) history."""
+        pid = int(pid)
+        if len(days) == 0:
+            self.entries.pop(pid, None)
+            return
+        committed = OnlineSKUState(**self.params)
+        for day, quantity in zip(days[:-1].tolist(), quantities[:-1].tolist()):
+            committed.add_day(day, quantity)
+        self._set_entry(pid, committed, int(days[-1]), float(quantities[-1]), len(days))
+
+    @staticmethod
+    def _day_numbers(dates: np.ndarray) -> np.ndarray:
+        return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+    def sync(self, demand_index, source: str, product_ids: Optional[Iterable] = None) -> Dict[str, int]:
+        """Brings every SKU of `demand_index` up to date; returns counts of unchanged/updated/rebuilt SKUs."""
+        if source != self.source:
+            self.entries = {}
+            self.source = source
+        counts = {'unchanged': 0, 'updated': 0, 'rebuilt': 0}
+        for pid in (demand_index.product_ids if product_ids is None else product_ids):
+            pid = int(pid)
+            dates, quantities = demand_index.arrays(pid)
+            n_rows = len(dates)
+            entry = self.entries.get(pid)
+
+            consumed = entry['rows'] if entry is not None else 0
+            if entry is None or n_rows < consumed or \
+                    int(self._day_numbers(dates[consumed - 1:consumed])[0]) != entry['open_day']:
+                self.rebuild(pid, self._day_numbers(dates), np.asarray(quantities, dtype=np.float64))
+                counts['rebuilt'] += 1
+                continue
+
+            changed = False
+            if float(quantities[consumed - 1]) != entry['open_qty']:
+                self._set_entry(pid, entry['committed'], entry['open_day'], float(quantities[consumed - 1]), consumed)
+                changed = True
+            if n_rows > consumed:
+                for day, quantity in zip(self._day_numbers(dates[consumed:]).tolist(), quantities[consumed:].tolist()):
+                    self.update(pid, day, quantity)
+                changed = True
+            counts['updated' if changed else 'unchanged'] += 1
+        return counts
+
+    def changed_since(self, revision: int) -> List[int]:
+        """SKUs whose state changed after `revision` (every SKU for revision 0)."""
+        return [pid for pid, entry in self.entries.items() if entry['revision'] > revision]
+
+    def state(self, pid: int) -> Optional[OnlineSKUState]:
+        """State including the open day, or None for an unknown SKU."""
+        entry = self.entries.get(int(pid))
+        return entry['current'] if entry is not None else None
@@ -0,0 +1,103 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .log_queue import worker_log_queue
+
+logger = logging.getLogger("ParallelForecast")
+
+# Per-process forecasting engine, built once by the pool initializer
+_WORKER_SERVICE = None
+
+
+def _init_worker(learning_data: Dict, triage_entries: Optional[Dict] = None, log_queue=None):
+    """Pool initializer: prepares Django (spawn/forkserver start methods) and a compute-only service."""
+    global _WORKER_SERVICE
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+        django.setup()
+
+    from .log_queue import configure_worker_logging
+    # Records go back to the parent, which alone writes (and rotates) the log file
+    configure_worker_logging(log_queue)
+
+    from .forecasting_service import ForecastingService
+    _WORKER_SERVICE = ForecastingService(workers=1)
+    # Same calibration state as the parent, whatever is on disk
+    _WORKER_SERVICE.learning_engine.learning_data = learning_data
+    _WORKER_SERVICE.triage.entries = triage_entries or {}
+
+
+def _run_shard(task: str, shard: List[Tuple[int, np.ndarray, np.ndarray]], target_date, options: Dict) -> List[Tuple[int, Dict]]:
+    from .forecasting_service import DemandPartitionIndex
+    items = [(pid, DemandPartitionIndex.frame(pid, dates, quantities)) for pid, dates, quantities in shard]
+    if task == "backtest":
+        from .backtest import BacktestHarness
+        return BacktestHarness(_WORKER_SERVICE, **options).evaluate_items(items)
+    return _WORKER_SERVICE._compute_shard(task, items, target_date=target_date)
+
+
+class ParallelForecastRunner:
+    """
+    Shards SKUs across a ProcessPoolExecutor for catalog-level forecasting.
+    Each shard carries only the per-SKU (dates, quantities) arrays of the demand partition index,
+    never DataFrames. Shards are contiguous slices of the requested SKU order and are gathered in
+    submission order, so results are identical to the sequential loop.
+    """
+
+    TASKS = ("decision", "deterministic", "backtest")
+
+    def __init__(self, workers: Optional[int] = 1, min_skus_per_worker: int = 25):
+        """
+        :param workers: Process count; 1 keeps the sequential path, None/0 uses every available core
+        :param min_skus_per_worker: Below this many SKUs per process the pool overhead is not worth it
+        """
+        self.workers = self.resolve_workers(workers)
+        self.min_skus_per_worker = max(1, int(min_skus_per_worker))
+
+    @staticmethod
+    def resolve_workers(workers: Optional[int]) -> int:
+        if workers is None or int(workers) <= 0:
+            return os.cpu_count() or 1
+        return int(workers)
+
+    def effective_workers(self, n_skus: int, workers: Optional[int] = None) -> int:
+        requested = self.workers if workers is None else self.resolve_workers(workers)
+        return max(1, min(requested, n_skus // self.min_skus_per_worker))
+
+    def run(self, task: str, demand_index, product_ids: Sequence, learning_data: Dict,
+            target_date=None, workers: Optional[int] = None, options: Optional[Dict] = None,
+            triage_entries: Optional[Dict] = None) -> List[Tuple[int, Dict]]:
+        """
+        Returns [(product_id, result)] in the order of `product_ids`.
+        `options` are the keyword arguments of the task (BacktestHarness settings for 'backtest').
+        `triage_entries` are the parent's DemandTriage validations, so workers route SKUs the same way.
+        """
+        if task not in self.TASKS:
+            raise ValueError(f"Unknown forecasting task: {task}")
+        n_workers = self.effective_workers(len(product_ids), workers)
+
+        # A few shards per process smooths out SKUs with very different history lengths
+        n_shards = min(len(product_ids), n_workers * 4)
+        shards = []
+        for chunk in np.array_split(np.arange(len(product_ids)), n_shards):
+            shard = []
+            for pos in chunk:
+                pid = int(product_ids[pos])
+                dates, quantities = demand_index.arrays(pid)
+                shard.append((pid, np.ascontiguousarray(dates), np.ascontiguousarray(quantities)))
+            shards.append(shard)
+
+        logger.info(f"Forecasting {len(product_ids)} SKUs ({task}) on {n_workers} processes, {len(shards)} shards.")
+        results = []
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(learning_data, triage_entries, worker_log_queue())) as pool:
+            for shard_results in pool.map(_run_shard, [task] * len(shards), shards,
+                                          [target_date] * len(shards), [options or {}] * len(shards)):
+                results.extend(shard_results)
+        return results
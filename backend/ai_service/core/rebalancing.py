@@ -0,0 +1,237 @@
+import logging
+import time
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..engine.base import WarehouseCoordinate, StorageClass
+
+logger = logging.getLogger("RebalancingPlanner")
+
+Slot = Tuple[int, int, int]  # (floor, x, y)
+
+
+class SlotRebalancingPlanner:
+    """
+    Global Slot Re-slotting Planner.
+    Computes a whole move plan in one pass against a snapshot of the digital twin:
+    1. Expected travel of an item = pick weight (demand class) × slot cost (path distance, heat, floor).
+    2. Ideal layout = heaviest items on cheapest slots (rearrangement optimum), tier by tier so
+       equally weighted items keep their current slot whenever possible.
+    3. The difference with the current layout is decomposed into chains (ending on a free slot)
+       and cycles (swaps, executed through a free buffer slot).
+    4. Groups are selected by saving per move until the move budget is spent.
+    """
+
+    def __init__(self, storage_service, floor_penalty: float = 25.0):
+        """
+        :param storage_service: StorageOptimizationService providing zoning, distances and weights
+        :param floor_penalty: Extra metres charged per floor level (elevator trip)
+        """
+        self.storage_service = storage_service
+        self.floor_penalty = floor_penalty
+
+    def _item_weight(self, product_id: int) -> float:
+        # Inverse of the frequency multiplier used in calculate_slot_score
+        if product_id in self.storage_service.predictive_high_demand_skus:
+            return 1.0 / 0.3
+        p_class = self.storage_service.product_manager.get_product_class(product_id)
+        if p_class == StorageClass.FAST:
+            return 1.0 / 0.5
+        if p_class == StorageClass.SLOW:
+            return 1.0 / 1.2
+        return 1.0
+
+    def _slot_cost(self, slot: Slot, traffic_grids: Dict[int, np.ndarray]) -> float:
+        floor_idx, x, y = slot
+        weights = self.storage_service.weights
+        dist = self.storage_service.slot_distance_scores.get(floor_idx, {}).get((x, y), 100.0)
+        grid = traffic_grids.get(floor_idx)
+        traffic = float(grid[x, y]) if grid is not None and x < grid.shape[0] and y < grid.shape[1] else 0.0
+        dynamic_alpha = weights["distance"] + (traffic * weights["traffic"])
+        return dist * dynamic_alpha + floor_idx * self.floor_penalty
+
+    def _is_constrained(self, product_id: int) -> bool:
+        pm = self.storage_service.product_manager
+        return pm.is_hazardous(product_id) or pm.is_fragile(product_id)
+
+    def _is_feasible(self, product_id: int, slot: Slot) -> bool:
+        floor_idx, x, y = slot
+        return self.storage_service._satisfies_business_constraints(product_id, floor_idx, WarehouseCoordinate(x, y))
+
+    def plan(self, snapshot: Optional[Dict] = None, max_moves: int = 50, min_saving: float = 5.0) -> Dict:
+        """
+        :param snapshot: Output of StorageOptimizationService.snapshot(); taken now if omitted
+        :param max_moves: Physical move budget (a cycle of k items costs k + 1 moves)
+        :param min_saving: Minimum expected travel saving (weighted metres) for a move group to be kept
+        """
+        started = time.perf_counter()
+        if snapshot is None:
+            snapshot = self.storage_service.snapshot()
+
+        occupied = snapshot['occupied_slots']
+        slot_to_product = snapshot['slot_to_product']
+        heatmap = snapshot['traffic_grids']
+
+        # --- 1. Slot pool: free rack cells + cells held by known (movable) products ---
+        floors = self.storage_service.floors
+        free_slots = []
+        for floor_idx, zoning in self.storage_service.storage_zoning.items():
+            w_map = floors[floor_idx]
+            floor_occupied = occupied.get(floor_idx, set())
+            for (x, y) in zoning:
+                if w_map.storage_matrix[x][y] and (x, y) not in floor_occupied:
+                    free_slots.append((floor_idx, x, y))
+
+        cost_cache: Dict[Slot, float] = {}
+
+        def cost(slot: Slot) -> float:
+            if slot not in cost_cache:
+                cost_cache[slot] = self._slot_cost(slot, heatmap)
+            return cost_cache[slot]
+
+        items = [(slot, pid, self._item_weight(pid)) for slot, pid in slot_to_product.items()]
+        pool = sorted(set(free_slots) | {slot for slot, _, _ in items}, key=lambda s: (cost(s), s))
+        constrained = {pid for _, pid, _ in items if self._is_constrained(pid)}
+
+        # --- 2. Ideal layout ---
+        # Hazardous/fragile items only move onto a better free slot that passes the business constraints
+        targets: Dict[Slot, Slot] = {}
+        taken = set()
+        free_by_cost = sorted(free_slots, key=lambda s: (cost(s), s))
+        items.sort(key=lambda it: (-it[2], cost(it[0])))
+        for slot, pid, _ in items:
+            if pid not in constrained:
+                continue
+            best = next((s for s in free_by_cost if s not in taken and cost(s) < cost(slot) and self._is_feasible(pid, s)), slot)
+            targets[slot] = best
+            taken.add(best)
+
+        # Remaining items tier by tier (same weight -> interchangeable)
+        pointer = 0
+        for _, tier in groupby(items, key=lambda it: it[2]):
+            tier = list(tier)
+            flexible = [it for it in tier if it[1] not in constrained]
+            block = []
+            while len(block) < len(flexible) and pointer < len(pool):
+                if pool[pointer] not in taken:
+                    block.append(pool[pointer])
+                pointer += 1
+            block_set = set(block)
+            staying = [it for it in flexible if it[0] in block_set]
+            for slot, _, _ in staying:
+                targets[slot] = slot
+                block_set.discard(slot)
+            remaining = sorted(block_set, key=lambda s: (cost(s), s))
+            movers = [it for it in flexible if it[0] not in targets]
+            for (slot, _, _), target in zip(movers, remaining):
+                targets[slot] = target
+            for slot, _, _ in movers[len(remaining):]:
+                targets[slot] = slot
+            taken.update(targets[slot] for slot, _, _ in flexible)
+
+        # --- 3. Decompose the layout change into chains and cycles ---
+        weight_of = {slot: w for slot, _, w in items}
+        moving = {src: dst for src, dst in targets.items() if src != dst}
+        incoming = {dst: src for src, dst in moving.items()}
+
+        def move_record(src: Slot, dst: Slot, reason: str) -> Dict:
+            saving = weight_of[src] * (cost(src) - cost(dst))
+            return {
+                "product_id": slot_to_product[src],
+                "from_floor": src[0],
+                "from_coord": (src[1], src[2]),
+                "to_floor": dst[0],
+                "to_coord": (dst[1], dst[2]),
+                "reason": reason,
+                "expected_saving": float(saving),
+            }
+
+        groups = []
+        visited = set()
+        for src, dst in moving.items():
+            if dst in moving:
+                continue  # Not a chain head: its target is still held by a moving item
+            chain = []
+            current = src
+            while current is not None and current not in visited:
+                visited.add(current)
+                chain.append(move_record(current, moving[current], "Re-slotting chain"))
+                current = incoming.get(current)
+            groups.append({"type": "chain", "moves": chain})
+
+        for src in moving:
+            if src in visited:
+                continue
+            cycle = []
+            current = src
+            while current not in visited:
+                visited.add(current)
+                cycle.append(current)
+                current = incoming[current]
+            groups.append({"type": "cycle", "slots": cycle})
+
+        # --- 4. Budgeted selection (best saving per physical move first) ---
+        candidates = []
+        for group in groups:
+            if group["type"] == "chain":
+                running, best_len, best_saving = 0.0, 0, 0.0
+                for idx, move in enumerate(group["moves"]):
+                    running += move["expected_saving"]
+                    if running > best_saving:
+                        best_len, best_saving = idx + 1, running
+                if best_len and best_saving >= min_saving:
+                    candidates.append((best_saving / best_len, best_saving, group["moves"][:best_len], "chain"))
+            else:
+                slots = group["slots"]
+                saving = sum(weight_of[s] * (cost(s) - cost(moving[s])) for s in slots)
+                if saving >= min_saving:
+                    candidates.append((saving / (len(slots) + 1), saving, slots, "cycle"))
+
+        candidates.sort(key=lambda c: -c[0])
+        used_free = set(moving.values())
+        buffers = iter(s for s in free_by_cost if s not in used_free and s not in taken)
+
+        plan_moves: List[Dict] = []
+        budget = max(0, int(max_moves))
+        total_saving = 0.0
+        for group_id, (_, saving, payload, kind) in enumerate(candidates, start=1):
+            if budget <= 0:
+                break
+            if kind == "chain":
+                moves = payload[:budget]
+                saving = sum(m["expected_saving"] for m in moves)
+                if saving < min_saving:
+                    continue
+            else:
+                if len(payload) + 1 > budget:
+                    continue
+                buffer = next(buffers, None)
+                if buffer is None:
+                    continue
+                head = payload[0]
+                label = "Swap via buffer" if len(payload) == 2 else "Re-slotting cycle via buffer"
+                moves = [dict(move_record(head, buffer, label), expected_saving=0.0)]
+                moves += [move_record(s, moving[s], label) for s in payload[1:]]
+                final = move_record(head, moving[head], label)
+                final["from_floor"], final["from_coord"] = buffer[0], (buffer[1], buffer[2])
+                moves.append(final)
+
+            for step, move in enumerate(moves, start=1):
+                move["group_id"] = group_id
+                move["step"] = step
+            plan_moves.extend(moves)
+            budget -= len(moves)
+            total_saving += saving
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        logger.info(f"Rebalancing plan: {len(plan_moves)} moves, expected saving {total_saving:.1f} "
+                    f"over {len(items)} items in {elapsed_ms:.1f} ms.")
+        return {
+            "moves": plan_moves,
+            "total_expected_saving": float(total_saving),
+            "evaluated_items": len(items),
+            "candidate_groups": len(candidates),
+            "compute_time_ms": float(elapsed_ms),
+        }
@@ -0,0 +1,367 @@
+import heapq
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..engine.base import WarehouseCoordinate
+
+logger = logging.getLogger("WarehouseSimulator")
+
+
+class WarehouseSimulator:
+    """
+    Discrete-Event Warehouse Simulator (throughput benchmarking).
+    Replays a day of Ingoing/Outgoing flow lines against the real decision services:
+    - Ingoing lines: StorageOptimizationService.suggest_slot + assign_slot (put-away).
+    - Outgoing lines: StorageOptimizationService.locate_product, batched per floor and routed
+      with PickingOptimizationService.calculate_picking_route.
+    A fleet of chariots serves the lines from the expedition dock. Upper floors are reached
+    through a shared elevator (one trip at a time) and a storage aisle holds one chariot at a time.
+    Every mission leg is an event: the elevator and the aisles are requested when the chariot
+    actually reaches them and are granted first come, first served.
+    Reports lines/hour, chariot utilisation, waits and the compute time of every decision.
+    """
+
+    ELEVATOR_ZONES = ("Monte Charge 1", "Monte Charge 2", "Assenseur")
+
+    def __init__(self, storage_service, picking_service, n_chariots: int = 2, travel_speed: Optional[float] = None,
+                 handling_seconds: float = 30.0, elevator_seconds: float = 45.0, pick_batch_size: int = 5):
+        """
+        :param storage_service: StorageOptimizationService driving put-away decisions (mutated by the run)
+        :param picking_service: PickingOptimizationService driving pick routes
+        :param n_chariots: Fleet size
+        :param travel_speed: Chariot speed in m/s (defaults to the learned travel speed)
+        :param handling_seconds: Time to store or pick one line once at the slot
+        :param elevator_seconds: Duration of one elevator trip (per floor crossed)
+        :param pick_batch_size: Maximum Outgoing lines of the same floor served in one route
+        """
+        self.storage_service = storage_service
+        self.picking_service = picking_service
+        self.floors = storage_service.floors
+        self.n_chariots = max(1, int(n_chariots))
+        self.travel_speed = float(travel_speed or picking_service.travel_speed or 1.2)
+        self.handling_seconds = float(handling_seconds)
+        self.elevator_seconds = float(elevator_seconds)
+        self.pick_batch_size = max(1, int(pick_batch_size))
+
+        self.dock = self.floors[0].landmarks.get("Chariot Start 1", WarehouseCoordinate(34, 10))
+        self.elevator_access = {f_idx: self._elevator_access(w_map) for f_idx, w_map in self.floors.items()}
+        self._aisle_lookup: Dict[int, Dict[Tuple[int, int], str]] = {}
+
+    # ------------------------------------------------------------------
+    # Flow inputs
+    # ------------------------------------------------------------------
+    @staticmethod
+    def load_flows(path: str) -> List[Dict]:
+        """Reads a flow file with columns Date & Time, Product ID, Flow Type, Quantity."""
+        df = pd.read_csv(path)
+        df.columns = [c.strip() for c in df.columns]
+        date_col = "Date & Time" if "Date & Time" in df.columns else "Date"
+        product_col = "Product ID" if "Product ID" in df.columns else "Product"
+        timestamps = pd.to_datetime(df[date_col], dayfirst=True, errors="coerce")
+        quantities = pd.to_numeric(df["Quantity"].astype(str).str.replace(",", ""), errors="coerce").fillna(1)
+
+        flows = []
+        for ts, pid, flow_type, qty in zip(timestamps, df[product_col], df["Flow Type"], quantities):
+            if pd.isna(ts):
+                continue
+            try:
+                pid = int(pid)
+            except (TypeError, ValueError):
+                continue
+            flows.append({
+                "timestamp": ts.to_pydatetime(),
+                "product_id": pid,
+                "flow_type": "Ingoing" if str(flow_type).strip().lower().startswith("in") else "Outgoing",
+                "quantity": float(qty),
+            })
+        flows.sort(key=lambda f: f["timestamp"])
+        return flows
+
+    @staticmethod
+    def synthetic_flows(n_lines: int = 500, n_products: int = 150, start: Optional[datetime] = None,
+                        hours: float = 8.0, seed: int = 42) -> List[Dict]:
+        """
+        Generates a working day of flow lines: Poisson arrivals, Zipf-like product popularity,
+        and an inbound wave in the morning followed by mostly outbound lines.
+        """
+        rng = np.random.default_rng(seed)
+        start = start or datetime(2026, 1, 8, 8, 0)
+        products = list(range(40000, 40000 + int(n_products)))
+        popularity = 1.0 / np.arange(1, len(products) + 1)
+        popularity /= popularity.sum()
+
+        offsets = np.sort(rng.uniform(0.0, hours * 3600.0, size=int(n_lines)))
+        stocked: Dict[int, int] = {}
+        flows = []
+        for offset in offsets:
+            inbound_share = 0.8 if offset < hours * 3600.0 * 0.3 else 0.25
+            if stocked and rng.random() >= inbound_share:
+                candidates = list(stocked)
+                weights = np.array([popularity[pid - products[0]] for pid in candidates])
+                pid = int(rng.choice(candidates, p=weights / weights.sum()))
+                stocked[pid] -= 1
+                if stocked[pid] <= 0:
+                    del stocked[pid]
+                flow_type = "Outgoing"
+            else:
+                pid = int(rng.choice(products, p=popularity))
+                stocked[pid] = stocked.get(pid, 0) + 1
+                flow_type = "Ingoing"
+            flows.append({
+                "timestamp": start + timedelta(seconds=float(offset)),
+                "product_id": pid,
+                "flow_type": flow_type,
+                "quantity": float(rng.integers(1, 100)),
+            })
+        return flows
+
+    # ------------------------------------------------------------------
+    # Layout helpers
+    # ------------------------------------------------------------------
+    @classmethod
+    def _elevator_access(cls, w_map) -> WarehouseCoordinate:
+        """Walkable cell closest to the elevator shaft of a floor."""
+        for name in cls.ELEVATOR_ZONES:
+            if name in w_map.zones:
+                x1, y1, x2, y2 = w_map.zones[name]
+                cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+                break
+        else:
+            cx, cy = 0.0, 0.0
+        best, best_dist = None, float("inf")
+        for x in range(w_map.width):
+            for y in range(w_map.height):
+                if w_map.walkable_matrix[x][y]:
+                    d = abs(x - cx) + abs(y - cy)
+                    if d < best_dist:
+                        best, best_dist = WarehouseCoordinate(x, y), d
+        return best or WarehouseCoordinate(0, 0)
+
+    def _aisle_of(self, floor_idx: int, x: int, y: int) -> str:
+        """Storage zone (rack row) holding the cell; a chariot working there blocks it."""
+        lookup = self._aisle_lookup.get(floor_idx)
+        if lookup is None:
+            lookup = {}
+            w_map = self.floors[floor_idx]
+            for name, coords in w_map.zones.items():
+                segments = coords if isinstance(coords, list) else [coords]
+                for (x1, y1, x2, y2) in segments:
+                    for cx in range(int(x1), int(x2)):
+                        for cy in range(int(y1), int(y2)):
+                            lookup.setdefault((cx, cy), name)
+            self._aisle_lookup[floor_idx] = lookup
+        return f"{floor_idx}:{lookup.get((x, y), f'{x},{y}')}"
+
+    def _travel_seconds(self, floor_idx: int, a: WarehouseCoordinate, b: WarehouseCoordinate) -> Tuple[float, float]:
+        dist, _ = self.picking_service._get_cached_path(floor_idx, a, b)
+        return dist, dist / self.travel_speed
+
+    # ------------------------------------------------------------------
+    # Simulation
+    # ------------------------------------------------------------------
+    def run(self, flows: Iterable[Dict]) -> Dict:
+        flows = sorted(flows, key=lambda f: f["timestamp"])
+        if not flows:
+            return {"lines_total": 0, "lines_completed": 0, "lines_per_hour": 0.0}
+        origin = flows[0]["timestamp"]
+
+        events: List[Tuple[float, int, str, object]] = []
+        sequence = 0
+        for line in flows:
+            heapq.heappush(events, ((line["timestamp"] - origin).total_seconds(), sequence, "arrival", line))
+            sequence += 1
+
+        inbound, outbound = deque(), deque()
+        idle = list(range(self.n_chariots))
+        busy_seconds = [0.0] * self.n_chariots
+        lines_done = [0] * self.n_chariots
+        # Shared resources (the elevator and every aisle): holder flag + FIFO of waiting legs
+        resources: Dict[str, Dict] = {}
+        decision_ms = {"storage": [], "picking_locate": [], "picking_route": []}
+        stats = {"completed": 0, "unfulfilled": 0, "distance": 0.0, "elevator_wait": 0.0, "aisle_wait": 0.0, "lead_times": []}
+        clock = 0.0
+
+        def schedule(at: float, kind: str, payload) -> None:
+            nonlocal sequence
+            heapq.heappush(events, (at, sequence, kind, payload))
+            sequence += 1
+
+        def plan_mission(floor_idx: int, stops: List[WarehouseCoordinate], picking: bool) -> deque:
+            """
+            Dock -> (elevator) -> stops in order -> (elevator) -> dock, as a queue of legs
+            (kind, resource, seconds, pick). Travel legs use no resource; elevator and aisle legs
+            hold their resource for their duration and are only queued once the chariot gets there.
+            """
+            legs, pos = deque(), self.dock
+
+            def travel(on_floor: int, a: WarehouseCoordinate, b: WarehouseCoordinate):
+                dist, secs = self._travel_seconds(on_floor, a, b)
+                stats["distance"] += dist
+                legs.append(("travel", None, secs, None))
+
+            if floor_idx != 0:
+                travel(0, pos, self.elevator_access[0])
+                legs.append(("elevator", "elevator", self.elevator_seconds * floor_idx, None))
+                pos = self.elevator_access[floor_idx]
+            for stop in stops:
+                travel(floor_idx, pos, stop)
+                aisle = self._aisle_of(floor_idx, int(stop.x), int(stop.y))
+                legs.append(("aisle", aisle, self.handling_seconds, (floor_idx, stop) if picking else None))
+                pos = stop
+            if floor_idx != 0:
+                travel(floor_idx, pos, self.elevator_access[floor_idx])
+                legs.append(("elevator", "elevator", self.elevator_seconds * floor_idx, None))
+                pos = self.elevator_access[0]
+            travel(0, pos, self.dock)
+            return legs
+
+        def start_mission(now: float, chariot: int, lines: List[Dict], floor_idx: int,
+                          stops: List[WarehouseCoordinate], picking: bool) -> None:
+            mission = {"chariot": chariot, "lines": lines, "started": now, "holding": None,
+                       "legs": plan_mission(floor_idx, stops, picking)}
+            advance(now, mission)
+
+        def occupy(now: float, mission: Dict, leg: Tuple, requested_at: float) -> None:
+            kind, name, seconds, pick = leg
+            resources[name]["busy"] = True
+            stats[f"{kind}_wait"] += now - requested_at
+            mission["holding"] = name
+            if pick is not None:
+                # The heatmap ages traffic, so the pick is stamped with its simulated time
+                self.storage_service.record_picking_event(pick[0], pick[1], timestamp=origin + timedelta(seconds=now))
+            schedule(now + seconds, "leg", mission)
+
+        def release(now: float, name: str) -> None:
+            resource = resources[name]
+            if resource["queue"]:
+                mission, leg, requested_at = resource["queue"].popleft()
+                occupy(now, mission, leg, requested_at)
+            else:
+                resource["busy"] = False
+
+        def advance(now: float, mission: Dict) -> None:
+            """Ends the current leg of a mission (freeing its resource) and starts the next one."""
+            if mission["holding"] is not None:
+                held, mission["holding"] = mission["holding"], None
+                release(now, held)
+            if not mission["legs"]:
+                chariot, lines = mission["chariot"], mission["lines"]
+                busy_seconds[chariot] += now - mission["started"]
+                lines_done[chariot] += len(lines)
+                stats["completed"] += len(lines)
+                stats["lead_times"].extend(now - line["arrival"] for line in lines)
+                idle.append(chariot)
+                return
+            leg = mission["legs"].popleft()
+            if leg[0] == "travel":
+                schedule(now + leg[2], "leg", mission)
+                return
+            resource = resources.setdefault(leg[1], {"busy": False, "queue": deque()})
+            if resource["busy"]:
+                resource["queue"].append((mission, leg, now))
+            else:
+                occupy(now, mission, leg, now)
+
+        def dispatch(now: float, chariot: int) -> bool:
+            # Put-away first: inbound pallets block the receiving dock
+            while inbound:
+                line = inbound.popleft()
+                started = time.perf_counter()
+                suggestion = self.storage_service.suggest_slot(line["product_id"])
+                decision_ms["storage"].append((time.perf_counter() - started) * 1000.0)
+                if suggestion is None:
+                    stats["unfulfilled"] += 1
+                    continue
+                floor_idx, coord = suggestion["floor_idx"], suggestion["coordinate"]
+                self.storage_service.assign_slot(line["product_id"], floor_idx, coord)
+                start_mission(now, chariot, [line], floor_idx, [coord], picking=False)
+                return True
+
+            while outbound:
+                first = outbound.popleft()
+                started = time.perf_counter()
+                slot = self.storage_service.locate_product(first["product_id"], strategy="FIFO")
+                decision_ms["picking_locate"].append((time.perf_counter() - started) * 1000.0)
+                if slot is None:
+                    stats["unfulfilled"] += 1
+                    continue
+
+                # Batch further Outgoing lines on the same floor into one route
+                floor_idx = slot[0]
+                batch, slots = [first], [slot]
+                self.storage_service.release_slot(floor_idx, WarehouseCoordinate(slot[1], slot[2]))
+                kept = deque()
+                while outbound and len(batch) < self.pick_batch_size:
+                    line = outbound.popleft()
+                    started = time.perf_counter()
+                    other = self.storage_service.locate_product(line["product_id"], strategy="NEAREST",
+                                                                from_floor=floor_idx, from_coord=(slot[1], slot[2]))
+                    decision_ms["picking_locate"].append((time.perf_counter() - started) * 1000.0)
+                    if other is not None and other[0] == floor_idx:
+                        batch.append(line)
+                        slots.append(other)
+                        self.storage_service.release_slot(floor_idx, WarehouseCoordinate(other[1], other[2]))
+                    else:
+                        kept.append(line)
+                outbound.extendleft(reversed(kept))
+
+                picks = [WarehouseCoordinate(s[1], s[2]) for s in slots]
+                start_coord = self.dock if floor_idx == 0 else self.elevator_access[floor_idx]
+                started = time.perf_counter()
+                route = self.picking_service.calculate_picking_route(floor_idx, start_coord, picks)
+                decision_ms["picking_route"].append((time.perf_counter() - started) * 1000.0)
+                stops = route.get("route_sequence") or picks
+
+                start_mission(now, chariot, batch, floor_idx, stops, picking=True)
+                return True
+            return False
+
+        while events:
+            clock, _, kind, payload = heapq.heappop(events)
+            if kind == "arrival":
+                line = dict(payload, arrival=clock)
+                (inbound if line["flow_type"] == "Ingoing" else outbound).append(line)
+            else:
+                advance(clock, payload)
+
+            while idle and (inbound or outbound):
+                chariot = idle.pop(0)
+                if not dispatch(clock, chariot):
+                    idle.insert(0, chariot)
+                    break
+
+        makespan = max(clock, 1e-9)
+
+        def summarize(samples: List[float]) -> Dict:
+            if not samples:
+                return {"count": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+            arr = np.asarray(samples)
+            return {"count": int(arr.size), "mean_ms": float(arr.mean()),
+                    "p95_ms": float(np.percentile(arr, 95)), "max_ms": float(arr.max())}
+
+        report = {
+            "lines_total": len(flows),
+            "lines_completed": stats["completed"],
+            "lines_unfulfilled": stats["unfulfilled"],
+            "makespan_hours": makespan / 3600.0,
+            "lines_per_hour": stats["completed"] / (makespan / 3600.0),
+            "mean_lead_time_seconds": float(np.mean(stats["lead_times"])) if stats["lead_times"] else 0.0,
+            "total_distance_m": stats["distance"],
+            "elevator_wait_seconds": stats["elevator_wait"],
+            "aisle_wait_seconds": stats["aisle_wait"],
+            "chariots": [
+                {"chariot": idx, "lines": lines_done[idx], "utilisation": busy_seconds[idx] / makespan}
+                for idx in range(self.n_chariots)
+            ],
+            "decision_compute": {name: summarize(samples) for name, samples in decision_ms.items()},
+        }
+        report["fleet_utilisation"] = sum(c["utilisation"] for c in report["chariots"]) / self.n_chariots
+        logger.info(f"Simulation: {report['lines_completed']}/{report['lines_total']} lines, "
+                    f"{report['lines_per_hour']:.1f} lines/h, fleet utilisation {report['fleet_utilisation']:.1%}.")
+        return report
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("StockLedger")
+
+# Defined multipliers for chronological flow
+MOVEMENT_MULTIPLIERS = {
+    'RECEIPT': 1,
+    'DELIVERY': -1,
+    'PICKING': -1,
+    'ISSUE': -1,
+    'TRANSFER': -1,
+    'ADJUSTMENT': 1
+}
+
+
+class StockLedger:
+    """
+    Step 1 — Current stock per SKU = initial snapshot + Receipts - Transfers - Picking - Deliveries,
+    applied in chronological order with the clip-at-zero rule (a movement that would take a SKU
+    below zero leaves it at zero and counts as a violation).
+
+    The clipped running balance is computed per SKU with grouped array operations:
+    with Q_k the cumulative net change and s0 the opening balance,
+        s_k = Q_k - min(-s0, min_{j<=k} Q_j)
+    and movement k is a violation when Q_k sets a new strict minimum of (-s0, Q_1, ..., Q_k).
+
+    Balances are persisted with a watermark (latest movement date applied) so later calls only
+    apply newer movements. Changes to the stock snapshot itself (e.g. Stock rows brought in by an
+    incremental refresh) are applied as balance adjustments; the ledger only restarts from the
+    snapshot when the data source changes.
+    """
+
+    def __init__(self, storage_path: Optional[str] = None):
+        self.storage_path = storage_path
+        self.fingerprint = None
+        self.watermark = None
+        self.boundary_ids = set()  # Transactions applied at exactly the watermark date
+        self.balances: Dict[int, float] = {}
+        self.snapshot: Dict[int, float] = {}  # Stock snapshot already reflected in the balances
+        self.violations = 0
+        self._load_data()
+
+    def _load_data(self):
+        if not self.storage_path or not os.path.exists(self.storage_path):
+            return
+        try:
+            with open(self.storage_path, 'r') as f:
+                data = json.load(f)
+            self.fingerprint = data.get("fingerprint")
+            self.watermark = pd.Timestamp(data["watermark"]) if data.get("watermark") else None
+            self.boundary_ids = set(data.get("boundary_ids", []))
+            self.balances = {int(pid): float(qty) for pid, qty in data.get("balances", {}).items()}
+            self.snapshot = {int(pid): float(qty) for pid, qty in data.get("snapshot", {}).items()}
+            self.violations = int(data.get("violations", 0))
+        except Exception as e:
+            logger.error(f"Error loading stock ledger: {e}")
+
+    def _save_data(self):
+        if not self.storage_path:
+            return
+        tmp_path = None
+        try:
+            # Unique temp file + atomic rename: readers never see a partial ledger
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.storage_path) or '.',
+                                            prefix=f".{os.path.basename(self.storage_path)}.", suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    "fingerprint": self.fingerprint,
+                    "watermark": self.watermark.isoformat() if self.watermark is not None else None,
+                    "boundary_ids": sorted(self.boundary_ids),
+                    "balances": {str(pid): qty for pid, qty in self.balances.items()},
+                    "snapshot": {str(pid): qty for pid, qty in self.snapshot.items()},
+                    "violations": self.violations,
+                }, f)
+            os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            logger.error(f"Error saving stock ledger: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def compute_fingerprint(source: str) -> str:
+        return hashlib.sha1(str(source).encode("utf-8")).hexdigest()
+
+    def _reset(self, fingerprint: str, initial_stock: Dict[int, float]):
+        self.fingerprint = fingerprint
+        self.watermark = None
+        self.boundary_ids = set()
+        self.balances = dict(initial_stock)
+        self.snapshot = dict(initial_stock)
+        self.violations = 0
+
+    def _apply_snapshot_changes(self, initial_stock: Dict[int, float]) -> bool:
+        """
+        Applies the difference between `initial_stock` and the snapshot already reflected in the
+        balances (same clip-at-zero rule as movements). Returns whether anything changed.
+        """
+        changed = False
+        for pid in set(initial_stock) | set(self.snapshot):
+            delta = initial_stock.get(pid, 0.0) - self.snapshot.get(pid, 0.0)
+            if delta == 0:
+                continue
+            balance = self.balances.get(pid, 0.0) + delta
+            if balance < 0:
+                self.violations += 1
+                balance = 0.0
+            self.balances[pid] = balance
+            changed = True
+        self.snapshot = dict(initial_stock)
+        return changed
+
+    @staticmethod
+    def _find_date_column(df: pd.DataFrame) -> Optional[str]:
+        if 'cree_le' in df.columns:
+            return 'cree_le'
+        for col in df.columns:
+            if 'date' in col.lower() or 'cree' in col.lower():
+                return col
+        return None
+
+    def update(self, transactions: pd.DataFrame, transaction_lines: pd.DataFrame,
+               initial_stock: Dict[int, float], source: str = "") -> Dict[int, float]:
+        """Brings the balances up to date with the given movements and returns {id_produit: stock}."""
+        fingerprint = self.compute_fingerprint(source)
+        snapshot_changed = False
+        if fingerprint != self.fingerprint:
+            self._reset(fingerprint, initial_stock)
+        else:
+            snapshot_changed = self._apply_snapshot_changes(initial_stock)
+
+        date_col = self._find_date_column(transactions)
+        if date_col is None:
+            # No chronology to watermark on: replay everything from the snapshot
+            self._reset(fingerprint, initial_stock)
+
+        pending = transactions
+        if date_col is not None:
+            pending = transactions.assign(**{date_col: pd.to_datetime(transactions[date_col], errors='coerce')})
+            pending = pending.dropna(subset=[date_col])
+            if self.watermark is not None:
+                after = pending[date_col] > self.watermark
+                at_boundary = (pending[date_col] == self.watermark) & ~pending['id_transaction'].isin(self.boundary_ids)
+                pending = pending[after | at_boundary]
+
+        if pending.empty:
+            if snapshot_changed:
+                self._save_data()
+            return dict(self.balances)
+
+        movements = pd.merge(transaction_lines, pending, on='id_transaction', how='inner')
+        if movements.empty:
+            if snapshot_changed:
+                self._save_data()
+            return dict(self.balances)
+
+        if date_col is not None:
+            # Chronological Integrity Fix: Ensure movements are sorted by date
+            movements = movements.sort_values(date_col, kind='mergesort')
+
+        qty = pd.to_numeric(movements['quantite'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        kinds = movements['type_transaction'].astype(str).str.strip().str.upper()
+        net_change = qty * kinds.map(MOVEMENT_MULTIPLIERS).fillna(0).to_numpy(dtype=np.float64)
+        self._apply(movements['id_produit'].to_numpy(), net_change)
+
+        if date_col is not None:
+            latest = movements[date_col].max()
+            latest_ids = set(movements.loc[movements[date_col] == latest, 'id_transaction'])
+            if self.watermark is not None and latest == self.watermark:
+                self.boundary_ids |= latest_ids
+            else:
+                self.boundary_ids = latest_ids
+            self.watermark = latest
+            self._save_data()
+
+        return dict(self.balances)
+
+    def _apply(self, product_ids: np.ndarray, net_change: np.ndarray):
+        codes, uniques = pd.factorize(product_ids, sort=False)
+        order = np.argsort(codes, kind='stable')  # Keeps chronological order inside each SKU
+        codes = codes[order]
+        changes = net_change[order]
+
+        counts = np.bincount(codes, minlength=len(uniques))
+        ends = np.cumsum(counts)
+        starts = ends - counts
+
+        totals = np.cumsum(changes)
+        group_base = np.concatenate(([0.0], totals[ends[:-1] - 1])) if len(ends) else np.zeros(0)
+        cumulative = totals - np.repeat(group_base, counts)
+
+        opening = np.array([self.balances.get(int(pid), 0.0) for pid in uniques], dtype=np.float64)
+        floor = np.repeat(-opening, counts)
+
+        running_min = pd.Series(cumulative).groupby(codes).cummin().to_numpy()
+        previous_min = np.empty_like(running_min)
+        previous_min[1:] = running_min[:-1]
+        previous_min[starts] = np.inf
+        previous_min = np.minimum(previous_min, floor)
+
+        violations = int(np.count_nonzero(cumulative < previous_min))
+        final = cumulative[ends - 1] - np.minimum(-opening, running_min[ends - 1])
+
+        for pid, qty in zip(uniques, final):
+            self.balances[int(pid)] = float(qty)
+        self.violations += violations
+        if violations > 0:
+            logger.warning(f"Chronological Violation: {violations} operations attempted to reduce stock below zero.")
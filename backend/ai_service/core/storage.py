@@ -3,11 +3,15 @@ import pandas as pd
 from typing import List, Dict, Tuple, Optional
 import enum
 import random
+import itertools
+import time
+from datetime import datetime
 
 logger = logging.getLogger("StorageService")
 
-from ..engine.base import DepotB7Map, WarehouseCoordinate, StorageClass
+from ..engine.base import DepotB7Map, WarehouseCoordinate, StorageClass, RectSumGrid
 from .product_manager import ProductStorageManager
+from .heatmap import TrafficHeatmap
 from ..engine.base import AuditTrail, Role
 
 class StorageOptimizationService:
@@ -22,8 +26,9 @@ class StorageOptimizationService:
         self.slot_distance_scores: Dict[int, Dict[Tuple[int, int], float]] = {}
         
         # --- STEP 8: Dynamic Heatmap Tracker ---
-        # Maps (floor, x, y) to a traffic counter
-        self.traffic_heatmap: Dict[int, Dict[Tuple[int, int], int]] = {}
+        # Hourly ring buffer per floor, scored through an exponentially decayed dense grid;
+        # persisted with the rest of the twin state (see DigitalTwinStateStore)
+        self.heatmap = TrafficHeatmap({f_idx: (w_map.width, w_map.height) for f_idx, w_map in floors.items()})
         
         # --- STEP 8.1: Predictive Forecasting Integration ---
         self.predictive_high_demand_skus = set()
@@ -31,6 +36,17 @@ class StorageOptimizationService:
         # --- REBALANCING: Mapping of occupied slots to products ---
         self.slot_to_product: Dict[Tuple[int, int, int], int] = {} # (floor, x, y) -> product_id
         self.slot_to_code: Dict[Tuple[int, int, int], str] = {}    # (floor, x, y) -> code_emplacement
+        # Reverse index kept in sync with slot_to_product: product_id -> {(floor, x, y): assignment sequence}
+        self.product_to_slots: Dict[int, Dict[Tuple[int, int, int], int]] = {}
+        self._slot_sequence = itertools.count()
+
+        # --- DIGITAL TWIN SYNC: precompiled code lookup + delta watermark ---
+        self.code_coordinate_lookup: Dict[Tuple[str, str], Optional[Tuple[int, int, int]]] = {}
+        self.sync_watermark = None  # max(Emplacement/Stock.mise_a_jour_le) already applied
+        self.physical_state_loaded = False
+
+        # --- SHARED STATE: optional DigitalTwinStateStore (event log + snapshots across workers) ---
+        self.state_store = None
         
         # --- STEP 3: Weights for Multi-Factor Scoring ---
         self.weights = {
@@ -44,6 +60,10 @@ class StorageOptimizationService:
         
         # --- NEW: Pending Workload Tracker ---
         self.pending_tasks: Dict[int, Dict[Tuple[int, int], int]] = {} # floor -> coord -> task_count
+        self.pending_grids: Dict[int, RectSumGrid] = {} # floor -> workload count grid
+
+        # Neighbourhood radius for congestion/workload penalties (1 = 3x3); larger radii use the grids' Fenwick trees
+        self.congestion_radius = 1
         
         self._classify_all_floors()
 
@@ -51,49 +71,187 @@ class StorageOptimizationService:
         """
         Requirement FIX: Synchronize AI digital twin with actual warehouse occupancy.
         Handles both DB objects and CSV data (0A-01-01 format).
+        Full snapshot load: only occupations are applied. Later refreshes go through sync_physical_delta.
         """
         if emplacements_df is None or emplacements_df.empty:
             return
 
         logger.info(f"Synchronizing AI state with {len(emplacements_df)} physical locations...")
-        
-        count = 0
-        for _, row in emplacements_df.iterrows():
-            # Check if occupied or inactive
-            # In DB 'statut' can be 'OCCUPIED' or 'BLOCKED'. In CSV 'actif' can be 'FALSE' for occupied/blocked.
-            is_occupied = False
-            if 'statut' in row and str(row['statut']).upper() in ['OCCUPIED', 'BLOCKED']:
-                is_occupied = True
-            if 'actif' in row:
-                # In the hackathon context, actif=FALSE often means occupied or unavailable
-                val = str(row['actif']).upper()
-                if val == 'FALSE' or val == '0':
-                    is_occupied = True
-            
-            if not is_occupied:
+
+        self._build_code_lookup(emplacements_df)
+        count = self._apply_emplacement_rows(emplacements_df, handle_releases=False)
+        latest = self._latest_update(emplacements_df)
+        if latest is not None and (self.sync_watermark is None or latest > self.sync_watermark):
+            self.sync_watermark = latest
+        self.physical_state_loaded = True
+
+        # A full load is published as a snapshot rather than thousands of events
+        if self.state_store is not None:
+            self.state_store.write_snapshot()
+
+        logger.info(f"Loaded {count} occupied slots into Digital Twin.")
+
+    def sync_physical_delta(self, changes_df: Optional[pd.DataFrame] = None):
+        """
+        Incremental Digital Twin sync: applies only the emplacements changed since the last watermark.
+        Rows that are no longer occupied release their slot, occupied rows (re)assign it.
+        """
+        if changes_df is None or changes_df.empty:
+            return 0
+
+        self._build_code_lookup(changes_df)
+        count = self._apply_emplacement_rows(changes_df, handle_releases=True)
+        latest = self._latest_update(changes_df)
+        if latest is not None and (self.sync_watermark is None or latest > self.sync_watermark):
+            self._emit({"type": "watermark", "value": latest.isoformat()})
+        self.physical_state_loaded = True
+
+        logger.info(f"Delta sync applied {count} emplacement changes (watermark: {self.sync_watermark}).")
+        return count
+
+    @staticmethod
+    def _occupied_mask(emplacements_df: pd.DataFrame) -> pd.Series:
+        """Vectorized occupancy rule: statut OCCUPIED/BLOCKED, or actif FALSE/0 (hackathon CSV convention)."""
+        mask = pd.Series(False, index=emplacements_df.index)
+        if 'statut' in emplacements_df.columns:
+            mask |= emplacements_df['statut'].astype(str).str.upper().isin(['OCCUPIED', 'BLOCKED'])
+        if 'actif' in emplacements_df.columns:
+            mask |= emplacements_df['actif'].astype(str).str.upper().isin(['FALSE', '0'])
+        return mask
+
+    @staticmethod
+    def _coerce_product_id(value) -> Optional[int]:
+        # 'id_produit_id' is often the FK name in Django values(); NaN-padded columns come back as floats
+        if value is None or (isinstance(value, float) and value != value):
+            return None
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+    def _build_code_lookup(self, emplacements_df: pd.DataFrame):
+        """Precompiles the code_emplacement -> (floor, x, y) table once per distinct (code, floor) pair."""
+        if 'code_emplacement' not in emplacements_df.columns:
+            return
+        floors = emplacements_df['id_niveau'] if 'id_niveau' in emplacements_df.columns else pd.Series(0, index=emplacements_df.index)
+        for code, floor_req in set(zip(emplacements_df['code_emplacement'].astype(str), floors.astype(str))):
+            key = (code, floor_req)
+            if key in self.code_coordinate_lookup:
                 continue
-                
-            code = str(row.get('code_emplacement', ''))
-            floor_req = row.get('id_niveau', 0) # Default to 0
-            
-            # Map code (e.g. 0A-01-01) to coordinates
             coord = self._map_code_to_coordinate(code, floor_req)
-            if coord:
-                f_idx = int(floor_req) if str(floor_req).isdigit() else 0
-                if f_idx in self.floors:
-                    coord_tuple = (int(coord.x), int(coord.y))
-                    self.floors[f_idx].occupied_slots.add(coord_tuple)
-                    self.slot_to_code[(f_idx, coord_tuple[0], coord_tuple[1])] = code
-                    
-                    # Track product ID in this slot if available
-                    # 'id_produit_id' is often the FK name in Django values()
-                    product_id = row.get('id_produit_id') or row.get('id_produit')
-                    if product_id and str(product_id).isdigit():
-                        self.slot_to_product[(f_idx, coord_tuple[0], coord_tuple[1])] = int(product_id)
-                    
-                    count += 1
-                    
-        logger.info(f"Loaded {count} occupied slots into Digital Twin.")
+            f_idx = int(floor_req) if floor_req.isdigit() else 0
+            if coord is None or f_idx not in self.floors:
+                self.code_coordinate_lookup[key] = None
+            else:
+                self.code_coordinate_lookup[key] = (f_idx, int(coord.x), int(coord.y))
+
+    def _apply_emplacement_rows(self, emplacements_df: pd.DataFrame, handle_releases: bool) -> int:
+        occupied = self._occupied_mask(emplacements_df).tolist()
+        codes = emplacements_df['code_emplacement'].astype(str).tolist() if 'code_emplacement' in emplacements_df.columns else [''] * len(emplacements_df)
+        floors = emplacements_df['id_niveau'].astype(str).tolist() if 'id_niveau' in emplacements_df.columns else ['0'] * len(emplacements_df)
+        if 'id_produit_id' in emplacements_df.columns:
+            products = emplacements_df['id_produit_id'].tolist()
+        elif 'id_produit' in emplacements_df.columns:
+            products = emplacements_df['id_produit'].tolist()
+        else:
+            products = [None] * len(emplacements_df)
+
+        count = 0
+        for is_occupied, code, floor_req, product_id in zip(occupied, codes, floors, products):
+            slot = self.code_coordinate_lookup.get((code, floor_req))
+            if slot is None:
+                continue
+            f_idx, x, y = slot
+
+            # Full loads mutate locally; deltas are published so every worker applies them
+            apply = self._emit if handle_releases else self.apply_event
+            if is_occupied:
+                pid = self._coerce_product_id(product_id)
+                apply({"type": "occupy", "floor": f_idx, "x": x, "y": y, "product_id": pid, "code": code, "clear_product": pid is None})
+                count += 1
+            elif handle_releases and (x, y) in self.floors[f_idx].occupied_slots and self.slot_to_code.get(slot, code) == code:
+                # Several codes can map onto one grid cell: only the code that claimed it may free it
+                apply({"type": "release", "floor": f_idx, "x": x, "y": y, "clear_code": True})
+                count += 1
+        return count
+
+    @staticmethod
+    def _latest_update(emplacements_df: pd.DataFrame) -> Optional[datetime]:
+        if 'mise_a_jour_le' not in emplacements_df.columns:
+            return None
+        latest = pd.to_datetime(emplacements_df['mise_a_jour_le'], errors='coerce', utc=True).max()
+        if pd.isna(latest):
+            return None
+        return latest.to_pydatetime()
+
+    def _emit(self, event: Dict):
+        """Routes a twin mutation through the shared event log when one is attached, else applies it locally."""
+        if self.state_store is not None:
+            self.state_store.append(event)
+        else:
+            self.apply_event(event)
+
+    def apply_event(self, event: Dict):
+        """
+        Applies one digital twin event to the local state (occupy / release / pick / watermark).
+        Used both for local mutations and when replaying the shared event log.
+        """
+        kind = event.get("type")
+        if kind == "watermark":
+            value = datetime.fromisoformat(event["value"])
+            if self.sync_watermark is None or value > self.sync_watermark:
+                self.sync_watermark = value
+            self.physical_state_loaded = True
+            return
+
+        f_idx = event.get("floor")
+        if f_idx not in self.floors:
+            return
+        x, y = int(event["x"]), int(event["y"])
+        slot = (f_idx, x, y)
+
+        if kind == "occupy":
+            self.floors[f_idx].occupied_slots.add((x, y))
+            if event.get("code") is not None:
+                self.slot_to_code[slot] = event["code"]
+            if event.get("product_id") is not None:
+                self._set_slot_product(slot, int(event["product_id"]))
+            elif event.get("clear_product"):
+                self._clear_slot_product(slot)
+        elif kind == "release":
+            self.floors[f_idx].occupied_slots.discard((x, y))
+            self._clear_slot_product(slot)
+            if event.get("clear_code"):
+                self.slot_to_code.pop(slot, None)
+        elif kind == "pick":
+            self.heatmap.record(f_idx, x, y, ts=event.get("ts"))
+
+    def export_state(self) -> Dict:
+        """Serializable digital twin state (used for shared snapshots)."""
+        return {
+            "occupied_slots": {f_idx: sorted(w_map.occupied_slots) for f_idx, w_map in self.floors.items()},
+            "product_to_slots": {pid: dict(slots) for pid, slots in self.product_to_slots.items()},
+            "slot_to_code": dict(self.slot_to_code),
+            "sync_watermark": self.sync_watermark,
+            "physical_state_loaded": self.physical_state_loaded,
+            "heatmap": self.heatmap.export_state(),
+        }
+
+    def restore_state(self, state: Dict):
+        """Replaces the local digital twin state with an exported snapshot."""
+        for f_idx, w_map in self.floors.items():
+            w_map.occupied_slots.clear()
+            w_map.occupied_slots.update(tuple(cell) for cell in state["occupied_slots"].get(f_idx, []))
+
+        self.product_to_slots = {pid: dict(slots) for pid, slots in state["product_to_slots"].items()}
+        self.slot_to_product = {slot: pid for pid, slots in self.product_to_slots.items() for slot in slots}
+        last_sequence = max((seq for slots in self.product_to_slots.values() for seq in slots.values()), default=-1)
+        self._slot_sequence = itertools.count(last_sequence + 1)
+
+        self.slot_to_code = dict(state["slot_to_code"])
+        self.sync_watermark = state["sync_watermark"]
+        self.physical_state_loaded = state["physical_state_loaded"]
+        self.heatmap.restore_state(state["heatmap"])
 
     def _map_code_to_coordinate(self, code: str, floor_idx: int) -> Optional[WarehouseCoordinate]:
         """Heuristic mapping from B7 codes to grid coordinates."""
@@ -137,6 +295,14 @@ class StorageOptimizationService:
         :param tasks_by_coord: {floor_idx: {(x, y): count}}
         """
         self.pending_tasks = tasks_by_coord
+        self.pending_grids = {}
+        for floor_idx, tasks in tasks_by_coord.items():
+            if floor_idx not in self.floors:
+                continue
+            w_map = self.floors[floor_idx]
+            grid = RectSumGrid(w_map.width, w_map.height)
+            grid.load(tasks)
+            self.pending_grids[floor_idx] = grid
 
     def apply_forecast_data(self, high_demand_skus: List[int]):
         """
@@ -167,8 +333,8 @@ class StorageOptimizationService:
             freq_multiplier = 0.3 
         
         # --- STEP 8: Dynamic Alpha Adjustment (Heatmap) ---
-        # Get traffic load for the specific zone (x,y)
-        traffic_load = self.traffic_heatmap.get(floor_idx, {}).get((int(coord.x), int(coord.y)), 0)
+        # Get (time-decayed) traffic load for the specific zone (x,y)
+        traffic_load = self.heatmap.value(floor_idx, int(coord.x), int(coord.y))
         # If a zone is 'Hot' (high traffic), alpha increases to discourage more placement there
         # alpha = baseline + (traffic * factor)
         dynamic_alpha = self.weights["distance"] + (traffic_load * self.weights["traffic"])
@@ -186,25 +352,18 @@ class StorageOptimizationService:
         score += weight_penalty
         
         # 3. Congestion Penalty
-        congestion_penalty = 0.0
-        occupied_count = 0
-        # Check 3x3 surrounding
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if (int(coord.x) + dx, int(coord.y) + dy) in self.floors[floor_idx].occupied_slots:
-                    occupied_count += 1
+        # Occupied cells in the neighbourhood window, read from the occupancy count grid
+        occupied_count = self.floors[floor_idx].occupied_slots.grid.window_sum(int(coord.x), int(coord.y), self.congestion_radius)
         
         congestion_penalty = occupied_count * self.weights["congestion"]
         score += congestion_penalty
         
         # 4. NEW: Workload Congestion Penalty (Dynamic)
-        # Avoid zones where many picks are already scheduled
+        # Avoid zones where many picks are already scheduled (same window for workload spillover)
         workload_penalty = 0.0
-        # Check 3x3 surrounding for workload spillover
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                node_workload = self.pending_tasks.get(floor_idx, {}).get((int(coord.x) + dx, int(coord.y) + dy), 0)
-                workload_penalty += node_workload * self.weights["workload"]
+        workload_grid = self.pending_grids.get(floor_idx)
+        if workload_grid is not None:
+            workload_penalty = workload_grid.window_sum(int(coord.x), int(coord.y), self.congestion_radius) * self.weights["workload"]
         
         score += workload_penalty
         
@@ -281,8 +440,7 @@ class StorageOptimizationService:
         AuditTrail.log(supervisor_role, f"Manual Override: Assigned product {product_id} to {slot_name}", justification)
         
         # Logic to occupy the slot
-        m_map.occupied_slots.add(coord.to_tuple())
-        self.slot_to_product[(floor_idx, int(coord.x), int(coord.y))] = product_id
+        self._emit({"type": "occupy", "floor": floor_idx, "x": int(coord.x), "y": int(coord.y), "product_id": product_id})
         return True
 
     def assign_slot(self, product_id: int, floor_idx: int, coord: WarehouseCoordinate, role: Role = Role.ADMIN) -> bool:
@@ -291,8 +449,7 @@ class StorageOptimizationService:
         Requirement 8.2: Audit trail logged.
         """
         if floor_idx in self.floors:
-            self.floors[floor_idx].occupied_slots.add((int(coord.x), int(coord.y)))
-            self.slot_to_product[(floor_idx, int(coord.x), int(coord.y))] = product_id
+            self._emit({"type": "occupy", "floor": floor_idx, "x": int(coord.x), "y": int(coord.y), "product_id": product_id})
             
             # Log action
             AuditTrail.log(role, f"Assigned SKU {product_id} to {self.floors[floor_idx].get_slot_name(coord)}")
@@ -317,26 +474,77 @@ class StorageOptimizationService:
         AuditTrail.log(Role.SUPERVISOR, f"Manual Override by {supervisor_id} for SKU {product_id}", justification)
         return True
 
-    def record_picking_event(self, floor_idx: int, coord: WarehouseCoordinate):
+    def record_picking_event(self, floor_idx: int, coord: WarehouseCoordinate, timestamp=None):
         """
         STEP 8: Dynamic Heatmap Update.
-        Increments the traffic count for a specific coordinate.
-        This increases the cost (alpha) for this area to prevent over-congestion.
+        Increments the traffic count for a specific coordinate in the current hourly bucket.
+        This increases the cost (alpha) for this area to prevent over-congestion; the effect fades with age.
         """
-        if floor_idx not in self.traffic_heatmap:
-            self.traffic_heatmap[floor_idx] = {}
-        
-        node = (int(coord.x), int(coord.y))
-        self.traffic_heatmap[floor_idx][node] = self.traffic_heatmap[floor_idx].get(node, 0) + 1
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        ts = float(timestamp) if timestamp is not None else time.time()
+        self._emit({"type": "pick", "floor": floor_idx, "x": int(coord.x), "y": int(coord.y), "ts": ts})
+
+    @property
+    def traffic_heatmap(self) -> Dict[int, Dict[Tuple[int, int], float]]:
+        """Sparse view of the decayed heatmap: {floor: {(x, y): traffic}}."""
+        return self.heatmap.as_dict()
 
     def release_slot(self, floor_idx: int, coord: WarehouseCoordinate):
         """Removes a slot from occupied_slots (e.g., after picking/shipping)."""
         if floor_idx in self.floors:
-            self.floors[floor_idx].occupied_slots.discard((int(coord.x), int(coord.y)))
-            self.slot_to_product.pop((floor_idx, int(coord.x), int(coord.y)), None)
+            self._emit({"type": "release", "floor": floor_idx, "x": int(coord.x), "y": int(coord.y)})
             return True
         return False
 
+    def _set_slot_product(self, slot: Tuple[int, int, int], product_id: int):
+        """Single write path for slot_to_product so the product -> slots index never drifts."""
+        previous = self.slot_to_product.get(slot)
+        if previous == product_id:
+            return
+        if previous is not None:
+            self._clear_slot_product(slot)
+        self.slot_to_product[slot] = product_id
+        self.product_to_slots.setdefault(product_id, {})[slot] = next(self._slot_sequence)
+
+    def _clear_slot_product(self, slot: Tuple[int, int, int]):
+        product_id = self.slot_to_product.pop(slot, None)
+        if product_id is None:
+            return
+        slots = self.product_to_slots.get(product_id)
+        if slots is not None:
+            slots.pop(slot, None)
+            if not slots:
+                del self.product_to_slots[product_id]
+
+    def get_product_slots(self, product_id: int) -> List[Tuple[int, int, int]]:
+        """All (floor, x, y) slots holding a product, oldest assignment first."""
+        slots = self.product_to_slots.get(product_id, {})
+        return sorted(slots, key=slots.get)
+
+    def locate_product(self, product_id: int, strategy: str = "FIFO", from_floor: Optional[int] = None,
+                       from_coord: Optional[Tuple[int, int]] = None, floor_penalty: float = 25.0) -> Optional[Tuple[int, int, int]]:
+        """
+        Picks the slot to serve a product from when it sits in several locations.
+        FIFO: oldest assignment first (stock rotation).
+        NEAREST: shortest travel from `from_floor`/`from_coord`, or from expedition when no position is given.
+        """
+        slots = self.product_to_slots.get(product_id)
+        if not slots:
+            return None
+        if strategy.upper() != "NEAREST":
+            return min(slots, key=slots.get)
+
+        def travel(slot):
+            f_idx, x, y = slot
+            if from_coord is not None:
+                same_floor = from_floor is None or from_floor == f_idx
+                dist = abs(x - from_coord[0]) + abs(y - from_coord[1])
+                return dist if same_floor else dist + abs(f_idx - from_floor) * floor_penalty
+            return self.slot_distance_scores.get(f_idx, {}).get((x, y), 100.0) + f_idx * floor_penalty
+
+        return min(slots, key=lambda slot: (travel(slot), slots[slot]))
+
     def check_for_rebalancing(self, traffic_threshold: int = 15) -> List[Dict]:
         """
         Slot Rebalancing Engine. 
@@ -346,14 +554,12 @@ class StorageOptimizationService:
         self._classify_all_floors() # Ensure zoning is fresh
         relocation_suggestions = []
         
-        # --- 1. Identify hotspots from the heatmap ---
-        for floor_idx, heatmap in self.traffic_heatmap.items():
-            for coord_tuple, traffic_count in heatmap.items():
-                if traffic_count >= traffic_threshold:
-                    product_id = self.slot_to_product.get((floor_idx, coord_tuple[0], coord_tuple[1]))
-                    if product_id:
-                        suggestion = self._find_better_slot_for_relocation(product_id, floor_idx, coord_tuple, f"Overcrowded zone (Traffic: {traffic_count})")
-                        if suggestion: relocation_suggestions.append(suggestion)
+        # --- 1. Identify hotspots from the (time-decayed) heatmap ---
+        for floor_idx, coord_tuple, traffic_count in self.heatmap.hotspots(traffic_threshold):
+            product_id = self.slot_to_product.get((floor_idx, coord_tuple[0], coord_tuple[1]))
+            if product_id:
+                suggestion = self._find_better_slot_for_relocation(product_id, floor_idx, coord_tuple, f"Overcrowded zone (Traffic: {traffic_count:.0f})")
+                if suggestion: relocation_suggestions.append(suggestion)
 
         # --- 2. Identify Misplaced Items (Zoning Optimization) ---
         # If we have no heatmap hits, we still want to optimize for travel speed
@@ -370,6 +576,26 @@ class StorageOptimizationService:
 
         return relocation_suggestions
 
+    def snapshot(self) -> Dict:
+        """Point-in-time copy of the mutable digital twin state (planners never touch the live maps)."""
+        return {
+            "occupied_slots": {f_idx: set(w_map.occupied_slots) for f_idx, w_map in self.floors.items()},
+            "slot_to_product": dict(self.slot_to_product),
+            "slot_to_code": dict(self.slot_to_code),
+            "traffic_grids": {f_idx: self.heatmap.dense_grid(f_idx).copy() for f_idx in self.floors},
+            "pending_tasks": {f_idx: dict(tasks) for f_idx, tasks in self.pending_tasks.items()},
+            "sync_watermark": self.sync_watermark,
+        }
+
+    def plan_rebalancing(self, max_moves: int = 50, min_saving: float = 5.0) -> Dict:
+        """
+        Global re-slotting: one optimization pass over a snapshot, returning an ordered move plan
+        (chains and buffered swaps) limited to `max_moves` with at least `min_saving` expected travel saving per group.
+        """
+        from .rebalancing import SlotRebalancingPlanner
+        self._classify_all_floors() # Ensure zoning is fresh
+        return SlotRebalancingPlanner(self).plan(self.snapshot(), max_moves=max_moves, min_saving=min_saving)
+
     def _find_better_slot_for_relocation(self, product_id, floor_idx, coord_tuple, reason):
         current_coord = WarehouseCoordinate(coord_tuple[0], coord_tuple[1])
         current_score = self.calculate_slot_score(floor_idx, current_coord, product_id)
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("DecisionTraceStore")
+
+
+class DecisionTraceStore:
+    """
+    Append-only columnar store of forecast decision traces.
+    Layout: <root>/run_date=YYYY-MM-DD/<run_id>.npz, one part per forecast run, plus
+    <root>/manifest.jsonl listing every part (run id, run time, source, rows, SKU range).
+    - Parts are never rewritten; a run only adds a part and a manifest line.
+    - Rows of a part are sorted by SKU; numeric columns are plain arrays and text columns are
+      dictionary-encoded (codes + distinct values), so repeated justifications cost 4 bytes a row.
+    - A SKU index (product id -> part, row) is built from the parts' product_id columns and
+      extended when the manifest grows, so lookups never recompute a forecast.
+    """
+
+    MANIFEST_FILE = "manifest.jsonl"
+    FLOAT_COLUMNS = (
+        'ses_pred', 'reg_pred', 'hybrid_pred', 'yoy_seasonal', 'base_prediction',
+        'wape_ses', 'wape_reg', 'wape_hybrid',
+        'trend_multiplier', 'bias_correction', 'safety_factor', 'adjustment_factor',
+        'raw_forecast', 'final_forecast', 'trend_strength', 'safety_stock',
+    )
+    TEXT_COLUMNS = ('selected_model', 'trend', 'volatility', 'demand_class', 'justification', 'formula')
+    ADJUSTMENT_COLUMNS = ('trend_multiplier', 'bias_correction', 'safety_factor')
+
+    def __init__(self, root_dir: str, cached_parts: int = 8):
+        self.root_dir = root_dir
+        self.cached_parts = max(1, int(cached_parts))
+        self._lock = threading.Lock()
+        self._parts: List[Dict] = []
+        self._manifest_offset = 0
+        self._index_pids = np.array([], dtype=np.int64)
+        self._index_parts = np.array([], dtype=np.int32)
+        self._index_rows = np.array([], dtype=np.int32)
+        self._columns: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def append(self, decisions: Sequence[Tuple[int, Dict]], target_date=None, source: str = '',
+               run_at: Optional[datetime] = None) -> Optional[str]:
+        """Writes one part with the traces of a run; returns its run id (None when nothing was written)."""
+        if not decisions:
+            return None
+        run_at = run_at or datetime.now()
+        run_id = f"{run_at.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        target = _as_date(target_date) if target_date is not None else None
+
+        decisions = sorted(decisions, key=lambda item: int(item[0]))
+        arrays = {'product_id': np.array([int(pid) for pid, _ in decisions], dtype=np.int64)}
+        for column in self.FLOAT_COLUMNS:
+            arrays[column] = np.array([float(self._value(d, column)) for _, d in decisions], dtype=np.float64)
+        arrays['confidence'] = np.array([int(d.get('confidence', 0)) for _, d in decisions], dtype=np.int16)
+        for column in self.TEXT_COLUMNS:
+            values = [str(d.get(column, '')) for _, d in decisions]
+            uniques, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+            arrays[column] = codes.astype(np.int32)
+            arrays[f"{column}.values"] = uniques
+
+        partition = f"run_date={run_at.strftime('%Y-%m-%d')}"
+        relative_path = os.path.join(partition, f"{run_id}.npz")
+        try:
+            os.makedirs(os.path.join(self.root_dir, partition), exist_ok=True)
+            tmp_path = os.path.join(self.root_dir, partition, f".tmp-{run_id}.npz")
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, os.path.join(self.root_dir, relative_path))
+            entry = {
+                'run_id': run_id,
+                'run_at': run_at.isoformat(timespec='seconds'),
+                'target_date': target.isoformat() if target else None,
+                'source': source,
+                'path': relative_path,
+                'rows': len(decisions),
+                'min_pid': int(arrays['product_id'][0]),
+                'max_pid': int(arrays['product_id'][-1]),
+            }
+            with open(os.path.join(self.root_dir, self.MANIFEST_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except Exception as e:
+            logger.error(f"Error writing decision traces: {e}")
+            return None
+        logger.info(f"Stored {len(decisions)} decision traces for run {run_id} ({source}).")
+        return run_id
+
+    @classmethod
+    def _value(cls, decision: Dict, column: str):
+        if column in cls.ADJUSTMENT_COLUMNS:
+            return decision.get('adjustment_detail', {}).get(column, 0.0)
+        return decision.get(column, 0.0)
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def _refresh(self):
+        """Picks up the parts appended since the last call (by this or any other process)."""
+        manifest_path = os.path.join(self.root_dir, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path) or os.path.getsize(manifest_path) == self._manifest_offset:
+            return
+        new_parts = []
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            f.seek(self._manifest_offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Line still being written
+                self._manifest_offset += len(line.encode("utf-8"))
+                new_parts.append(json.loads(line))
+
+        pids, parts, rows = [self._index_pids], [self._index_parts], [self._index_rows]
+        for entry in new_parts:
+            part_no = len(self._parts)
+            self._parts.append(entry)
+            try:
+                with np.load(os.path.join(self.root_dir, entry['path']), allow_pickle=False) as npz:
+                    part_pids = npz['product_id']
+            except Exception as e:
+                logger.error(f"Error indexing decision traces {entry['path']}: {e}")
+                continue
+            pids.append(part_pids)
+            parts.append(np.full(len(part_pids), part_no, dtype=np.int32))
+            rows.append(np.arange(len(part_pids), dtype=np.int32))
+
+        pids, parts, rows = np.concatenate(pids), np.concatenate(parts), np.concatenate(rows)
+        # Stable sort keeps each SKU's entries in run order
+        order = np.argsort(pids, kind='stable')
+        self._index_pids, self._index_parts, self._index_rows = pids[order], parts[order], rows[order]
+
+    def _part_columns(self, part_no: int) -> Dict[str, np.ndarray]:
+        columns = self._columns.get(part_no)
+        if columns is None:
+            with np.load(os.path.join(self.root_dir, self._parts[part_no]['path']), allow_pickle=False) as npz:
+                columns = {name: npz[name] for name in npz.files}
+            self._columns[part_no] = columns
+            while len(self._columns) > self.cached_parts:
+                self._columns.popitem(last=False)
+        self._columns.move_to_end(part_no)
+        return columns
+
+    def _record(self, part_no: int, row: int) -> Dict:
+        columns = self._part_columns(part_no)
+        entry = self._parts[part_no]
+        record = {
+            'product_id': int(columns['product_id'][row]),
+            'run_id': entry['run_id'],
+            'run_at': entry['run_at'],
+            'target_date': entry['target_date'],
+            'source': entry['source'],
+            'confidence': int(columns['confidence'][row]),
+        }
+        for column in self.FLOAT_COLUMNS:
+            # Parts written before a column was added have no value for it
+            record[column] = float(columns[column][row]) if column in columns else None
+        for column in self.TEXT_COLUMNS:
+            record[column] = str(columns[f"{column}.values"][columns[column][row]])
+        record['adjustment_detail'] = {column: record.pop(column) for column in self.ADJUSTMENT_COLUMNS}
+        return record
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def history(self, pid: int, min_target_date=None, max_target_date=None) -> List[Dict]:
+        """Every stored trace of `pid` in run order, optionally restricted to a target-date range."""
+        low = _as_date(min_target_date).isoformat() if min_target_date is not None else None
+        high = _as_date(max_target_date).isoformat() if max_target_date is not None else None
+        with self._lock:
+            self._refresh()
+            start, stop = np.searchsorted(self._index_pids, [int(pid), int(pid) + 1])
+            records = []
+            for part_no, row in zip(self._index_parts[start:stop], self._index_rows[start:stop]):
+                target = self._parts[part_no]['target_date']
+                if (low and (target is None or target < low)) or (high and (target is None or target > high)):
+                    continue
+                records.append(self._record(int(part_no), int(row)))
+        return records
+
+    def latest(self, pid: int, min_target_date=None) -> Optional[Dict]:
+        """Most recent trace of `pid` (for a target date >= `min_target_date` when given)."""
+        low = _as_date(min_target_date).isoformat() if min_target_date is not None else None
+        with self._lock:
+            self._refresh()
+            start, stop = np.searchsorted(self._index_pids, [int(pid), int(pid) + 1])
+            for position in range(stop - 1, start - 1, -1):
+                part_no = int(self._index_parts[position])
+                target = self._parts[part_no]['target_date']
+                if low and (target is None or target < low):
+                    continue
+                return self._record(part_no, int(self._index_rows[position]))
+        return None
+
+    def runs(self) -> List[Dict]:
+        """Manifest entries of every stored run, oldest first."""
+        with self._lock:
+            self._refresh()
+            return [dict(entry) for entry in self._parts]
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger("DemandTriage")
+
+
+class DemandTriage:
+    """
+    Routes every SKU before the model-selection pipeline, from the classify_demand statistics of
+    its raw history:
+    - FULL: fast / volatile movers, and slow movers without a fresh validation.
+    - INTERMITTENT: slow movers whose demand is intermittent (ADI >= 1.32 days between demands or
+      at least half zero days): Croston/SBA rate, no series preparation, no WAPE backtest.
+    - CACHED: other slow movers validated within `revalidate_days` whose recent mean demand has
+      not drifted by more than `drift_threshold`: the stored validation (WAPEs, blend weights,
+      error variances) is reused and the backtest is skipped.
+    Validations are remembered per SKU in a small JSON file, like the learning engine.
+    """
+
+    FULL = 'full'
+    CACHED = 'cached'
+    INTERMITTENT = 'intermittent'
+
+    def __init__(self, deterministic, storage_path: Optional[str] = None, enabled: bool = True,
+                 revalidate_days: int = 7, drift_threshold: float = 0.25, adi_cutoff: float = 1.32,
+                 sba_alpha: float = 0.1, recent_points: int = 14):
+        """
+        :param deterministic: DeterministicForecastModel providing classify_stats
+        :param adi_cutoff: Average inter-demand interval (days) above which demand is intermittent (Syntetos-Boylan)
+        :param sba_alpha: Smoothing constant of the Croston size/interval estimates
+        :param recent_points: Observed days used for the drift check
+        """
+        self.deterministic = deterministic
+        self.storage_path = storage_path
+        self.enabled = enabled
+        self.revalidate_days = revalidate_days
+        self.drift_threshold = drift_threshold
+        self.adi_cutoff = adi_cutoff
+        self.sba_alpha = sba_alpha
+        self.recent_points = recent_points
+        self.entries: Dict[str, Dict] = self._load_data()
+
+    def _load_data(self) -> Dict[str, Dict]:
+        if not self.storage_path or not os.path.exists(self.storage_path):
+            return {}
+        try:
+            with open(self.storage_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading triage state: {e}")
+            return {}
+
+    def save(self):
+        if not self.storage_path:
+            return
+        try:
+            # Unique temp file, then an atomic rename: readers never see a partially written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.storage_path) or '.',
+                                            prefix=f".{os.path.basename(self.storage_path)}.", suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            logger.error(f"Error saving triage state: {e}")
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def profile(self, dates: np.ndarray, quantities: np.ndarray) -> Dict:
+        """classify_demand statistics of the raw history plus the average inter-demand interval."""
+        quantities = np.asarray(quantities, dtype=np.float64)
+        n = len(quantities)
+        if n == 0:
+            return {'n': 0, 'demand_class': 'slow_mover', 'adi': float('inf'), 'zero_ratio': 1.0, 'recent_mean': 0.0}
+        mean = float(quantities.mean())
+        zero_ratio = float((quantities == 0).mean())
+        std = float(quantities.std(ddof=1)) if n > 1 else float('nan')
+        nonzero_days = np.asarray(dates, dtype='datetime64[D]')[quantities > 0]
+        if len(nonzero_days) > 1:
+            adi = float((nonzero_days[-1] - nonzero_days[0]) / np.timedelta64(1, 'D')) / (len(nonzero_days) - 1)
+        else:
+            adi = float('inf')
+        return {
+            'n': n,
+            'demand_class': self.deterministic.classify_stats(mean, zero_ratio, std),
+            'adi': adi,
+            'zero_ratio': zero_ratio,
+            'recent_mean': float(quantities[-self.recent_points:].mean()),
+        }
+
+    def route(self, pid: int, profile: Dict, today: Optional[date] = None) -> str:
+        if not self.enabled or profile['n'] == 0 or profile['demand_class'] != 'slow_mover':
+            return self.FULL
+        if profile['adi'] >= self.adi_cutoff or profile['zero_ratio'] >= 0.5:
+            return self.INTERMITTENT
+        entry = self.entries.get(str(int(pid)))
+        if entry is None:
+            return self.FULL
+        today = today or datetime.now().date()
+        age = (today - datetime.strptime(entry['validated_on'], '%Y-%m-%d').date()).days
+        drift = abs(profile['recent_mean'] - entry['recent_mean']) / max(entry['recent_mean'], 1.0)
+        if age >= self.revalidate_days or drift > self.drift_threshold:
+            return self.FULL
+        return self.CACHED
+
+    def cached_validation(self, pid: int) -> Optional[Dict]:
+        entry = self.entries.get(str(int(pid)))
+        return dict(entry['validation']) if entry is not None else None
+
+    def entry(self, profile: Dict, validation: Dict, today: Optional[date] = None) -> Dict:
+        """Record stored after a full validation of a slow mover."""
+        return {
+            'validated_on': (today or datetime.now().date()).strftime('%Y-%m-%d'),
+            'recent_mean': profile['recent_mean'],
+            'validation': validation,
+        }
+
+    def remember(self, pid: int, entry: Dict):
+        self.entries[str(int(pid))] = entry
+
+    # ------------------------------------------------------------------
+    # Croston / SBA
+    # ------------------------------------------------------------------
+    def sba(self, dates: np.ndarray, quantities: np.ndarray) -> Dict:
+        """
+        Syntetos-Boylan approximation of Croston's method: demand sizes z and inter-demand intervals p
+        (calendar days) are smoothed separately at each demand; the daily rate is (1 - α/2) · z / p.
+        z starts at the first demand and p at the average interval of the history.
+        """
+        quantities = np.asarray(quantities, dtype=np.float64)
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        demand_rows = np.flatnonzero(quantities > 0)
+        if len(demand_rows) == 0:
+            return {'rate': 0.0, 'size': 0.0, 'interval': float('inf')}
+
+        alpha = self.sba_alpha
+        first = demand_rows[0]
+        size = float(quantities[first])
+        # Interval starts at the average gap between demands (the whole span when there is one demand)
+        if len(demand_rows) > 1:
+            interval = float(days[demand_rows[-1]] - days[first]) / (len(demand_rows) - 1)
+        else:
+            interval = float(max(1, days[-1] - days[0] + 1))
+        previous = first
+        for row in demand_rows[1:]:
+            size += alpha * (float(quantities[row]) - size)
+            interval += alpha * (float(days[row] - days[previous]) - interval)
+            previous = row
+        return {'rate': (1 - alpha / 2) * size / interval, 'size': size, 'interval': interval}
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import pickle
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server
+    fcntl = None
+
+logger = logging.getLogger("DigitalTwinState")
+
+
+class DigitalTwinStateStore:
+    """
+    Shared, persistent Digital Twin state for multi-worker deployments.
+    Layout of `state_dir`:
+    - HEAD.json: {"generation": g, "snapshot": "snapshot_<g>.pkl"}
+    - snapshot_<g>.pkl: full twin state (StorageOptimizationService.export_state)
+    - events_<g>.jsonl: append-only mutations applied after snapshot g
+    - LOCK: advisory lock serializing writers
+    Each worker loads the latest snapshot once, then only replays the log tail it has not seen.
+    Every `snapshot_every` events the log is compacted into a new generation.
+    """
+
+    def __init__(self, state_dir: str, snapshot_every: int = 500):
+        self.state_dir = state_dir
+        self.snapshot_every = max(1, int(snapshot_every))
+        os.makedirs(state_dir, exist_ok=True)
+        self.service = None
+        self.generation = -1
+        self.offset = 0
+        self.events_in_generation = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.state_dir, name)
+
+    def _events_path(self, generation: int) -> str:
+        return self._path(f"events_{generation}.jsonl")
+
+    @contextmanager
+    def _locked(self):
+        with open(self._path("LOCK"), "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_head(self) -> Optional[Dict]:
+        try:
+            with open(self._path("HEAD.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, name: str, payload: bytes):
+        tmp_path = self._path(f"{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(name))
+
+    def attach(self, service):
+        """Binds the store to a StorageOptimizationService and brings it up to date."""
+        self.service = service
+        service.state_store = self
+        self._load_snapshot()
+        self.catch_up()
+
+    def restore(self, service):
+        """
+        Read-only attach: brings `service` up to the shared state (snapshot + event log) without
+        binding it, so its own mutations stay local (e.g. offline planning commands).
+        """
+        self.service = service
+        self._load_snapshot()
+        self.catch_up()
+
+    def _load_snapshot(self):
+        head = self._read_head()
+        if head is None:
+            self.generation, self.offset, self.events_in_generation = 0, 0, 0
+            return
+        try:
+            with open(self._path(head["snapshot"]), "rb") as f:
+                self.service.restore_state(pickle.load(f))
+        except Exception as e:
+            logger.error(f"Error loading twin snapshot {head.get('snapshot')}: {e}")
+        self.generation = int(head["generation"])
+        self.offset = 0
+        self.events_in_generation = 0
+
+    def catch_up(self) -> int:
+        """Applies events written by other workers since the last call. Returns the number applied."""
+        if self.service is None:
+            return 0
+        applied = 0
+        while True:
+            # HEAD is read first: once it has moved on, the current log is final
+            head = self._read_head()
+            path = self._events_path(self.generation)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    f.seek(self.offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # Partial write still in progress
+                        self.offset += len(line)
+                        self.events_in_generation += 1
+                        try:
+                            self.service.apply_event(json.loads(line))
+                            applied += 1
+                        except Exception as e:
+                            logger.error(f"Skipping malformed twin event: {e}")
+
+            if head is None or int(head["generation"]) == self.generation:
+                return applied
+            if int(head["generation"]) == self.generation + 1 and os.path.exists(self._events_path(self.generation + 1)):
+                # Our log is fully consumed and the next snapshot equals it: just move on
+                self.generation += 1
+                self.offset = 0
+                self.events_in_generation = 0
+            else:
+                # Fell more than one generation behind (old logs pruned): reload the snapshot
+                self._load_snapshot()
+
+    def append(self, event: Dict):
+        """Publishes a twin mutation to all workers and applies it locally."""
+        with self._locked():
+            self.catch_up()
+            line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+            with open(self._events_path(self.generation), "ab") as f:
+                f.write(line)
+                f.flush()
+            self.offset += len(line)
+            self.events_in_generation += 1
+            self.service.apply_event(event)
+            if self.events_in_generation >= self.snapshot_every:
+                self._write_snapshot_locked()
+
+    def write_snapshot(self):
+        """Compacts the current state into a new generation (e.g. after a full physical sync)."""
+        with self._locked():
+            self.catch_up()
+            self._write_snapshot_locked()
+
+    def _write_snapshot_locked(self):
+        next_generation = self.generation + 1
+        snapshot_name = f"snapshot_{next_generation}.pkl"
+        try:
+            self._write_atomic(snapshot_name, pickle.dumps(self.service.export_state(), protocol=pickle.HIGHEST_PROTOCOL))
+            open(self._events_path(next_generation), "ab").close()
+            head = {"generation": next_generation, "snapshot": snapshot_name}
+            self._write_atomic("HEAD.json", json.dumps(head).encode("utf-8"))
+        except Exception as e:
+            logger.error(f"Error writing twin snapshot: {e}")
+            return
+
+        self.generation = next_generation
+        self.offset = 0
+        self.events_in_generation = 0
+
+        # Keep the previous generation so readers mid-catch-up can still finish it
+        stale = next_generation - 2
+        for name in (f"snapshot_{stale}.pkl", f"events_{stale}.jsonl"):
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Twin snapshot generation {next_generation} written.")
@@ -1,6 +1,7 @@
 import datetime
 from typing import List, Tuple, Dict, Optional, Union
 import enum
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
@@ -44,6 +45,181 @@ class WarehouseCoordinate:
     def to_3d_tuple(self) -> Tuple[int, int, int]:
         return (self.x, self.y, self.z)
 
+class RectSumGrid:
+    """
+    Per-floor integer grid answering rectangle sums.
+    - Cells are kept as plain row lists: small windows (the default 3x3 congestion window) are
+      summed directly from them, which beats any indexed structure at that size.
+    - Larger windows go through a 2D Fenwick (binary indexed) tree updated alongside the cells,
+      so point updates and rectangle sums both touch O(log W * log H) tree nodes.
+    """
+    # Windows up to this many cells are summed cell by cell
+    SCALAR_WINDOW_CELLS = 25
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.cells = [[0] * height for _ in range(width)]
+        self.tree = np.zeros((width + 1, height + 1), dtype=np.int64)  # 1-based Fenwick tree
+        self._update_x, self._query_x = self._chains(width)
+        self._update_y, self._query_y = self._chains(height)
+
+    @staticmethod
+    def _chains(n: int):
+        """Per 1-based index: tree nodes an update walks up to, and nodes a prefix query walks down."""
+        updates, queries = [None], [np.zeros(0, dtype=np.intp)]
+        for i in range(1, n + 1):
+            up, j = [], i
+            while j <= n:
+                up.append(j)
+                j += j & -j
+            down, j = [], i
+            while j > 0:
+                down.append(j)
+                j -= j & -j
+            updates.append(np.array(up, dtype=np.intp))
+            queries.append(np.array(down, dtype=np.intp))
+        return updates, queries
+
+    def add(self, x: int, y: int, delta: int = 1):
+        if delta and 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[x][y] += delta
+            self.tree[np.ix_(self._update_x[x + 1], self._update_y[y + 1])] += delta
+
+    def set(self, x: int, y: int, value: int):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.add(x, y, int(value) - self.cells[x][y])
+
+    def load(self, values: Dict[Tuple[int, int], int]):
+        """Bulk (re)load from a {(x, y): count} dict, then rebuild the tree in one vectorized pass."""
+        self.cells = [[0] * self.height for _ in range(self.width)]
+        for (x, y), count in values.items():
+            if 0 <= x < self.width and 0 <= y < self.height:
+                self.cells[int(x)][int(y)] += int(count)
+        self.rebuild()
+
+    def rebuild(self):
+        """Fenwick node (i, j) holds the cells of (i - lowbit(i), i] x (j - lowbit(j), j]."""
+        prefix = np.zeros((self.width + 1, self.height + 1), dtype=np.int64)
+        cells = np.array(self.cells, dtype=np.int64).reshape(self.width, self.height)
+        prefix[1:, 1:] = cells.cumsum(axis=0).cumsum(axis=1)
+        xs = np.arange(self.width + 1)
+        ys = np.arange(self.height + 1)
+        lx = (xs - (xs & -xs))[:, None]
+        ly = (ys - (ys & -ys))[None, :]
+        xs, ys = xs[:, None], ys[None, :]
+        self.tree = prefix[xs, ys] - prefix[lx, ys] - prefix[xs, ly] + prefix[lx, ly]
+        self.tree[0, :] = 0
+        self.tree[:, 0] = 0
+
+    def reset(self):
+        self.cells = [[0] * self.height for _ in range(self.width)]
+        self.tree[:] = 0
+
+    def rect_sum(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        """Sum over the inclusive rectangle [x1..x2] x [y1..y2], clipped to the grid."""
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(self.width - 1, x2), min(self.height - 1, y2)
+        if x1 > x2 or y1 > y2:
+            return 0
+        if (x2 - x1 + 1) * (y2 - y1 + 1) <= self.SCALAR_WINDOW_CELLS:
+            total = 0
+            for row in self.cells[x1:x2 + 1]:
+                total += sum(row[y1:y2 + 1])
+            return total
+        # The four prefix sums in one gather: +nodes of the upper bound, -nodes of the lower bound
+        hi_x, lo_x = self._query_x[x2 + 1], self._query_x[x1]
+        hi_y, lo_y = self._query_y[y2 + 1], self._query_y[y1]
+        block = self.tree[np.ix_(np.concatenate((hi_x, lo_x)), np.concatenate((hi_y, lo_y)))]
+        sign_x = np.concatenate((np.ones(len(hi_x), dtype=np.int64), -np.ones(len(lo_x), dtype=np.int64)))
+        sign_y = np.concatenate((np.ones(len(hi_y), dtype=np.int64), -np.ones(len(lo_y), dtype=np.int64)))
+        return int(sign_x @ block @ sign_y)
+
+    def window_sum(self, x: int, y: int, radius: int = 1) -> int:
+        """Sum over the (2r+1)x(2r+1) neighbourhood centred on (x, y)."""
+        if (2 * radius + 1) ** 2 > self.SCALAR_WINDOW_CELLS:
+            return self.rect_sum(x - radius, y - radius, x + radius, y + radius)
+        # Hot path of slot scoring: inlined scalar sum (slices clip at the far edges)
+        y1 = y - radius if y > radius else 0
+        total = 0
+        for row in self.cells[x - radius if x > radius else 0:x + radius + 1]:
+            total += sum(row[y1:y + radius + 1])
+        return total
+
+class OccupancySet(set):
+    """
+    Set of occupied (x, y) cells mirrored into a RectSumGrid.
+    Keeps the plain set API used across services while congestion queries read the grid.
+    """
+    def __init__(self, width: int, height: int, cells=()):
+        super().__init__()
+        self.grid = RectSumGrid(width, height)
+        self.update(cells)
+
+    def __reduce__(self):
+        return (OccupancySet, (self.grid.width, self.grid.height, list(self)))
+
+    def add(self, cell):
+        if cell not in self:
+            super().add(cell)
+            self.grid.add(int(cell[0]), int(cell[1]), 1)
+
+    def discard(self, cell):
+        if cell in self:
+            super().discard(cell)
+            self.grid.add(int(cell[0]), int(cell[1]), -1)
+
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self.discard(cell)
+
+    def pop(self):
+        cell = super().pop()
+        self.grid.add(int(cell[0]), int(cell[1]), -1)
+        return cell
+
+    def clear(self):
+        super().clear()
+        self.grid.reset()
+
+    def update(self, *others):
+        for other in others:
+            for cell in other:
+                self.add(cell)
+
+    def difference_update(self, *others):
+        for other in others:
+            for cell in list(other):
+                self.discard(cell)
+
+    def intersection_update(self, *others):
+        keep = set(self).intersection(*others)
+        self.difference_update([cell for cell in self if cell not in keep])
+
+    def symmetric_difference_update(self, other):
+        for cell in set(other):
+            if cell in self:
+                self.discard(cell)
+            else:
+                self.add(cell)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
 class DepotB7Map:
     def __init__(self, width: int, height: int, floor_index: int = 0):
         self.floor_index = floor_index
@@ -56,7 +232,7 @@ class DepotB7Map:
         self.landmarks: Dict[str, WarehouseCoordinate] = {}
         self.pillars: List[WarehouseCoordinate] = []
         self.special_walls: List[Tuple] = []
-        self.occupied_slots: set[Tuple[int, int]] = set()
+        self.occupied_slots: OccupancySet = OccupancySet(width, height)
 
     def _precompute_matrices(self):
         """Precomputes boolean matrices and graph for O(1) lookups."""
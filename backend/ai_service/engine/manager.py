@@ -111,29 +111,27 @@ class WMSOperationManager:
             return True
         return False
 
-    def generate_picking_order(self, product_ids: List[int]) -> Dict:
+    def generate_picking_order(self, product_ids: List[int], selection: str = "FIFO") -> Dict:
         """
         REQ 8.3: Generates optimized Picking Orders.
         1. Find product locations (Digital Twin)
         2. Compute shortest route
         3. Minimize travel time
+        :param selection: "FIFO" or "NEAREST" when a product sits in several slots
         """
-        # Step 1: Find locations of these products
+        # Step 1: Find locations of these products (product -> slots reverse index)
         items_to_pick = []
         for pid in product_ids:
-            # Find in slot_to_product mapping (Step 7 logic)
-            found = False
-            for (f_idx, x, y), stored_pid in self.storage_service.slot_to_product.items():
-                if stored_pid == pid:
-                    items_to_pick.append({
-                        "product_id": pid,
-                        "floor_idx": f_idx,
-                        "coord": (x, y)
-                    })
-                    found = True
-                    break
-            if not found:
-                 print(f"[WARN] SKU {pid} not found in storage state.")
+            slot = self.storage_service.locate_product(pid, strategy=selection)
+            if slot is None:
+                print(f"[WARN] SKU {pid} not found in storage state.")
+                continue
+            f_idx, x, y = slot
+            items_to_pick.append({
+                "product_id": pid,
+                "floor_idx": f_idx,
+                "coord": (x, y)
+            })
 
         # Step 2: Optimize route
         if not items_to_pick:
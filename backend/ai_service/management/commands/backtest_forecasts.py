@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ai_service.core.forecasting_service import ForecastingService
+from ai_service.engine.base import Role, AuditTrail
+
+class Command(BaseCommand):
+    help = 'Backtests SMA/SES/REG/HYBRID over the catalog with rolling origins (run after calibration changes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizons', type=str, default='1', help='Comma-separated horizons in days, e.g. 1,7.')
+        parser.add_argument('--origins', type=int, default=10, help='Rolling origins per SKU and horizon.')
+        parser.add_argument('--limit', type=int, default=None, help='Only backtest the first N SKUs.')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (1 = sequential, 0 = all cores; default: settings.FORECAST_WORKERS).')
+        parser.add_argument('--data-path', type=str, default=None, help='Excel file or CSV folder instead of the database.')
+        parser.add_argument('--csv', action='store_true', help='Treat --data-path as a CSV folder.')
+
+    def handle(self, *args, **options):
+        try:
+            horizons = [int(h) for h in options['horizons'].split(',') if h.strip()]
+        except ValueError:
+            raise CommandError('--horizons must be a comma-separated list of integers.')
+
+        service = ForecastingService(options['data_path'], is_csv=options['csv'], workers=options['workers'])
+        started = time.perf_counter()
+        metrics = service.backtest(horizons=horizons, n_origins=options['origins'],
+                                   limit_products=options['limit'], workers=options['workers'])
+        elapsed = time.perf_counter() - started
+
+        if metrics is None:
+            self.stdout.write(self.style.WARNING('No SKU has enough history to backtest.'))
+            return
+
+        self.stdout.write(metrics.to_string(index=False))
+        AuditTrail.log(Role.SYSTEM, f"Catalog backtest over horizons {horizons} completed in {elapsed:.1f}s.")
+        self.stdout.write(self.style.SUCCESS(f"Backtest finished in {elapsed:.1f}s."))
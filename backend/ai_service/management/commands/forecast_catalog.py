@@ -0,0 +1,35 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from ai_service.core.forecasting_service import ForecastingService
+from ai_service.engine.base import Role, AuditTrail
+
+class Command(BaseCommand):
+    help = 'Forecasts the SKU catalog (nightly batch), optionally sharded across worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Number of SKUs to forecast (default: whole catalog).')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (1 = sequential, 0 = all cores; default: settings.FORECAST_WORKERS).')
+        parser.add_argument('--data-path', type=str, default=None, help='Excel file or CSV folder instead of the database.')
+        parser.add_argument('--csv', action='store_true', help='Treat --data-path as a CSV folder.')
+        parser.add_argument('--output', type=str, default=None, help='Optional path to write the forecasts as JSON.')
+
+    def handle(self, *args, **options):
+        service = ForecastingService(options['data_path'], is_csv=options['csv'], workers=options['workers'])
+        service.loader.load_and_clean_wrapper()
+        catalog_size = len(service.loader.demand_index)
+        limit = options['limit'] if options['limit'] is not None else catalog_size
+
+        started = time.perf_counter()
+        forecasts = service.get_all_forecasts_raw(limit_products=limit)
+        elapsed = time.perf_counter() - started
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({str(pid): data for pid, data in forecasts.items()}, f, indent=4)
+
+        AuditTrail.log(Role.SYSTEM, f"Catalog forecast: {len(forecasts)} SKUs in {elapsed:.1f}s.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecasted {len(forecasts)}/{min(limit, catalog_size)} SKUs in {elapsed:.1f}s "
+            f"({service.parallel.effective_workers(min(limit, catalog_size), options['workers'])} processes)."
+        ))
@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from ai_service.core.forecasting_service import ForecastingService
+from ai_service.engine.base import Role, AuditTrail
+
+class Command(BaseCommand):
+    help = 'Forecasts the whole catalog and stores the results in PrevisionIA (run nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, default=None, help='Forecast date YYYY-MM-DD (default: tomorrow).')
+        parser.add_argument('--limit', type=int, default=None, help='Only materialize the first N SKUs.')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (1 = sequential, 0 = all cores; default: settings.FORECAST_WORKERS).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert.')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                target_date = datetime.strptime(options['date'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--date must use the YYYY-MM-DD format.')
+        else:
+            target_date = datetime.now() + timedelta(days=1)
+
+        service = ForecastingService(workers=options['workers'])
+        started = time.perf_counter()
+        written = service.materialize_forecasts(
+            target_date=target_date,
+            limit_products=options['limit'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+
+        AuditTrail.log(Role.SYSTEM, f"Materialized {written} forecasts for {target_date.strftime('%Y-%m-%d')} in {elapsed:.1f}s.")
+        self.stdout.write(self.style.SUCCESS(f"Stored {written} forecasts for {target_date.strftime('%Y-%m-%d')} in {elapsed:.1f}s."))
@@ -0,0 +1,55 @@
+import json
+import os
+from django.core.management.base import BaseCommand
+from ai_service.core.forecasting_service import DataLoader, REPORT_DIR
+from ai_service.core.product_manager import ProductStorageManager
+from ai_service.core.storage import StorageOptimizationService
+from ai_service.core.twin_state import DigitalTwinStateStore
+from ai_service.engine.base import Role, AuditTrail
+from ai_service.maps import GroundFloorMap, IntermediateFloorMap, UpperFloorMap
+
+class Command(BaseCommand):
+    help = 'Nightly re-slotting: computes a budgeted global slot rebalancing plan from the current occupancy.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-moves', type=int, default=50, help='Maximum number of physical moves in the plan.')
+        parser.add_argument('--min-saving', type=float, default=5.0, help='Minimum expected travel saving per move group.')
+        parser.add_argument('--output', type=str, default=None, help='Optional path to write the plan as JSON.')
+
+    def handle(self, *args, **options):
+        loader = DataLoader()
+        loader.load_and_clean()
+
+        floor_maps = {
+            0: GroundFloorMap(),
+            1: IntermediateFloorMap(floor_index=1),
+            2: UpperFloorMap(floor_index=2)
+        }
+        storage_service = StorageOptimizationService(floor_maps, ProductStorageManager())
+
+        # Start from the shared twin state (pick traffic heatmap included), read-only: the plan
+        # must not publish anything to the API workers
+        DigitalTwinStateStore(os.path.join(REPORT_DIR, "twin_state")).restore(storage_service)
+        if storage_service.physical_state_loaded:
+            storage_service.sync_physical_delta(loader.fetch_emplacement_changes(storage_service.sync_watermark))
+        else:
+            storage_service.sync_physical_state(loader.emplacements)
+
+        plan = storage_service.plan_rebalancing(max_moves=options['max_moves'], min_saving=options['min_saving'])
+
+        for move in plan['moves']:
+            self.stdout.write(
+                f"[G{move['group_id']}.{move['step']}] SKU {move['product_id']}: "
+                f"L{move['from_floor']}{move['from_coord']} -> L{move['to_floor']}{move['to_coord']} "
+                f"({move['reason']}, saving {move['expected_saving']:.1f})"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(plan, f, indent=4)
+
+        AuditTrail.log(Role.SYSTEM, f"Rebalancing plan generated: {len(plan['moves'])} moves, expected saving {plan['total_expected_saving']:.1f}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Planned {len(plan['moves'])} moves in {plan['compute_time_ms']:.0f} ms "
+            f"(expected saving {plan['total_expected_saving']:.1f})."
+        ))
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from ai_service.core.forecasting_service import ForecastingService
+from ai_service.engine.base import Role, AuditTrail
+
+class Command(BaseCommand):
+    help = 'Applies new demand to the per-SKU online model state (intraday refresh) and persists it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Replay every SKU history instead of applying new days only.')
+        parser.add_argument('--data-path', type=str, default=None, help='Excel file or CSV folder instead of the database.')
+        parser.add_argument('--csv', action='store_true', help='Treat --data-path as a CSV folder.')
+
+    def handle(self, *args, **options):
+        service = ForecastingService(options['data_path'], is_csv=options['csv'])
+
+        started = time.perf_counter()
+        counts = service.sync_online_state(rebuild=options['rebuild'])
+        elapsed = time.perf_counter() - started
+
+        AuditTrail.log(Role.SYSTEM, f"Online state refresh: {counts['updated']} updated, {counts['rebuilt']} rebuilt SKUs in {elapsed:.1f}s.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Online state: {counts['updated']} updated, {counts['rebuilt']} rebuilt, "
+            f"{counts['unchanged']} unchanged SKUs in {elapsed:.1f}s."
+        ))
@@ -139,3 +139,16 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# AI forecasting: processes used by catalog-level forecasts (1 = sequential, 0 = all cores)
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', '1'))
+
+# AI forecasting logs: size-rotated reports/forecasting_service.log, share of SKUs whose decision trace is logged
+FORECAST_LOG_MAX_BYTES = int(os.getenv('FORECAST_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+FORECAST_LOG_BACKUP_COUNT = int(os.getenv('FORECAST_LOG_BACKUP_COUNT', '5'))
+DECISION_TRACE_SAMPLE_RATE = float(os.getenv('DECISION_TRACE_SAMPLE_RATE', '1.0'))
+
+# AI forecasting triage: intermittent slow movers use Croston/SBA, other slow movers reuse their
+# model validation until it is older than FORECAST_TRIAGE_REVALIDATE_DAYS or demand drifts
+FORECAST_TRIAGE = os.getenv('FORECAST_TRIAGE', '1').lower() in ('1', 'true', 'yes')
+FORECAST_TRIAGE_REVALIDATE_DAYS = int(os.getenv('FORECAST_TRIAGE_REVALIDATE_DAYS', '7'))
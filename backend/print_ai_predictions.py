@@ -43,7 +43,7 @@ for _ in range(20):
     ss.record_picking_event(0, hot_coord)
 
 # Map a product to this slot
-ss.slot_to_product[(0, 5, 5)] = 31779 
+ss._set_slot_product((0, 5, 5), 31779)
 
 suggestions = ss.check_for_rebalancing(traffic_threshold=10)
 if not suggestions:
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Produit', '0012_alter_produit_poids'),
+        ('warhouse', '0013_alter_emplacement_id_emplacement_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='previsionia',
+            name='justification',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='previsionia',
+            name='modele_selectionne',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='previsionia',
+            name='trace_decision',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='previsionia',
+            index=models.Index(fields=['date_prevision', 'id_produit'], name='previsions__date_pr_91255d_idx'),
+        ),
+    ]
@@ -652,11 +652,17 @@ class PrevisionIA(models.Model):
     date_prevision = models.DateField()
     quantite_prevue = models.DecimalField(max_digits=12, decimal_places=2)
     confiance_score = models.FloatField()  # 0.0-1.0 confidence
+    modele_selectionne = models.CharField(max_length=20, blank=True, default='')  # SMA / REG / HYBRID
+    justification = models.TextField(blank=True, null=True)
+    trace_decision = models.JSONField(blank=True, null=True)  # Explainable decision trace of the forecast
     cree_le = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'previsions_ia'
         ordering = ['-date_prevision']
+        indexes = [
+            models.Index(fields=['date_prevision', 'id_produit']),
+        ]
 
     def __str__(self):
         return f"{self.id_prevision} - {self.id_produit}"
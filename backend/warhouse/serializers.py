@@ -452,7 +452,8 @@ class PrevisionIASerializer(serializers.ModelSerializer):
         model = PrevisionIA
         fields = [
             'id_prevision', 'date_prevision', 'quantite_prevue',
-            'confiance_score', 'cree_le',
+            'confiance_score', 'modele_selectionne', 'justification',
+            'trace_decision', 'cree_le',
             'id_produit', 'id_produit_id'
         ]
         read_only_fields = ['cree_le']